@@ -0,0 +1,6 @@
+"""
+Performance benchmarks for the magazine database system.
+
+Each module in this package can be run directly with `python -m benchmarks.<name>`
+and prints its measurements to stdout.
+"""
@@ -0,0 +1,171 @@
+"""
+Command-line entry point for the benchmark suite.
+
+Usage:
+    python -m benchmarks run [--articles N] [--skew S] [--relation-cache N] [--in-memory] [--db PATH] [--output FILE] [--only OP,...]
+    python -m benchmarks compare BASELINE.json CURRENT.json [--threshold 0.2]
+
+`run` generates (or reuses, with --db) a synthetic dataset, times every query
+method and writes the results as JSON; with --in-memory the operations are
+timed against an in-memory copy of the database (see
+python -m benchmarks.in_memory for a side-by-side comparison). `compare` reports the change in p50/p95
+latency between two result files and exits with status 1 if any operation's
+p95 regressed by more than the threshold.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from lib import database_utils
+from lib.cache import configure_relation_cache
+from .dataset import generate
+from .suite import OPERATIONS, Sampler, run_operation
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _article_count():
+    try:
+        with database_utils.get_connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+    except sqlite3.OperationalError:
+        return 0
+
+
+def _progress(total):
+    start = time.perf_counter()
+
+    def report(written):
+        rate = written / max(time.perf_counter() - start, 1e-9)
+        print(f"\r  generated {written:,}/{total:,} articles ({rate:,.0f}/s)", end="", file=sys.stderr)
+        if written == total:
+            print(file=sys.stderr)
+    return report
+
+
+def run(args):
+    db_file = args.db
+    temporary = db_file is None
+    if temporary:
+        fd, db_file = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        os.remove(db_file)
+    original_db_file = database_utils.DB_FILE
+    database_utils.DB_FILE = db_file
+    database_utils.close_pool()
+    try:
+        database_utils.create_tables()
+        existing = _article_count()
+        if existing:
+            print(f"reusing dataset in {db_file} ({existing:,} articles)", file=sys.stderr)
+            dataset = {"articles": existing, "reused": True, "skew": args.skew}
+        else:
+            print(f"generating {args.articles:,} articles", file=sys.stderr)
+            dataset = generate(args.articles, args.authors, args.magazines, args.skew, args.content_size,
+                               args.seed, progress=_progress(args.articles))
+        configure_relation_cache(args.relation_cache)
+        if args.in_memory:
+            database_utils.enable_in_memory()
+        sampler = Sampler(args.skew, args.seed)
+        names = args.only.split(",") if args.only else list(OPERATIONS)
+        results = {}
+        for name in names:
+            results[name] = run_operation(OPERATIONS[name], sampler, args.iterations, args.max_seconds)
+            r = results[name]
+            print(f"  {name:30} p50 {r['p50_ms']:9.3f} ms  p95 {r['p95_ms']:9.3f} ms  "
+                  f"p99 {r['p99_ms']:9.3f} ms  {r['ops_per_sec']:10,.0f} ops/s", file=sys.stderr)
+    finally:
+        configure_relation_cache(0)
+        database_utils.disable_in_memory(save=False)
+        database_utils.close_pool()
+        database_utils.DB_FILE = original_db_file
+        if temporary and os.path.exists(db_file):
+            os.remove(db_file)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "iterations": args.iterations,
+            "max_seconds": args.max_seconds,
+            "relation_cache": args.relation_cache,
+            "storage": "memory" if args.in_memory else "disk",
+        },
+        "dataset": dataset,
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 0
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    with open(args.current) as f:
+        current = json.load(f)["results"]
+    regressions = []
+    for name in sorted(set(baseline) & set(current)):
+        old, new = baseline[name], current[name]
+        p50 = new["p50_ms"] / old["p50_ms"] - 1 if old["p50_ms"] else 0.0
+        p95 = new["p95_ms"] / old["p95_ms"] - 1 if old["p95_ms"] else 0.0
+        flag = "REGRESSION" if p95 > args.threshold else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:30} p50 {p50:+8.1%}  p95 {p95:+8.1%}  {flag}")
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Magazine database benchmark suite")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="generate a dataset and time every query method")
+    run_parser.add_argument("--articles", type=int, default=10000, help="articles to generate (10^3 to 10^7)")
+    run_parser.add_argument("--authors", type=int, help="authors to generate (default: articles / 50)")
+    run_parser.add_argument("--magazines", type=int, help="magazines to generate (default: articles / 1000)")
+    run_parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent for author/magazine popularity")
+    run_parser.add_argument("--content-size", type=int, default=200, help="characters of content per article")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--iterations", type=int, default=200, help="maximum calls per operation")
+    run_parser.add_argument("--max-seconds", type=float, default=5.0, help="time budget per operation")
+    run_parser.add_argument("--only", help="comma-separated operations to run (default: all)")
+    run_parser.add_argument("--relation-cache", type=int, default=0, help="relationship result cache size (0: disabled)")
+    run_parser.add_argument("--in-memory", action="store_true", help="time queries against an in-memory copy")
+    run_parser.add_argument("--db", help="database file to generate into or reuse (default: temporary)")
+    run_parser.add_argument("--output", help="write JSON results here instead of stdout")
+    run_parser.set_defaults(handler=run)
+
+    compare_parser = commands.add_parser("compare", help="compare two JSON result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.2, help="p95 slowdown that counts as a regression")
+    compare_parser.set_defaults(handler=compare)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
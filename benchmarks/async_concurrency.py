@@ -0,0 +1,112 @@
+"""
+Benchmark for concurrent coroutines using the async model API.
+
+Runs the same mix of reads (find_by_id and articles) and writes (save) from
+many coroutines twice: once calling the synchronous methods directly inside
+the coroutines, which blocks the event loop, and once through the async
+methods backed by the DB executors. Reports wall time, throughput and the
+worst event-loop stall seen by a heartbeat task.
+
+Results of two runs on one CPU with the defaults:
+
+    blocking  2,723-3,974 ops/s  worst loop stall 64-77 ms
+    async     2,480-2,500 ops/s  worst loop stall 21-28 ms
+
+The async methods add a thread hand-off to every call, and here they are
+slower than calling the synchronous methods directly. What they buy is an
+event loop that keeps running while queries are in flight. Use them to
+integrate with asyncio applications, not for throughput.
+
+Usage:
+    python -m benchmarks.async_concurrency [--coroutines N] [--ops N]
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from lib import database_utils
+from lib.async_utils import shutdown_executors
+from lib.article import Article
+from lib.author import Author
+from lib.magazine import Magazine
+
+
+async def _heartbeat(stop, interval=0.001):
+    """Measure the longest delay between scheduled wake-ups of the event loop."""
+    worst = 0.0
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        worst = max(worst, loop.time() - expected)
+    return worst
+
+
+async def _blocking_worker(magazine, author_ids, ops, index):
+    for i in range(ops):
+        if i % 10 == 0:
+            Author(None, f"Blocking {index}-{i}").save()
+        elif i % 2:
+            Author.find_by_id(author_ids[i % len(author_ids)])
+        else:
+            magazine.articles()
+        await asyncio.sleep(0)
+
+
+async def _async_worker(magazine, author_ids, ops, index):
+    for i in range(ops):
+        if i % 10 == 0:
+            await Author(None, f"Async {index}-{i}").asave()
+        elif i % 2:
+            await Author.afind_by_id(author_ids[i % len(author_ids)])
+        else:
+            await magazine.aarticles()
+
+
+async def _run(worker, magazine, author_ids, coroutines, ops):
+    stop = asyncio.Event()
+    heartbeat = asyncio.create_task(_heartbeat(stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(magazine, author_ids, ops, i) for i in range(coroutines)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    return elapsed, await heartbeat
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--coroutines", type=int, default=50, help="number of concurrent coroutines")
+    parser.add_argument("--ops", type=int, default=40, help="operations per coroutine")
+    args = parser.parse_args(argv)
+
+    fd, db_file = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    original_db_file = database_utils.DB_FILE
+    database_utils.DB_FILE = db_file
+    database_utils.close_pool()
+    try:
+        database_utils.create_tables()
+        Author.save_many((f"Seed {i}",) for i in range(200))
+        magazine = Magazine(None, "Bench Monthly", "Benchmarks")
+        magazine.save()
+        with database_utils.get_connection() as conn:
+            author_ids = [row[0] for row in conn.execute("SELECT id FROM authors")]
+        Article.bulk_create((f"Article {i}", "", author_ids[i % 200], magazine.id) for i in range(50))
+
+        total = args.coroutines * args.ops
+        print(f"{args.coroutines} coroutines x {args.ops} ops (10% writes)")
+        for label, worker in (("blocking", _blocking_worker), ("async", _async_worker)):
+            elapsed, stall = asyncio.run(_run(worker, magazine, author_ids, args.coroutines, args.ops))
+            print(f"  {label:9} {elapsed:7.3f} s  {total / elapsed:9,.0f} ops/s  worst loop stall {stall * 1000:7.2f} ms")
+    finally:
+        shutdown_executors()
+        database_utils.close_pool()
+        database_utils.DB_FILE = original_db_file
+        os.remove(db_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark for per-call latency of find_by_id with and without connection pooling.
+
+The "unpooled" run reproduces the original behaviour of opening a fresh
+sqlite3 connection (and enabling foreign keys) for every call; the "pooled"
+run goes through Author.find_by_id and the shared connection pool.
+
+Usage:
+    python -m benchmarks.connection_pool [--calls N]
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+from lib import database_utils
+from lib.author import Author
+
+
+def _unpooled_find_by_id(db_file, id):
+    conn = sqlite3.connect(db_file)
+    conn.execute("PRAGMA foreign_keys = ON;")
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM authors WHERE id = ?", (id,))
+    row = cursor.fetchone()
+    conn.close()
+    return Author.new_from_db(row) if row else None
+
+
+def _time_calls(fn, calls):
+    start = time.perf_counter()
+    for i in range(calls):
+        fn(i % 100 + 1)
+    return (time.perf_counter() - start) / calls
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=5000, help="number of find_by_id calls per run")
+    args = parser.parse_args(argv)
+
+    fd, db_file = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    original_db_file = database_utils.DB_FILE
+    database_utils.DB_FILE = db_file
+    database_utils.close_pool()
+    try:
+        database_utils.create_tables()
+        for i in range(100):
+            Author(None, f"Author {i}").save()
+
+        unpooled = _time_calls(lambda id: _unpooled_find_by_id(db_file, id), args.calls)
+        pooled = _time_calls(Author.find_by_id, args.calls)
+    finally:
+        database_utils.close_pool()
+        database_utils.DB_FILE = original_db_file
+        os.remove(db_file)
+
+    print(f"find_by_id x {args.calls}")
+    print(f"  unpooled: {unpooled * 1e6:8.1f} us/call")
+    print(f"  pooled:   {pooled * 1e6:8.1f} us/call")
+    print(f"  speedup:  {unpooled / pooled:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Benchmark for the article content storage layout.
+
+Builds the same catalogue three times: with content stored inline in the
+articles table (schema version 7, the layout before content moved to
+article_contents), with separate uncompressed content and with separate
+zlib-compressed content (the current schema). Every layout is built the same
+way, with its counters and full-text search index maintained by its own
+per-row triggers, inserted in one transaction and then VACUUMed. Reports the
+database size, the latency of listing a magazine's articles (the columns
+Magazine.articles() selects, without content) and the latency of listing them
+with their content (SELECT * inline; the listing plus the article_contents
+lookup Article.prefetch_content() runs, decoding included, otherwise). Both
+timings read rows only, so model hydration is left out of the comparison.
+
+Results of two runs at 20,000 articles of 4,000 characters, listing 2,000:
+
+    inline       92.2 MiB  list 6.7-7.7 ms  list+content 9.9-16.2 ms
+    separate     92.7 MiB  list 3.9-4.2 ms  list+content 21.7-22.5 ms
+    compressed   34.0 MiB  list 3.4-4.1 ms  list+content 57.9-73.1 ms
+
+With the search index in both, the separate layout is no smaller than the
+inline one. It lists articles without their content about twice as fast,
+because reading author_id and magazine_id no longer walks past the content.
+Listing with content is 1.4-2.2x slower, because it needs a second lookup
+per article. Compression, which is off by default, shrinks the database to
+about a third, but makes reading content 3.5-7x slower than the inline
+layout. The separate layout pays off when listings rarely need content,
+which is the models' default. Turn on compression only when size matters
+more than content reads.
+
+Usage:
+    python -m benchmarks.content_storage [--articles N] [--content-size N] [--magazines N]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from lib import database_utils
+from lib.article import Article
+
+WORDS = ("the", "magazine", "article", "reader", "story", "editor", "issue", "print", "column", "review",
+         "science", "culture", "interview", "feature", "history", "report", "city", "music", "market", "travel")
+
+# Schema version of the inline layout: every migration before article_contents
+INLINE_SCHEMA_VERSION = 7
+
+AUTHORS = 50
+
+
+def _content(rng, size):
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)[:size]
+
+
+def _timed(fn, repeat):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies) * 1000
+
+
+def _rows(args):
+    rng = random.Random(0)
+    for i in range(args.articles):
+        yield i + 1, f"Article {i}", _content(rng, args.content_size), i % AUTHORS + 1, i % args.magazines + 1
+
+
+def _build(conn, args, inline):
+    migrations = database_utils.MIGRATIONS[:INLINE_SCHEMA_VERSION] if inline else database_utils.MIGRATIONS
+    for statements in migrations:
+        for statement in statements:
+            conn.execute(statement)
+    conn.commit()
+    conn.executemany("INSERT INTO authors (id, name) VALUES (?, ?)", ((i + 1, f"Author {i}") for i in range(AUTHORS)))
+    conn.executemany("INSERT INTO magazines (id, name, category) VALUES (?, ?, 'Benchmarks')",
+                     ((i + 1, f"Magazine {i}") for i in range(args.magazines)))
+    if inline:
+        conn.executemany("INSERT INTO articles (id, title, content, author_id, magazine_id) VALUES (?, ?, ?, ?, ?)",
+                         _rows(args))
+    else:
+        for id, title, content, author_id, magazine_id in _rows(args):
+            conn.execute("INSERT INTO articles (id, title, author_id, magazine_id) VALUES (?, ?, ?, ?)",
+                         (id, title, author_id, magazine_id))
+            conn.execute("INSERT INTO article_contents (article_id, compressed, body) VALUES (?, ?, ?)",
+                         (id, *database_utils.encode_content(content)))
+    conn.commit()
+    conn.execute("VACUUM")
+
+
+def _measure(conn, args, inline):
+    def listing():
+        return conn.execute("SELECT id, title, author_id, magazine_id FROM articles WHERE magazine_id = ? ORDER BY id",
+                            (1,)).fetchall()
+
+    def with_content():
+        if inline:
+            return conn.execute("SELECT * FROM articles WHERE magazine_id = ? ORDER BY id", (1,)).fetchall()
+        rows = listing()
+        contents = Article._fetch_contents(conn, [row[0] for row in rows])
+        return [(*row, contents.get(row[0], "")) for row in rows]
+    return _timed(listing, args.repeat), _timed(with_content, args.repeat)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--articles", type=int, default=20000)
+    parser.add_argument("--content-size", type=int, default=4000, help="characters of content per article")
+    parser.add_argument("--magazines", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20, help="timed repetitions per measurement")
+    args = parser.parse_args(argv)
+
+    print(f"{args.articles} articles of {args.content_size} characters, listing 1 of {args.magazines} magazines")
+    original_db_file = database_utils.DB_FILE
+    for label in ("inline", "separate", "compressed"):
+        fd, db_file = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        os.remove(db_file)
+        database_utils.DB_FILE = db_file
+        database_utils.close_pool()
+        database_utils.configure_content_compression(label == "compressed")
+        try:
+            with database_utils.get_connection() as conn:
+                _build(conn, args, label == "inline")
+                listed, read = _measure(conn, args, label == "inline")
+            size = os.path.getsize(db_file)
+            print(f"  {label:10} {size / 2 ** 20:8.1f} MiB  list {listed:8.2f} ms  list+content {read:8.2f} ms")
+        finally:
+            database_utils.close_pool()
+            database_utils.configure_content_compression(False)
+            database_utils.DB_FILE = original_db_file
+            os.remove(db_file)
+
+
+if __name__ == "__main__":
+    main()
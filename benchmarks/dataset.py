@@ -0,0 +1,83 @@
+"""
+Synthetic dataset generator for the benchmark suite.
+
+Generates authors, magazines and articles at a configurable scale. Article
+authorship and placement follow a Zipf-like distribution (weight 1 / rank^skew),
+so a few authors and magazines hold most articles, as in real catalogues.
+Rows are streamed into the database with the bulk save APIs in chunks, so
+memory stays flat even at 10^7 articles.
+"""
+
+import itertools
+import random
+
+from lib.article import Article
+from lib.author import Author
+from lib.magazine import Magazine
+from lib.database_utils import create_tables, get_connection, BULK_CHUNK_SIZE
+
+CATEGORIES = ["Technology", "Health", "Science", "Arts", "Business", "Sports", "Travel", "Food"]
+
+
+def default_counts(articles):
+    """
+    Returns the (authors, magazines) counts used when only an article count is given.
+    """
+    return max(10, articles // 50), max(5, articles // 1000)
+
+
+def zipf_cum_weights(count, skew):
+    """
+    Returns cumulative Zipf weights for ranks 1..count, for use with random.choices().
+    A skew of 0 gives a uniform distribution.
+    """
+    return list(itertools.accumulate(1 / rank ** skew for rank in range(1, count + 1)))
+
+
+def generate(articles, authors=None, magazines=None, skew=1.1, content_size=200, seed=0,
+             chunk_size=BULK_CHUNK_SIZE, progress=None):
+    """
+    Fills the current database with a synthetic catalogue.
+
+    Args:
+        articles (int): Number of articles to create
+        authors (int, optional): Number of authors (default scales with articles)
+        magazines (int, optional): Number of magazines (default scales with articles)
+        skew (float): Zipf exponent for author and magazine popularity
+        content_size (int): Characters of content per article
+        seed (int): Random seed, so datasets are reproducible
+        chunk_size (int): Rows per bulk insert batch
+        progress (callable, optional): Called with the number of articles written so far
+
+    Returns:
+        dict: The parameters the dataset was generated with
+    """
+    default_authors, default_magazines = default_counts(articles)
+    authors = authors or default_authors
+    magazines = magazines or default_magazines
+    rng = random.Random(seed)
+    create_tables()
+
+    Author.save_many(((f"Author {i}",) for i in range(authors)), chunk_size)
+    Magazine.save_many(((f"Magazine {i}", CATEGORIES[i % len(CATEGORIES)]) for i in range(magazines)), chunk_size)
+    with get_connection() as conn:
+        author_ids = [row[0] for row in conn.execute("SELECT id FROM authors ORDER BY id")]
+        magazine_ids = [row[0] for row in conn.execute("SELECT id FROM magazines ORDER BY id")]
+    author_weights = zipf_cum_weights(len(author_ids), skew)
+    magazine_weights = zipf_cum_weights(len(magazine_ids), skew)
+    content = "x" * content_size
+
+    written = 0
+    while written < articles:
+        count = min(chunk_size, articles - written)
+        chosen_authors = rng.choices(author_ids, cum_weights=author_weights, k=count)
+        chosen_magazines = rng.choices(magazine_ids, cum_weights=magazine_weights, k=count)
+        Article.bulk_create(
+            ((f"Article {written + i}", content, chosen_authors[i], chosen_magazines[i]) for i in range(count)),
+            chunk_size,
+        )
+        written += count
+        if progress is not None:
+            progress(written)
+    return {"articles": articles, "authors": authors, "magazines": magazines, "skew": skew,
+            "content_size": content_size, "seed": seed}
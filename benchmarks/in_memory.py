@@ -0,0 +1,73 @@
+"""
+Benchmark comparing on-disk and in-memory mode.
+
+Generates a dataset with the suite's dataset generator, times every suite
+operation against the database file, then again after enable_in_memory()
+has loaded it into a shared-cache in-memory database, and reports p50/p95
+latency in both modes with the speedup. Also reports how long loading the
+database into memory and writing a snapshot back to disk take.
+
+Usage:
+    python -m benchmarks.in_memory [--articles N] [--iterations N] [--only OP,...]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from lib import database_utils
+from .dataset import generate
+from .suite import OPERATIONS, Sampler, run_operation
+
+
+def _run_all(names, args):
+    sampler = Sampler(seed=args.seed)
+    return {name: run_operation(OPERATIONS[name], sampler, args.iterations, args.max_seconds) for name in names}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--articles", type=int, default=100000)
+    parser.add_argument("--iterations", type=int, default=200, help="maximum calls per operation")
+    parser.add_argument("--max-seconds", type=float, default=2.0, help="time budget per operation")
+    parser.add_argument("--only", help="comma-separated operations to run (default: all)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    names = args.only.split(",") if args.only else list(OPERATIONS)
+
+    fd, db_file = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    os.remove(db_file)
+    original_db_file = database_utils.DB_FILE
+    database_utils.DB_FILE = db_file
+    database_utils.close_pool()
+    try:
+        generate(args.articles, seed=args.seed)
+        size = os.path.getsize(db_file)
+        disk = _run_all(names, args)
+        start = time.perf_counter()
+        database_utils.enable_in_memory()
+        loaded = time.perf_counter() - start
+        memory = _run_all(names, args)
+        start = time.perf_counter()
+        database_utils.snapshot()
+        saved = time.perf_counter() - start
+        print(f"{args.articles} articles, {size / 2 ** 20:.1f} MiB: load {loaded * 1000:.1f} ms, "
+              f"snapshot {saved * 1000:.1f} ms")
+        print(f"  {'operation':34} {'disk p50':>10} {'memory p50':>11} {'disk p95':>10} {'memory p95':>11}  speedup")
+        for name in names:
+            d, m = disk[name], memory[name]
+            speedup = d["p50_ms"] / m["p50_ms"] if m["p50_ms"] else float("inf")
+            print(f"  {name:34} {d['p50_ms']:10.3f} {m['p50_ms']:11.3f} {d['p95_ms']:10.3f} {m['p95_ms']:11.3f}  "
+                  f"{speedup:6.1f}x")
+    finally:
+        database_utils.disable_in_memory(save=False)
+        database_utils.close_pool()
+        database_utils.DB_FILE = original_db_file
+        if os.path.exists(db_file):
+            os.remove(db_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Memory benchmark for the slotted model classes.
+
+Uses tracemalloc to report bytes per Author, Magazine and Article instance,
+comparing the __slots__ models against dict-backed subclasses that reproduce
+the previous layout, and the peak memory of hydrating a large
+Magazine.articles() result with and without prefetching relations.
+
+Usage:
+    python -m benchmarks.memory [--objects N] [--articles N]
+"""
+
+import argparse
+import gc
+import os
+import tempfile
+import tracemalloc
+
+from lib import database_utils
+from lib.article import Article
+from lib.author import Author
+from lib.magazine import Magazine
+
+
+# Subclasses without __slots__ get a per-instance __dict__, like the original models
+class DictAuthor(Author):
+    pass
+
+
+class DictMagazine(Magazine):
+    pass
+
+
+class DictArticle(Article):
+    pass
+
+
+def _bytes_per_object(factory, count):
+    gc.collect()
+    tracemalloc.start()
+    objects = [factory(i) for i in range(count)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    # Subtract the list holding the objects
+    return (size - 8 * count) / count
+
+
+def _peak_memory(fn):
+    gc.collect()
+    tracemalloc.start()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, len(result)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--objects", type=int, default=100000, help="instances built per class for bytes/object")
+    parser.add_argument("--articles", type=int, default=100000, help="articles in the magazine listed for peak memory")
+    args = parser.parse_args(argv)
+
+    author, magazine = Author(1, "Author"), Magazine(1, "Magazine", "Category")
+    title = "A shared title"
+    cases = [
+        ("Author", lambda i: Author(i, "Author"), lambda i: DictAuthor(i, "Author")),
+        ("Magazine", lambda i: Magazine(i, "Magazine", "Category"), lambda i: DictMagazine(i, "Magazine", "Category")),
+        ("Article", lambda i: Article(i, title, "", author, magazine), lambda i: DictArticle(i, title, "", author, magazine)),
+    ]
+    print(f"bytes per object ({args.objects} instances)")
+    for name, slotted, dict_backed in cases:
+        print(f"  {name:9} slots {_bytes_per_object(slotted, args.objects):7.1f}   "
+              f"dict {_bytes_per_object(dict_backed, args.objects):7.1f}")
+
+    fd, db_file = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    original_db_file = database_utils.DB_FILE
+    database_utils.DB_FILE = db_file
+    database_utils.close_pool()
+    try:
+        database_utils.create_tables()
+        Author.save_many((f"Author {i}",) for i in range(1000))
+        magazine = Magazine(None, "Big Magazine", "Benchmarks")
+        magazine.save()
+        Article.bulk_create((f"Article {i}", "content " * 20, i % 1000 + 1, magazine.id) for i in range(args.articles))
+
+        print(f"peak memory of Magazine.articles() ({args.articles} articles)")
+        for label, prefetch in (("lazy", False), ("prefetch", True)):
+            peak, count = _peak_memory(lambda: magazine.articles(prefetch=prefetch))
+            print(f"  {label:9} {peak / 2 ** 20:8.1f} MiB  {peak / count:7.1f} bytes/article")
+    finally:
+        database_utils.close_pool()
+        database_utils.DB_FILE = original_db_file
+        os.remove(db_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark for the process-pool analytics runner.
+
+Runs each built-in job over every magazine serially in this process, then with
+ParallelRunner at 1, 2, 4, ... workers up to the CPU count, on a WAL database
+generated with the suite's dataset generator. Reports seconds per job and the
+speedup over the serial loop.
+
+Usage:
+    python -m benchmarks.parallel [--articles N] [--workers N]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from lib import database_utils
+from lib.magazine import Magazine
+from lib.parallel import BUILTIN_JOBS, ParallelRunner
+from .dataset import generate
+
+
+def _serial(job):
+    with database_utils.get_connection() as conn:
+        rows = conn.execute("SELECT * FROM magazines ORDER BY id").fetchall()
+    return {magazine.id: getattr(magazine, job)() for magazine in map(Magazine.new_from_db, rows)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--articles", type=int, default=200000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="largest worker count to try")
+    args = parser.parse_args(argv)
+
+    fd, db_file = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    os.remove(db_file)
+    original_db_file = database_utils.DB_FILE
+    database_utils.DB_FILE = db_file
+    database_utils.close_pool()
+    try:
+        database_utils.configure_concurrency(wal=True)
+        generate(args.articles)
+        counts = [1]
+        while counts[-1] * 2 <= args.workers:
+            counts.append(counts[-1] * 2)
+        if counts[-1] != args.workers:
+            counts.append(args.workers)
+        print(f"{args.articles} articles, {os.cpu_count()} CPUs")
+        for job in BUILTIN_JOBS:
+            start = time.perf_counter()
+            _serial(job)
+            serial = time.perf_counter() - start
+            line = f"  {job:22} serial {serial:7.2f} s"
+            for workers in counts:
+                with ParallelRunner(workers=workers) as runner:
+                    runner.run(job)  # start the workers and warm their page caches
+                    start = time.perf_counter()
+                    runner.run(job)
+                    elapsed = time.perf_counter() - start
+                line += f"  {workers}w {elapsed:6.2f} s ({serial / elapsed:4.1f}x)"
+            print(line)
+    finally:
+        database_utils.configure_concurrency(wal=False)
+        database_utils.close_pool()
+        database_utils.DB_FILE = original_db_file
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_file + suffix):
+                os.remove(db_file + suffix)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Timed query operations for the benchmark suite.
+
+Every model query method is registered in OPERATIONS as a callable taking a
+Sampler, which picks the entity to query with the same skewed distribution
+the dataset was generated with, so hot authors and magazines are queried
+more often. run_operation() times an operation repeatedly and summarizes
+the latencies as p50/p95/p99 and throughput.
+
+Write operations leave the dataset as they found it, so it stays comparable
+across runs and versions when reused with --db: saves of existing rows write
+back the values the row already has, and inserts return a cleanup callable that
+run_operation() calls, untimed, to delete the new row again.
+"""
+
+import random
+import time
+
+from lib.article import Article
+from lib.author import Author
+from lib.magazine import Magazine
+from lib.database_utils import get_connection, transaction
+from .dataset import zipf_cum_weights
+
+
+class Sampler:
+    """
+    Picks author, magazine and article IDs from the current database. On an empty
+    table the corresponding ID is None.
+    """
+
+    def __init__(self, skew=1.1, seed=0):
+        self._rng = random.Random(seed)
+        with get_connection() as conn:
+            self.author_ids = [row[0] for row in conn.execute("SELECT id FROM authors ORDER BY id")]
+            rows = conn.execute("SELECT id, name, category FROM magazines ORDER BY id")
+            self.magazines = {row[0]: row[1:] for row in rows}
+            self.magazine_ids = list(self.magazines)
+            self.max_article_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM articles").fetchone()[0]
+        self._author_weights = zipf_cum_weights(len(self.author_ids), skew)
+        self._magazine_weights = zipf_cum_weights(len(self.magazine_ids), skew)
+
+    def author_id(self):
+        if not self.author_ids:
+            return None
+        return self._rng.choices(self.author_ids, cum_weights=self._author_weights)[0]
+
+    def magazine_id(self):
+        if not self.magazine_ids:
+            return None
+        return self._rng.choices(self.magazine_ids, cum_weights=self._magazine_weights)[0]
+
+    def article_id(self):
+        if self.max_article_id < 1:
+            return None
+        return self._rng.randint(1, self.max_article_id)
+
+    def author(self):
+        # Relationship methods only need the id, so skip the lookup query
+        return Author(self.author_id(), "Sampled")
+
+    def magazine(self):
+        return Magazine(self.magazine_id(), "Sampled", "Sampled")
+
+    def stored_magazine(self):
+        """Returns an untracked Magazine holding a sampled row's stored values, or None."""
+        id = self.magazine_id()
+        return None if id is None else Magazine(id, *self.magazines[id])
+
+
+def _deleter(table, id):
+    def delete():
+        with transaction() as conn:
+            conn.execute(f"DELETE FROM {table} WHERE id = ?", (id,))
+    return delete
+
+
+def _save_author(sampler):
+    author = Author(None, "Benchmark Author")
+    author.save()
+    return _deleter("authors", author.id)
+
+
+def _save_magazine(sampler):
+    # A full UPDATE (the magazine is untracked) that writes back the stored values
+    magazine = sampler.stored_magazine()
+    if magazine is not None:
+        magazine.save()
+
+
+def _save_article(sampler):
+    article = Article(None, "Benchmark Article", "", sampler.author_id(), sampler.magazine_id())
+    article.save()
+    return _deleter("articles", article.id)
+
+
+OPERATIONS = {
+    "Author.find_by_id": lambda s: Author.find_by_id(s.author_id()),
+    "Magazine.find_by_id": lambda s: Magazine.find_by_id(s.magazine_id()),
+    "Article.find_by_id": lambda s: Article.find_by_id(s.article_id()),
+    "Author.save": _save_author,
+    "Magazine.save": _save_magazine,
+    "Article.save": _save_article,
+    "Author.articles": lambda s: s.author().articles(),
+    "Author.magazines": lambda s: s.author().magazines(),
+    "Author.topic_areas": lambda s: s.author().topic_areas(),
+    "Magazine.articles": lambda s: s.magazine().articles(),
+    "Magazine.contributors": lambda s: s.magazine().contributors(),
+    "Magazine.article_titles": lambda s: s.magazine().article_titles(),
+    "Magazine.contributing_authors": lambda s: s.magazine().contributing_authors(),
+    "Magazine.top_publisher": lambda s: Magazine.top_publisher(),
+    "Magazine.top_publishers": lambda s: Magazine.top_publishers(),
+    "Magazine.top_categories": lambda s: Magazine.top_categories(),
+    "Author.most_prolific": lambda s: Author.most_prolific(),
+    "Author.topic_areas_map": lambda s: Author.topic_areas_map(),
+    "Magazine.contributing_authors_map": lambda s: Magazine.contributing_authors_map(),
+    "Article.search": lambda s: Article.search(f'"Article {s.article_id()}"', limit=10),
+}
+
+
+def percentile(sorted_values, fraction):
+    """
+    Returns the value at the given fraction (0-1) of a sorted list, using the nearest-rank method.
+    """
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def run_operation(operation, sampler, iterations=200, max_seconds=5.0, min_iterations=5):
+    """
+    Times an operation repeatedly and summarizes its latency distribution.
+
+    Stops after `iterations` calls, or earlier once `max_seconds` have elapsed
+    and at least `min_iterations` calls were made, so slow operations on large
+    datasets still finish in bounded time. If the operation returns a callable,
+    it is called after the timed span to undo the operation's writes.
+
+    Returns:
+        dict: iterations, p50/p95/p99/mean/max latency in milliseconds and ops_per_sec
+    """
+    latencies = []
+    deadline = time.perf_counter() + max_seconds
+    for _ in range(iterations):
+        start = time.perf_counter()
+        cleanup = operation(sampler)
+        latencies.append(time.perf_counter() - start)
+        if callable(cleanup):
+            cleanup()
+        if len(latencies) >= min_iterations and time.perf_counter() > deadline:
+            break
+    latencies.sort()
+    total = sum(latencies)
+    return {
+        "iterations": len(latencies),
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_ms": total / len(latencies) * 1000,
+        "max_ms": latencies[-1] * 1000,
+        "ops_per_sec": len(latencies) / total if total else float("inf"),
+    }
@@ -0,0 +1,103 @@
+"""
+Stress test for read throughput while writes are ongoing.
+
+Reader threads repeatedly call Magazine.article_titles() and Author.find_by_id()
+while writer threads keep saving articles, first in the default rollback-journal
+mode and then in WAL concurrency mode. Reports reads/s, writes/s and the number
+of "database is locked" errors in each mode.
+
+Usage:
+    python -m benchmarks.wal_stress [--readers N] [--writers N] [--seconds S]
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from lib import database_utils
+from lib.article import Article
+from lib.author import Author
+from lib.magazine import Magazine
+
+
+def _run(author, magazine, readers, writers, seconds):
+    stop = threading.Event()
+    counts = {"reads": 0, "writes": 0, "locked": 0}
+    lock = threading.Lock()
+
+    def record(key):
+        with lock:
+            counts[key] += 1
+
+    def reader():
+        while not stop.is_set():
+            try:
+                magazine.article_titles()
+                Author.find_by_id(author.id)
+                record("reads")
+            except sqlite3.OperationalError:
+                record("locked")
+
+    def writer(index):
+        i = 0
+        while not stop.is_set():
+            try:
+                Article(None, f"Stress {index}-{i}", "x" * 200, author, magazine).save()
+                record("writes")
+            except sqlite3.OperationalError:
+                record("locked")
+            i += 1
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return {key: value / seconds if key != "locked" else value for key, value in counts.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args(argv)
+
+    fd, db_file = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    original_db_file = database_utils.DB_FILE
+    database_utils.DB_FILE = db_file
+    database_utils.close_pool()
+    try:
+        database_utils.configure_pool(size=args.readers + args.writers)
+        database_utils.create_tables()
+        author = Author(None, "Stress Author")
+        author.save()
+        magazine = Magazine(None, "Stress Monthly", "Benchmarks")
+        magazine.save()
+        Article.bulk_create((f"Seed {i}", "", author, magazine) for i in range(500))
+
+        print(f"{args.readers} readers, {args.writers} writers, {args.seconds:.1f} s per mode")
+        for label, wal in (("default", False), ("wal", True)):
+            database_utils.configure_concurrency(wal=wal, readers=args.readers)
+            result = _run(author, magazine, args.readers, args.writers, args.seconds)
+            print(f"  {label:8} {result['reads']:9,.0f} reads/s  {result['writes']:8,.0f} writes/s  "
+                  f"{result['locked']:5} locked errors")
+    finally:
+        database_utils.configure_concurrency(wal=False)
+        database_utils.configure_pool()
+        database_utils.close_pool()
+        database_utils.DB_FILE = original_db_file
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_file + suffix):
+                os.remove(db_file + suffix)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,7 @@ and validates error handling to ensure the system works correctly.
 """
 
 import ipdb
-from lib.database_utils import create_tables
+from lib.database_utils import create_tables, transaction
 from lib.author import Author
 from lib.magazine import Magazine
 from lib.article import Article
@@ -14,24 +14,26 @@ from lib.article import Article
 # Initialize database tables
 create_tables()
 
-# Create sample authors
-author1 = Author(None, "John Doe")
-author1.save()
-author2 = Author(None, "Jane Smith")
-author2.save()
+# Create sample data in a single transaction (one commit instead of one per save)
+with transaction():
+    # Create sample authors
+    author1 = Author(None, "John Doe")
+    author1.save()
+    author2 = Author(None, "Jane Smith")
+    author2.save()
 
-# Create sample magazines
-magazine1 = Magazine(None, "Tech Today", "Technology")
-magazine1.save()
-magazine2 = Magazine(None, "Health Weekly", "Health")
-magazine2.save()
+    # Create sample magazines
+    magazine1 = Magazine(None, "Tech Today", "Technology")
+    magazine1.save()
+    magazine2 = Magazine(None, "Health Weekly", "Health")
+    magazine2.save()
 
-# Add articles using author's add_article method
-article1 = author1.add_article(magazine1, "AI Trends")
-article2 = author1.add_article(magazine2, "Healthy Living")
-article3 = author2.add_article(magazine1, "Blockchain Basics")
-article4 = author2.add_article(magazine1, "Cybersecurity Tips")
-article5 = author2.add_article(magazine1, "Machine Learning")
+    # Add articles using author's add_article method
+    article1 = author1.add_article(magazine1, "AI Trends")
+    article2 = author1.add_article(magazine2, "Healthy Living")
+    article3 = author2.add_article(magazine1, "Blockchain Basics")
+    article4 = author2.add_article(magazine1, "Cybersecurity Tips")
+    article5 = author2.add_article(magazine1, "Machine Learning")
 
 # Test author relationships and methods
 print("Author1 articles:", [a.title for a in author1.articles()])
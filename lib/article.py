@@ -3,10 +3,59 @@ Article module for managing article entities in the magazine database.
 
 This module defines the Article class, which represents an article in the system.
 Articles have a title (read-only), content, and belong to an author and a magazine.
-The author and magazine are stored as object references for easy access.
+The author and magazine are stored by ID and loaded lazily on first access, so
+listing articles does not pay for related objects the caller never touches.
+Content lives in its own table, optionally compressed, and is likewise only
+fetched when .content is first read (or streamed with iter_content()).
+On a sharded database an article lives on its magazine's shard, and its ID
+(congruent to the shard index modulo the shard count) locates it.
 """
 
-from .database_utils import get_connection
+import codecs
+import heapq
+import sqlite3
+import zlib
+from contextlib import contextmanager
+
+from .database_utils import (get_connection, transaction, chunked, save_objects, encode_content, decode_content,
+                             current_database, scatter, routed, using, BULK_CHUNK_SIZE, PAGE_SIZE)
+from .cache import lookup, register, detach, evict, invalidate, relation_cache_enabled
+from .async_utils import run_read, run_write
+from .query import QuerySet
+from .tracking import record, changed, count, count_inserts, mark_clean
+
+# Columns selected when listing articles; content is loaded separately on demand
+ARTICLE_COLUMNS = "articles.id, articles.title, articles.author_id, articles.magazine_id"
+
+# Bytes read from the content blob per step of iter_content()
+CONTENT_CHUNK_SIZE = 64 * 1024
+
+
+class _NotLoaded:
+    """Marks content that has not been read from the database yet."""
+
+    def __repr__(self):
+        return "<not loaded>"
+
+    def __reduce__(self):
+        # Pickle by reference so the marker stays a singleton in worker processes
+        return "_NOT_LOADED"
+
+
+_NOT_LOADED = _NotLoaded()
+
+
+class _Missing:
+    """Marks a related row that was looked up and not found."""
+
+    def __repr__(self):
+        return "<missing>"
+
+    def __reduce__(self):
+        return "_MISSING"
+
+
+_MISSING = _Missing()
 
 class Article:
     """
@@ -15,8 +64,12 @@ class Article:
     Articles have a unique ID, a title (read-only after creation), content,
     and references to their author and magazine. The title must be a non-empty string.
     Articles are the core content entities linking authors to magazines.
+    Like Author and Magazine, Article declares __slots__ instead of a per-instance
+    __dict__, which keeps large hydrated result sets compact.
     """
 
+    __slots__ = ("id", "_title", "_content", "_author", "_author_id", "_magazine", "_magazine_id", "_changes")
+
     def __init__(self, id, title, content, author, magazine):
         """
         Initialize a new Article instance.
@@ -25,8 +78,8 @@ class Article:
             id (int or None): The article's unique identifier (None for new articles)
             title (str): The article's title (must be non-empty string, read-only after creation)
             content (str): The article's content text
-            author (Author): The Author object who wrote the article
-            magazine (Magazine): The Magazine object publishing the article
+            author (Author or int): The Author object who wrote the article, or its ID
+            magazine (Magazine or int): The Magazine object publishing the article, or its ID
 
         Raises:
             ValueError: If title is not a string or is empty
@@ -34,6 +87,7 @@ class Article:
         if not isinstance(title, str) or len(title) == 0:
             raise ValueError("Title must be a non-empty string")
         self.id = id
+        self._changes = None
         self._title = title
         self.content = content
         self.author = author
@@ -49,26 +103,291 @@ class Article:
         """
         return self._title
 
+    @property
+    def content(self):
+        """
+        Get the article's content, loading it from the database on first access.
+
+        Returns:
+            str: The article's content text
+        """
+        if self._content is _NOT_LOADED:
+            with routed(article_id=self.id), get_connection() as conn:
+                self._content = self._fetch_contents(conn, [self.id]).get(self.id, "")
+        return self._content
+
+    @content.setter
+    def content(self, value):
+        """
+        Set the article's content.
+
+        Args:
+            value (str): The new content text
+        """
+        if self._changes is not None:
+            record(self, "content", self._content)
+        self._content = value
+
+    def iter_content(self, chunk_size=CONTENT_CHUNK_SIZE):
+        """
+        Stream the article's saved content in pieces, without holding all of it in memory.
+
+        Reads the stored body incrementally with sqlite3's blobopen(), decompressing it
+        on the fly if it was stored compressed. Content already loaded on this instance
+        is yielded as is.
+
+        Args:
+            chunk_size (int): Bytes read from the database per step
+
+        Yields:
+            str: Consecutive pieces of the content
+        """
+        if self._content is not _NOT_LOADED:
+            if self._content:
+                yield self._content
+            return
+        with current_database().shard_for_article(self.id).connection() as conn:
+            row = conn.execute("SELECT compressed FROM article_contents WHERE article_id = ?", (self.id,)).fetchone()
+            if row is None:
+                return
+            inflater = zlib.decompressobj() if row[0] else None
+            decoder = codecs.getincrementaldecoder("utf-8")()
+            with conn.blobopen("article_contents", "body", self.id, readonly=True) as blob:
+                while True:
+                    data = blob.read(chunk_size)
+                    if not data:
+                        break
+                    text = decoder.decode(inflater.decompress(data) if inflater else data)
+                    if text:
+                        yield text
+            text = decoder.decode(inflater.flush() if inflater else b"", final=True)
+            if text:
+                yield text
+
+    @property
+    def author_id(self):
+        """
+        Get the ID of the article's author without loading the Author.
+
+        Returns:
+            int or None: The author's ID
+        """
+        return self._author_id if self._author is None or self._author is _MISSING else self._author.id
+
+    @property
+    def author(self):
+        """
+        Get the article's author, loading it from the database on first access.
+        An author ID with no matching row is remembered as missing, so it is looked up once.
+
+        Returns:
+            Author or None: The Author who wrote the article
+        """
+        if self._author is None and self._author_id is not None:
+            from .author import Author
+            author = Author.find_by_id(self._author_id)
+            self._author = _MISSING if author is None else author
+        return None if self._author is _MISSING else self._author
+
+    @author.setter
+    def author(self, value):
+        """
+        Set the article's author.
+
+        Args:
+            value (Author or int or None): The Author object, or an author ID to load lazily
+        """
+        if self._changes is not None:
+            record(self, "author_id", self.author_id)
+        if value is None or isinstance(value, int):
+            self._author, self._author_id = None, value
+        else:
+            self._author, self._author_id = value, value.id
+
+    @property
+    def magazine_id(self):
+        """
+        Get the ID of the article's magazine without loading the Magazine.
+
+        Returns:
+            int or None: The magazine's ID
+        """
+        return self._magazine_id if self._magazine is None or self._magazine is _MISSING else self._magazine.id
+
+    @property
+    def magazine(self):
+        """
+        Get the article's magazine, loading it from the database on first access.
+        A magazine ID with no matching row is remembered as missing, so it is looked up once.
+
+        Returns:
+            Magazine or None: The Magazine publishing the article
+        """
+        if self._magazine is None and self._magazine_id is not None:
+            from .magazine import Magazine
+            magazine = Magazine.find_by_id(self._magazine_id)
+            self._magazine = _MISSING if magazine is None else magazine
+        return None if self._magazine is _MISSING else self._magazine
+
+    @magazine.setter
+    def magazine(self, value):
+        """
+        Set the article's magazine.
+
+        Args:
+            value (Magazine or int or None): The Magazine object, or a magazine ID to load lazily
+        """
+        if self._changes is not None:
+            record(self, "magazine_id", self.magazine_id)
+        if value is None or isinstance(value, int):
+            self._magazine, self._magazine_id = None, value
+        else:
+            self._magazine, self._magazine_id = value, value.id
+
     @classmethod
     def new_from_db(cls, row):
         """
-        Create an Article instance from a database row, loading related objects.
+        Create an Article instance from a database row.
 
-        This method unpacks the database row, looks up the associated Author
-        and Magazine objects by their IDs, and creates a fully populated Article instance.
+        The associated Author and Magazine are not queried here; they are
+        loaded lazily the first time .author or .magazine is accessed.
+
+        Content is not part of the row either and is loaded on first access.
 
         Args:
-            row (tuple): Database row containing (id, title, content, author_id, magazine_id)
+            row (tuple): Database row containing ARTICLE_COLUMNS (id, title, author_id, magazine_id)
 
         Returns:
-            Article: New Article instance with loaded author and magazine objects
+            Article: Article instance with data from the row, or the instance already
+            cached for this ID
+        """
+        cached = lookup(cls, row[0], count=False)
+        if cached is not None:
+            return cached
+        article = cls(row[0], row[1], _NOT_LOADED, row[2], row[3])
+        return register(mark_clean(article))
+
+    @classmethod
+    def new_from_rows(cls, rows, author=None, magazine=None, prefetch=False):
+        """
+        Create Article instances from database rows.
+
+        Related objects are loaded lazily by default. With prefetch=True the
+        distinct authors and magazines of all rows are loaded up front with one
+        query per table, so touching .author/.magazine on every article costs a
+        constant number of queries instead of one per row.
+
+        Args:
+            rows (list[tuple]): Database rows containing ARTICLE_COLUMNS (id, title, author_id, magazine_id)
+            author (Author, optional): Author already known to have written every row
+            magazine (Magazine, optional): Magazine already known to publish every row
+            prefetch (bool): Whether to batch-load the related authors and magazines
+
+        Returns:
+            list[Article]: Article instances for the rows, in order
+        """
+        articles = [cls.new_from_db(row) for row in rows]
+        for article in articles:
+            if author is not None and article.author_id == author.id:
+                article.author = author
+            if magazine is not None and article.magazine_id == magazine.id:
+                article.magazine = magazine
+        if prefetch:
+            cls.prefetch(articles)
+        return articles
+
+    @classmethod
+    def prefetch(cls, articles):
+        """
+        Load the authors and magazines of many articles with one query per table.
+
+        Args:
+            articles (list[Article]): Articles whose relations should be loaded eagerly
+
+        Returns:
+            list[Article]: The same articles
         """
         from .author import Author
         from .magazine import Magazine
-        id, title, content, author_id, magazine_id = row
-        author = Author.find_by_id(author_id)
-        magazine = Magazine.find_by_id(magazine_id)
-        return cls(id, title, content, author, magazine)
+        authors = Author.find_by_ids(a._author_id for a in articles if a._author is None)
+        magazines = Magazine.find_by_ids(a._magazine_id for a in articles if a._magazine is None)
+        for article in articles:
+            if article._author is None and article._author_id is not None:
+                article._author = authors.get(article._author_id, _MISSING)
+            if article._magazine is None and article._magazine_id is not None:
+                article._magazine = magazines.get(article._magazine_id, _MISSING)
+        return articles
+
+    @classmethod
+    def prefetch_content(cls, articles):
+        """
+        Load the content of many articles with one query per chunk of IDs.
+
+        Args:
+            articles (list[Article]): Articles whose content should be loaded eagerly
+
+        Returns:
+            list[Article]: The same articles
+        """
+        database = current_database()
+        by_shard = {}
+        for article in articles:
+            if article._content is _NOT_LOADED:
+                by_shard.setdefault(database.shard_for_article(article.id), []).append(article)
+        for shard, pending in by_shard.items():
+            with shard.connection() as conn:
+                contents = cls._fetch_contents(conn, [a.id for a in pending])
+            for article in pending:
+                article._content = contents.get(article.id, "")
+        return articles
+
+    @staticmethod
+    def _fetch_contents(conn, ids):
+        """Returns {article id: content} for the given IDs; articles without content are absent."""
+        contents = {}
+        for chunk in chunked(ids):
+            rows = conn.execute("SELECT article_id, body, compressed FROM article_contents "
+                                f"WHERE article_id IN ({', '.join('?' * len(chunk))})", chunk)
+            for article_id, body, compressed in rows:
+                contents[article_id] = decode_content(body, compressed)
+        return contents
+
+    @staticmethod
+    def _write_contents(conn, items):
+        """
+        Stores content for (article id, content, is new) items. Empty content is stored as
+        no row at all, so only existing articles need their row deleted.
+        """
+        upserts, deletes = [], []
+        for id, content, new in items:
+            if content:
+                upserts.append((id, *encode_content(content)))
+            elif not new:
+                deletes.append((id,))
+        if upserts:
+            conn.executemany("INSERT INTO article_contents (article_id, compressed, body) VALUES (?, ?, ?) "
+                             "ON CONFLICT (article_id) DO UPDATE SET compressed = excluded.compressed, body = excluded.body",
+                             upserts)
+        if deletes:
+            conn.executemany("DELETE FROM article_contents WHERE article_id = ?", deletes)
+
+    @classmethod
+    def where(cls, **filters):
+        """
+        Start a lazy query over the articles, e.g. `Article.where(magazine=magazine).order_by("-id").limit(20)`.
+
+        Nothing is run until the result is iterated or counted; see lib.query.
+
+        Args:
+            **filters: `field=value` or `field__lookup=value` conditions, combined with AND
+
+        Returns:
+            QuerySet: The query
+
+        Raises:
+            ValueError: If a field or lookup is unknown
+        """
+        return QuerySet(cls, "articles").where(**filters)
 
     @classmethod
     def find_by_id(cls, id):
@@ -81,11 +400,13 @@ class Article:
         Returns:
             Article or None: Article instance if found, None otherwise
         """
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM articles WHERE id = ?", (id,))
-        row = cursor.fetchone()
-        conn.close()
+        cached = lookup(cls, id)
+        if cached is not None:
+            return cached
+        with routed(article_id=id), get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT {ARTICLE_COLUMNS} FROM articles WHERE id = ?", (id,))
+            row = cursor.fetchone()
         if row:
             return cls.new_from_db(row)
         return None
@@ -95,19 +416,310 @@ class Article:
         Save the article to the database.
 
         Stores the article's data and uses the IDs of the associated author
-        and magazine objects for the foreign key relationships.
+        and magazine for the foreign key relationships, without loading them.
         If the article is new (id is None), performs an INSERT operation.
         If the article exists (id is set), performs an UPDATE operation.
         Sets the id attribute for new articles after insertion.
+        Content is written to article_contents only if it was loaded or set on
+        this instance, so saving a listed article never rewrites its content.
+        An article loaded from or saved to the database only writes the columns
+        (and content) changed since, and is not written at all if none changed.
+        The saved instance becomes the cached instance for its ID.
+        Commits immediately, unless called inside a transaction() block, whose
+        single commit it joins. On a sharded database it is written to the shard
+        of its magazine.
+
+        Raises:
+            ValueError: If a saved article is moved to a magazine on another shard
         """
-        conn = get_connection()
-        cursor = conn.cursor()
-        try:
-            if self.id is None:
-                cursor.execute("INSERT INTO articles (title, content, author_id, magazine_id) VALUES (?, ?, ?, ?)", (self.title, self.content, self.author.id, self.magazine.id))
+        shard = self._check_shard(current_database())
+        values = self._tracked_values()
+        columns = None
+        if self.id is not None:
+            columns = changed(self, values)
+            count(columns, len(values))
+            if columns == ():
+                register(self)
+                return
+        with routed(magazine_id=self.magazine_id), transaction() as conn:
+            cursor = conn.cursor()
+            if relation_cache_enabled():
+                self._invalidate_relations(conn, [self])
+            new = self.id is None
+            if new:
+                cursor.execute("INSERT INTO articles (id, title, author_id, magazine_id) VALUES (?, ?, ?, ?)",
+                               (shard.new_id(cursor, "articles"), self.title, self.author_id, self.magazine_id))
                 self.id = cursor.lastrowid
+                conn.on_rollback(lambda: detach(self))
+                count_inserts(1)
             else:
-                cursor.execute("UPDATE articles SET title = ?, content = ?, author_id = ?, magazine_id = ? WHERE id = ?", (self.title, self.content, self.author.id, self.magazine.id, self.id))
-            conn.commit()
+                conn.on_rollback(lambda: evict(type(self), self.id))
+                values["title"] = self.title
+                row_columns = ("title", "author_id", "magazine_id") if columns is None else \
+                    tuple(column for column in columns if column != "content")
+                if row_columns:
+                    cursor.execute(f"UPDATE articles SET {', '.join(f'{column} = ?' for column in row_columns)} WHERE id = ?",
+                                   (*(values[column] for column in row_columns), self.id))
+            if self._content is not _NOT_LOADED and (columns is None or "content" in columns):
+                self._write_contents(conn, [(self.id, self._content, new)])
+            mark_clean(self, conn)
+        register(self)
+
+    def _tracked_values(self):
+        """Returns the current value of each column save() may write, including content if it is loaded."""
+        values = {"author_id": self.author_id, "magazine_id": self.magazine_id}
+        if self._content is not _NOT_LOADED:
+            values["content"] = self._content
+        return values
+
+    def _check_shard(self, database):
+        """Returns the shard this article is written to, checking that it does not move."""
+        shard = database.shard_for_magazine(self.magazine_id)
+        if self.id is not None and database.shard_for_article(self.id) is not shard:
+            raise ValueError(f"Article {self.id} cannot move to magazine {self.magazine_id} on another shard")
+        return shard
+
+    @classmethod
+    def _invalidate_relations(cls, conn, articles):
+        """
+        Invalidates the cached relationship results of the authors and magazines the
+        given articles are about to be written to, and of those they currently belong to.
+
+        Args:
+            conn: The transaction's connection, used to read the stored rows
+            articles (list[Article or tuple]): Articles or bulk_create() tuples about to be written
+        """
+        tags = set()
+        existing = []
+        for article in articles:
+            if isinstance(article, tuple):
+                article = cls(None, *article)
+            tags.add(("author_articles", article.author_id))
+            tags.add(("magazine_articles", article.magazine_id))
+            if article.id is not None:
+                existing.append(article.id)
+        for ids in chunked(existing):
+            rows = conn.execute(f"SELECT author_id, magazine_id FROM articles WHERE id IN ({', '.join('?' * len(ids))})", ids)
+            for author_id, magazine_id in rows:
+                tags.add(("author_articles", author_id))
+                tags.add(("magazine_articles", magazine_id))
+        invalidate(*tags)
+
+    @classmethod
+    def bulk_create(cls, articles, chunk_size=BULK_CHUNK_SIZE):
+        """
+        Save many articles in a single transaction using batched executemany() calls.
+
+        Tuples are (title, content, author, magazine), where author and magazine
+        may be model instances or plain IDs. New Article instances are assigned
+        their generated IDs. The counters and the search index are updated once
+        per chunk of inserted articles rather than by the per-row triggers.
+        On a sharded database the articles are grouped by shard and written in
+        one transaction per shard.
+
+        Args:
+            articles (iterable[Article or tuple]): Articles to insert (or update, if they have an id)
+            chunk_size (int): Number of rows sent to SQLite per batch
+
+        Returns:
+            int: Number of articles written
+
+        Raises:
+            ValueError: If a tuple contains an invalid title, or a saved article is moved
+                to a magazine on another shard
+        """
+        database = current_database()
+        if len(database.shards) > 1:
+            by_shard = {}
+            for article in articles:
+                if isinstance(article, tuple):
+                    shard = database.shard_for_magazine(cls(None, *article).magazine_id)
+                else:
+                    shard = article._check_shard(database)
+                by_shard.setdefault(shard, []).append(article)
+            written = 0
+            with transaction():
+                for shard, group in by_shard.items():
+                    with using(shard):
+                        written += cls.bulk_create(group, chunk_size)
+            return written
+
+        def values(article):
+            if isinstance(article, tuple):
+                article = cls(None, *article)
+            return (article.title, article.author_id, article.magazine_id)
+
+        def changes(article):
+            current = article._tracked_values()
+            columns = changed(article, current)
+            count(columns, len(current))
+            return None if columns is None else tuple(column for column in columns if column != "content")
+
+        def write_contents(conn, chunk, ids):
+            items = []
+            for article, id in zip(chunk, ids):
+                if isinstance(article, tuple):
+                    items.append((id, article[1], True))
+                elif article._content is not _NOT_LOADED and changed(article, {"content": article._content}) != ():
+                    items.append((id, article._content, False))
+            cls._write_contents(conn, items)
+        return save_objects("articles", ("title", "author_id", "magazine_id"), articles, values, chunk_size,
+                            cls._invalidate_relations if relation_cache_enabled() else None, write_contents, changes,
+                            cls._bulk_inserted)
+
+    @staticmethod
+    @contextmanager
+    def _bulk_inserted(conn, first_id, last_id):
+        """
+        Suspends the per-row insert triggers for articles with IDs in [first_id, last_id] (see
+        migration 9) while they and their content are written, then updates the counters and
+        the search index for all of them with one aggregated statement each.
+        """
+        conn.execute("INSERT INTO article_bulk_inserts (first_id, last_id) VALUES (?, ?)", (first_id, last_id))
+        try:
+            yield
+            conn.execute("""
+                INSERT INTO magazine_article_counts (magazine_id, article_count)
+                SELECT magazine_id, COUNT(*) FROM articles
+                WHERE id BETWEEN ?1 AND ?2 AND magazine_id IS NOT NULL GROUP BY magazine_id
+                ON CONFLICT (magazine_id) DO UPDATE SET article_count = article_count + excluded.article_count
+            """, (first_id, last_id))
+            conn.execute("""
+                INSERT INTO magazine_author_counts (magazine_id, author_id, article_count)
+                SELECT magazine_id, author_id, COUNT(*) FROM articles
+                WHERE id BETWEEN ?1 AND ?2 AND magazine_id IS NOT NULL AND author_id IS NOT NULL
+                GROUP BY magazine_id, author_id
+                ON CONFLICT (magazine_id, author_id) DO UPDATE SET article_count = article_count + excluded.article_count
+            """, (first_id, last_id))
+            conn.execute("""
+                INSERT INTO author_article_counts (author_id, article_count)
+                SELECT author_id, COUNT(*) FROM articles
+                WHERE id BETWEEN ?1 AND ?2 AND author_id IS NOT NULL GROUP BY author_id
+                ON CONFLICT (author_id) DO UPDATE SET article_count = article_count + excluded.article_count
+            """, (first_id, last_id))
+            conn.execute("INSERT INTO articles_fts (rowid, title, content) "
+                         "SELECT id, title, content FROM article_search_source WHERE id BETWEEN ?1 AND ?2",
+                         (first_id, last_id))
         finally:
-            conn.close()
+            conn.execute("DELETE FROM article_bulk_inserts WHERE first_id = ?", (first_id,))
+
+    @classmethod
+    def search(cls, query, magazine=None, author=None, limit=PAGE_SIZE, offset=0):
+        """
+        Full-text search over article titles and content, best matches first.
+
+        The query uses FTS5 syntax: bare words must all match, and phrases ("..."), OR, NOT,
+        prefixes (word*) and column filters (title: word) are supported. Results are ranked
+        by bm25 and can be restricted to one magazine and/or author. On a sharded database
+        a magazine's search runs on its shard; otherwise every shard is searched and the
+        matches merged by score, each shard scoring against its own articles.
+
+        Args:
+            query (str): The FTS5 search expression
+            magazine (Magazine or int, optional): Only return articles in this magazine
+            author (Author or int, optional): Only return articles by this author
+            limit (int): Maximum number of articles to return
+            offset (int): Number of matches to skip, for pagination
+
+        Returns:
+            list[Article]: Matching Article instances in rank order
+
+        Raises:
+            ValueError: If the query is not a valid FTS5 expression
+        """
+        sql = (f"SELECT {ARTICLE_COLUMNS}, bm25(articles_fts) FROM articles_fts JOIN articles ON articles.id = articles_fts.rowid "
+               "WHERE articles_fts MATCH ?")
+        params = [query]
+        if magazine is not None:
+            sql += " AND articles.magazine_id = ?"
+            params.append(magazine if isinstance(magazine, int) else magazine.id)
+        if author is not None:
+            sql += " AND articles.author_id = ?"
+            params.append(author if isinstance(author, int) else author.id)
+        sql += " ORDER BY bm25(articles_fts), articles.id LIMIT ? OFFSET ?"
+
+        def load(limit, offset):
+            with get_connection() as conn:
+                cls._check_search_query(conn, query)
+                cursor = conn.cursor()
+                cursor.execute(sql, params + [limit, offset])
+                return cursor.fetchall()
+        if magazine is not None:
+            with routed(magazine_id=params[1]):
+                return cls.new_from_rows(load(limit, offset))
+        results = scatter(load, limit + offset, 0) if len(current_database().shards) > 1 else [load(limit, offset)]
+        if len(results) == 1:
+            return cls.new_from_rows(results[0])
+        merged = heapq.merge(*results, key=lambda row: (row[-1], row[0]))
+        return cls.new_from_rows([row[:-1] for row in merged][offset:offset + limit])
+
+    @staticmethod
+    def _check_search_query(conn, query):
+        """
+        Raises ValueError if `query` is not a valid FTS5 expression. The expression is parsed
+        by a lookup that reads nothing but the index, so the errors it can raise are about
+        the query; errors from the search itself, such as a broken schema, are not mistaken
+        for a bad query.
+        """
+        try:
+            conn.execute("SELECT rowid FROM articles_fts WHERE articles_fts MATCH ? LIMIT 1", (query,)).fetchall()
+        except sqlite3.OperationalError as e:
+            if str(e).startswith(("fts5:", "unterminated string", "no such column")):
+                raise ValueError(f"Invalid search query {query!r}: {e}") from None
+            raise
+
+    @classmethod
+    async def afind_by_id(cls, id):
+        """
+        Async version of find_by_id(), run on the read executor.
+
+        Returns:
+            Article or None: Article instance if found, None otherwise
+        """
+        return await run_read(cls.find_by_id, id)
+
+    async def asave(self):
+        """
+        Async version of save(), run on the serialized writer thread.
+        """
+        await run_write(self.save)
+
+    @classmethod
+    async def abulk_create(cls, articles, chunk_size=BULK_CHUNK_SIZE):
+        """
+        Async version of bulk_create(), run on the serialized writer thread.
+
+        Returns:
+            int: Number of articles written
+        """
+        return await run_write(cls.bulk_create, list(articles), chunk_size)
+
+    @classmethod
+    async def aprefetch(cls, articles):
+        """
+        Async version of prefetch(), run on the read executor.
+
+        Returns:
+            list[Article]: The same articles, with authors and magazines loaded
+        """
+        return await run_read(cls.prefetch, articles)
+
+    @classmethod
+    async def aprefetch_content(cls, articles):
+        """
+        Async version of prefetch_content(), run on the read executor.
+
+        Returns:
+            list[Article]: The same articles, with content loaded
+        """
+        return await run_read(cls.prefetch_content, articles)
+
+    @classmethod
+    async def asearch(cls, query, magazine=None, author=None, limit=PAGE_SIZE, offset=0):
+        """
+        Async version of search(), run on the read executor.
+
+        Returns:
+            list[Article]: Matching Article instances in rank order
+        """
+        return await run_read(cls.search, query, magazine, author, limit, offset)
@@ -0,0 +1,98 @@
+"""
+Executors backing the asyncio API of the magazine database models.
+
+The sqlite3 module is synchronous, so the async model methods (afind_by_id,
+aarticles, asave, ...) run their synchronous counterparts off the event loop:
+
+- reads go to a bounded thread pool, so many coroutines can query in parallel;
+- writes go to a single-threaded executor that acts as a serialized writer
+  queue, so concurrent saves never contend for SQLite's write lock.
+
+The read pool is sized below the connection pool so every worker (plus the
+writer) can always check out a connection. Work runs against the database
+that was active (see database_utils.current_database()) in the calling thread.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .database_utils import POOL_SIZE, current_database, using
+
+# Default number of threads serving concurrent reads
+READ_WORKERS = POOL_SIZE - 1
+
+_read_executor = None
+_write_executor = None
+_lock = threading.Lock()
+
+
+def configure_executors(read_workers=READ_WORKERS):
+    """
+    Replaces the read and write executors, waiting for queued work on the old ones.
+
+    Args:
+        read_workers (int): Maximum number of concurrent read threads
+    """
+    global _read_executor, _write_executor
+    if read_workers < 1:
+        raise ValueError("At least one read worker is required")
+    shutdown_executors()
+    with _lock:
+        _read_executor = ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix="magazine-db-read")
+        _write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="magazine-db-write")
+
+
+def shutdown_executors():
+    """
+    Shuts down both executors after their queued work completes.
+    New executors are created on the next async call.
+    """
+    global _read_executor, _write_executor
+    with _lock:
+        executors = (_read_executor, _write_executor)
+        _read_executor = _write_executor = None
+    for executor in executors:
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+def _executors():
+    global _read_executor, _write_executor
+    with _lock:
+        if _read_executor is None:
+            _read_executor = ThreadPoolExecutor(max_workers=READ_WORKERS, thread_name_prefix="magazine-db-read")
+            _write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="magazine-db-write")
+        return _read_executor, _write_executor
+
+
+def _bound(fn, args, kwargs):
+    database = current_database()
+
+    def call():
+        with using(database):
+            return fn(*args, **kwargs)
+    return call
+
+
+async def run_read(fn, *args, **kwargs):
+    """
+    Runs a synchronous read on the read executor without blocking the event loop.
+
+    Returns:
+        The return value of fn(*args, **kwargs)
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executors()[0], _bound(fn, args, kwargs))
+
+
+async def run_write(fn, *args, **kwargs):
+    """
+    Queues a synchronous write on the single writer thread without blocking the event loop.
+    Writes run one at a time in submission order.
+
+    Returns:
+        The return value of fn(*args, **kwargs)
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executors()[1], _bound(fn, args, kwargs))
@@ -3,9 +3,16 @@ Author module for managing author entities in the magazine database.
 
 This module defines the Author class, which represents an author in the system.
 Authors have a name and can be associated with articles and magazines through relationships.
+An author's articles can span every shard of a sharded database, so the
+relationship queries scatter to all shards and merge the results.
 """
 
-from .database_utils import get_connection
+from .database_utils import (get_connection, transaction, chunked, iter_pages, save_objects, current_database, scatter,
+                             rank_totals, fetch_ranked, BULK_CHUNK_SIZE, PAGE_SIZE)
+from .cache import lookup, register, detach, evict, cached_relation, invalidate, relation_cache_enabled
+from .async_utils import run_read, run_write
+from .query import QuerySet
+from .tracking import changed, count, count_inserts, mark_clean
 
 class Author:
     """
@@ -16,6 +23,8 @@ class Author:
     and have relationships to their articles and the magazines they've contributed to.
     """
 
+    __slots__ = ("id", "_name", "_changes")
+
     def __init__(self, id, name):
         """
         Initialize a new Author instance.
@@ -31,6 +40,7 @@ class Author:
             raise ValueError("Name must be a non-empty string")
         self.id = id
         self._name = name
+        self._changes = None
 
     @property
     def name(self):
@@ -51,9 +61,31 @@ class Author:
             row (tuple): Database row containing (id, name)
 
         Returns:
-            Author: New Author instance with data from the row
+            Author: Author instance with data from the row, or the instance already
+            cached for this ID
+        """
+        cached = lookup(cls, row[0], count=False)
+        if cached is not None:
+            return cached
+        return register(mark_clean(cls(*row)))
+
+    @classmethod
+    def where(cls, **filters):
+        """
+        Start a lazy query over the authors, e.g. `Author.where(name__startswith="A").count()`.
+
+        Nothing is run until the result is iterated or counted; see lib.query.
+
+        Args:
+            **filters: `field=value` or `field__lookup=value` conditions, combined with AND
+
+        Returns:
+            QuerySet: The query
+
+        Raises:
+            ValueError: If a field or lookup is unknown
         """
-        return cls(*row)
+        return QuerySet(cls, "authors").where(**filters)
 
     @classmethod
     def find_by_id(cls, id):
@@ -66,49 +98,144 @@ class Author:
         Returns:
             Author or None: Author instance if found, None otherwise
         """
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM authors WHERE id = ?", (id,))
-        row = cursor.fetchone()
-        conn.close()
+        cached = lookup(cls, id)
+        if cached is not None:
+            return cached
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM authors WHERE id = ?", (id,))
+            row = cursor.fetchone()
         if row:
             return cls.new_from_db(row)
         return None
 
+    @classmethod
+    def find_by_ids(cls, ids):
+        """
+        Find several authors by ID using one `IN (...)` query per chunk of IDs.
+
+        Args:
+            ids (iterable[int]): The author IDs to look up (duplicates and None are ignored)
+
+        Returns:
+            dict[int, Author]: Author instances keyed by ID; missing IDs are absent
+        """
+        found = {}
+        wanted = set()
+        for id in ids:
+            if id is None or id in found or id in wanted:
+                continue
+            cached = lookup(cls, id)
+            if cached is not None:
+                found[id] = cached
+            else:
+                wanted.add(id)
+        if not wanted:
+            return found
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            for chunk in chunked(wanted):
+                placeholders = ", ".join("?" * len(chunk))
+                cursor.execute(f"SELECT * FROM authors WHERE id IN ({placeholders})", chunk)
+                for row in cursor.fetchall():
+                    found[row[0]] = cls.new_from_db(row)
+        return found
+
     def save(self):
         """
         Save the author to the database.
 
         If the author is new (id is None), performs an INSERT operation.
-        If the author exists (id is set), performs an UPDATE operation.
+        If the author exists (id is set), performs an UPDATE operation, unless it
+        was loaded from or saved to the database: its name is read-only, so such
+        an author is never written again.
         Sets the id attribute for new authors after insertion.
+        The saved instance becomes the cached instance for its ID.
+        Commits immediately, unless called inside a transaction() block, whose
+        single commit it joins.
         """
-        conn = get_connection()
-        cursor = conn.cursor()
-        try:
+        if self.id is not None:
+            columns = changed(self, {"name": self.name})
+            count(columns, 1)
+            if columns == ():
+                register(self)
+                return
+        with transaction() as conn:
+            cursor = conn.cursor()
             if self.id is None:
                 cursor.execute("INSERT INTO authors (name) VALUES (?)", (self.name,))
                 self.id = cursor.lastrowid
+                conn.on_rollback(lambda: detach(self))
+                count_inserts(1)
             else:
                 cursor.execute("UPDATE authors SET name = ? WHERE id = ?", (self.name, self.id))
-            conn.commit()
-        finally:
-            conn.close()
+                invalidate(("author", self.id))
+                conn.on_rollback(lambda: evict(type(self), self.id))
+            mark_clean(self, conn)
+        register(self)
+
+    @classmethod
+    def save_many(cls, authors, chunk_size=BULK_CHUNK_SIZE):
+        """
+        Save many authors in a single transaction using batched executemany() calls.
+
+        Args:
+            authors (iterable[Author or tuple]): Author instances, or (name,) tuples for new rows
+            chunk_size (int): Number of rows sent to SQLite per batch
+
+        Returns:
+            int: Number of authors written
+
+        Raises:
+            ValueError: If a tuple contains an invalid name
+        """
+        def values(author):
+            if isinstance(author, tuple):
+                author = cls(None, *author)
+            return (author.name,)
 
-    def articles(self):
+        def changes(author):
+            columns = changed(author, {"name": author.name})
+            count(columns, 1)
+            return columns
+
+        def invalidate_updated(conn, chunk):
+            invalidate(*(("author", a.id) for a in chunk if not isinstance(a, tuple) and a.id is not None))
+        return save_objects("authors", ("name",), authors, values, chunk_size,
+                            invalidate_updated if relation_cache_enabled() else None, changes=changes)
+
+    def iter_articles(self, batch_size=PAGE_SIZE, after_id=None, prefetch=False):
+        """
+        Stream the articles written by this author in ascending ID order.
+
+        Rows are fetched one keyset page of batch_size at a time, so memory use
+        does not grow with the number of articles. On a sharded database the
+        shards are paged through together and merged in ID order.
+
+        Args:
+            batch_size (int): Number of articles fetched per query
+            after_id (int, optional): Resume after the article with this ID
+            prefetch (bool): Whether to batch-load each page's magazines up front
+
+        Yields:
+            Article: Article instances written by this author
+        """
+        from .article import Article, ARTICLE_COLUMNS
+        for rows in iter_pages(f"SELECT {ARTICLE_COLUMNS} FROM articles WHERE author_id = ?", (self.id,), batch_size, after_id):
+            yield from Article.new_from_rows(rows, author=self, prefetch=prefetch)
+
+    def articles(self, prefetch=False):
         """
         Get all articles written by this author.
 
+        Args:
+            prefetch (bool): Whether to batch-load each article's magazine up front
+                instead of lazily on first access
+
         Returns:
             list[Article]: List of Article instances written by this author
         """
-        from .article import Article
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM articles WHERE author_id = ?", (self.id,))
-        rows = cursor.fetchall()
-        conn.close()
-        return [Article.new_from_db(row) for row in rows]
+        return list(self.iter_articles(prefetch=prefetch))
 
     def magazines(self):
         """
@@ -116,20 +243,30 @@ class Author:
 
         Uses a JOIN query to find distinct magazines through the author's articles.
 
+        The result is memoized when the relation cache is enabled, until this author's
+        articles or one of the magazines change.
+
         Returns:
             list[Magazine]: List of unique Magazine instances the author has written for
         """
         from .magazine import Magazine
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT DISTINCT magazines.* FROM magazines JOIN articles ON magazines.id = articles.magazine_id WHERE articles.author_id = ?", (self.id,))
-        rows = cursor.fetchall()
-        conn.close()
-        return [Magazine.new_from_db(row) for row in rows]
+
+        def query():
+            with get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT DISTINCT magazines.* FROM magazines JOIN articles ON magazines.id = articles.magazine_id WHERE articles.author_id = ?", (self.id,))
+                return cursor.fetchall()
+
+        def load():
+            rows = {row[0]: row for shard_rows in scatter(query) for row in shard_rows}
+            return [Magazine.new_from_db(row) for row in rows.values()]
+        return cached_relation(("Author.magazines", self.id), load,
+                               lambda magazines: [("author_articles", self.id)] + [("magazine", m.id) for m in magazines])
 
     def add_article(self, magazine, title):
         """
         Create and save a new article for this author in the given magazine.
+        Inside a transaction() block the insert is committed together with the block.
 
         Args:
             magazine (Magazine): The magazine to publish the article in
@@ -146,10 +283,188 @@ class Author:
     def topic_areas(self):
         """
         Get the unique categories (topic areas) of magazines this author has contributed to.
+        The categories are deduplicated by SQLite from the per-magazine article counters,
+        without loading Magazine objects. The result is memoized when the relation cache
+        is enabled, until this author's articles or any magazine change.
+
+        Returns:
+            list[str]: List of unique category names from the author's magazines, sorted
+        """
+        def query():
+            with get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT DISTINCT magazines.category FROM magazine_author_counts AS counts JOIN magazines ON magazines.id = counts.magazine_id WHERE counts.author_id = ? ORDER BY magazines.category", (self.id,))
+                return [row[0] for row in cursor.fetchall()]
+
+        def load():
+            results = scatter(query)
+            return results[0] if len(results) == 1 else sorted(set().union(*results))
+        return cached_relation(("Author.topic_areas", self.id), load,
+                               lambda categories: [("author_articles", self.id), ("magazines",)])
+
+    @classmethod
+    def topic_areas_map(cls, ids=None):
+        """
+        Get the topic areas of many authors at once.
+
+        Answers for every author (or the given ones) with a single grouped query per
+        chunk of IDs over the per-magazine article counters, instead of one
+        topic_areas() query per author.
+
+        Args:
+            ids (iterable[int], optional): The authors to include; all authors by default
+
+        Returns:
+            dict[int, list[str]]: Sorted unique categories keyed by author ID; authors
+            without articles map to an empty list, and unknown IDs are absent
+        """
+        sql = ("SELECT DISTINCT authors.id, magazines.category FROM authors "
+               "LEFT JOIN magazine_author_counts AS counts ON counts.author_id = authors.id "
+               "LEFT JOIN magazines ON magazines.id = counts.magazine_id")
+        order = " ORDER BY authors.id, magazines.category"
+        if ids is None:
+            queries = [(sql + order, ())]
+        else:
+            chunks = chunked({id for id in ids if id is not None})
+            queries = ((f"{sql} WHERE authors.id IN ({', '.join('?' * len(chunk))}){order}", chunk) for chunk in chunks)
+        queries = list(queries)
+        result = {}
+
+        def load():
+            with get_connection() as conn:
+                cursor = conn.cursor()
+                for query, params in queries:
+                    cursor.execute(query, params)
+                    for author_id, category in cursor:
+                        categories = result.setdefault(author_id, [])
+                        if category is not None:
+                            categories.append(category)
+        if len(scatter(load)) > 1:
+            for author_id, categories in result.items():
+                result[author_id] = sorted(set(categories))
+        return result
+
+    @classmethod
+    def most_prolific(cls, n=10, offset=0, after=None):
+        """
+        Rank authors by article count, most articles first.
+
+        Walks the count index of author_article_counts, loading each author in the same
+        query. Tied authors share a rank (1, 2, 2, 4, ...) and are ordered by id. Deep
+        pages are cheapest with `after`, which resumes right after the previous page's
+        last entry instead of skipping `offset` entries (see fetch_ranked()). On a sharded
+        database, where an author's articles span shards, every shard's counters are
+        read and added up before ranking.
+
+        Args:
+            n (int): Maximum number of entries to return
+            offset (int): Number of entries to skip, for pagination
+            after (tuple, optional): The last (author, article count, rank) entry of the previous page
+
+        Returns:
+            list[tuple[Author, int, int]]: (author, article count, rank) tuples
+        """
+        cursor = None if after is None else (after[0].id, after[1], after[2])
+        if len(current_database().shards) == 1:
+            with get_connection() as conn:
+                rows = fetch_ranked(conn, "authors", "author_article_counts", "author_id", n, offset, cursor)
+            return [(cls.new_from_db(row[:-2]), row[-2], row[-1]) for row in rows]
+
+        def load():
+            with get_connection() as conn:
+                return conn.execute("SELECT author_id, article_count FROM author_article_counts").fetchall()
+        ranked = rank_totals(scatter(load), n, offset, cursor)
+        authors = cls.find_by_ids(id for id, _, _ in ranked)
+        return [(authors[id], count, rank) for id, count, rank in ranked]
+
+    @classmethod
+    async def afind_by_id(cls, id):
+        """
+        Async version of find_by_id(), run on the read executor.
+
+        Returns:
+            Author or None: Author instance if found, None otherwise
+        """
+        return await run_read(cls.find_by_id, id)
+
+    @classmethod
+    async def afind_by_ids(cls, ids):
+        """
+        Async version of find_by_ids(), run on the read executor.
+
+        Returns:
+            dict[int, Author]: Author instances keyed by ID
+        """
+        return await run_read(cls.find_by_ids, list(ids))
+
+    async def asave(self):
+        """
+        Async version of save(), run on the serialized writer thread.
+        """
+        await run_write(self.save)
+
+    @classmethod
+    async def asave_many(cls, authors, chunk_size=BULK_CHUNK_SIZE):
+        """
+        Async version of save_many(), run on the serialized writer thread.
+
+        Returns:
+            int: Number of authors written
+        """
+        return await run_write(cls.save_many, list(authors), chunk_size)
+
+    async def aarticles(self, prefetch=False):
+        """
+        Async version of articles(), run on the read executor.
+
+        Returns:
+            list[Article]: List of Article instances written by this author
+        """
+        return await run_read(self.articles, prefetch)
+
+    async def amagazines(self):
+        """
+        Async version of magazines(), run on the read executor.
+
+        Returns:
+            list[Magazine]: List of unique Magazine instances the author has written for
+        """
+        return await run_read(self.magazines)
+
+    async def aadd_article(self, magazine, title):
+        """
+        Async version of add_article(), run on the serialized writer thread.
+
+        Returns:
+            Article: The newly created and saved Article instance
+        """
+        return await run_write(self.add_article, magazine, title)
+
+    async def atopic_areas(self):
+        """
+        Async version of topic_areas(), run on the read executor.
 
         Returns:
             list[str]: List of unique category names from the author's magazines
         """
-        magazines = self.magazines()
-        categories = set(m.category for m in magazines)
-        return list(categories)
+        return await run_read(self.topic_areas)
+
+    @classmethod
+    async def amost_prolific(cls, n=10, offset=0, after=None):
+        """
+        Async version of most_prolific(), run on the read executor.
+
+        Returns:
+            list[tuple[Author, int, int]]: (author, article count, rank) tuples
+        """
+        return await run_read(cls.most_prolific, n, offset, after)
+
+    @classmethod
+    async def atopic_areas_map(cls, ids=None):
+        """
+        Async version of topic_areas_map(), run on the read executor.
+
+        Returns:
+            dict[int, list[str]]: Sorted unique categories keyed by author ID
+        """
+        return await run_read(cls.topic_areas_map, None if ids is None else list(ids))
@@ -0,0 +1,451 @@
+"""
+Object caching for the magazine database models.
+
+This module provides two layers that let repeated lookups of the same row
+return the same Python object without going back to SQLite:
+
+- a session-scoped identity map, active inside a `with session():` block,
+  which guarantees one instance per (model, id) for the lifetime of the block;
+- an optional process-wide LRU cache, disabled by default and enabled with
+  configure_object_cache(maxsize).
+
+Models consult lookup() before querying and call register() whenever they
+build or save an instance, which keeps both layers coherent with save().
+
+A third, optional layer memoizes the results of relationship methods such as
+Magazine.contributors(). Each result records the tags it depends on, e.g.
+("magazine_articles", 3) or ("author", 7); writes call invalidate() with the
+tags they touch, which makes exactly the dependent results stale.
+
+Entries are kept per database: keys and tags of any database other than the
+default one are prefixed with its cache_scope (see database_utils.Database),
+so databases used side by side never share cached objects or results.
+"""
+
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from .database_utils import current_database, current_transaction
+
+
+class LRUCache:
+    """
+    A thread-safe bounded mapping that evicts the least recently used entry.
+
+    A maxsize of 0 disables the cache: nothing is stored and every lookup misses.
+    Hit and miss counters are kept for every get().
+    """
+
+    def __init__(self, maxsize=0):
+        if maxsize < 0:
+            raise ValueError("Cache size must not be negative")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None, count=True):
+        """
+        Return the value stored under key, marking it most recently used.
+
+        Args:
+            key: The cache key
+            default: Value returned if the key is absent
+            count (bool): Whether to record the lookup in the hit/miss counters
+
+        Returns:
+            The cached value or default
+        """
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                if count:
+                    self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            if count:
+                self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """
+        Store value under key, evicting the least recently used entry if full.
+        """
+        if self.maxsize == 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard(self, key):
+        """Remove key from the cache if present."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def rewrite(self, fn):
+        """
+        Replaces every value with fn(key, value), or removes it if that returns None,
+        without changing the recency order.
+        """
+        with self._lock:
+            for key, value in list(self._data.items()):
+                value = fn(key, value)
+                if value is None:
+                    del self._data[key]
+                else:
+                    self._data[key] = value
+
+    def clear(self):
+        """Remove every entry and reset the hit and miss counters."""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        Returns:
+            dict: The cache's size, maxsize, hits and misses
+        """
+        return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+class RelationCache:
+    """
+    A bounded LRU cache of relationship results, invalidated by dependency tags.
+
+    Every invalidate() advances a global generation and stamps each given tag with
+    it. An entry remembers the generation current when its query started, and is
+    stale once any of its tags has been stamped since, so a write that lands while
+    the query runs can never leave a stale result behind. A maxsize of 0 disables it.
+
+    Stamps are pruned once there are more than stamp_limit of them, so invalidating ever
+    new tags does not grow memory: stale entries are dropped, fresh ones are moved to the
+    current generation, and every stamp is forgotten. Tags without a stamp count as
+    stamped at the generation of the last prune, so a query that was already running
+    then is treated as stale.
+    """
+
+    def __init__(self, maxsize=0):
+        self._entries = LRUCache(maxsize)
+        # (floor generation, {tag: generation}), replaced as a whole when pruned
+        self._stamps = (0, {})
+        self.stamp_limit = max(1024, 4 * maxsize)
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def maxsize(self):
+        return self._entries.maxsize
+
+    def get(self, key, default=None):
+        """
+        Returns the result stored under key, or default if it is absent or stale.
+        """
+        with self._lock:
+            entry = self._entries.get(key, count=False)
+            if entry is not None:
+                generation, tags, value = entry
+                floor, stamps = self._stamps
+                if all(stamps.get(tag, floor) <= generation for tag in tags):
+                    self.hits += 1
+                    return value
+                self._entries.discard(key)
+            self.misses += 1
+            return default
+
+    def put(self, key, generation, tags, value):
+        """
+        Stores value, computed by a query that started at `generation`, under key.
+        """
+        self._entries.put(key, (generation, tuple(tags), value))
+
+    def invalidate(self, tags):
+        """Makes every entry depending on one of the tags stale."""
+        with self._lock:
+            self.generation += 1
+            stamps = self._stamps[1]
+            for tag in tags:
+                stamps[tag] = self.generation
+            self.invalidations += 1
+            if len(stamps) > self.stamp_limit:
+                self._prune()
+
+    def _prune(self):
+        # Called with the lock held
+        floor, stamps = self._stamps
+        current = self.generation
+
+        def rebase(key, entry):
+            generation, tags, value = entry
+            if all(stamps.get(tag, floor) <= generation for tag in tags):
+                return (current, tags, value)
+            return None
+        self._entries.rewrite(rebase)
+        self._stamps = (current, {})
+
+    def clear(self):
+        """Remove every entry and reset the counters."""
+        self._entries.clear()
+        with self._lock:
+            self._stamps = (0, {})
+            self.hits = 0
+            self.misses = 0
+            self.invalidations = 0
+
+    def stats(self):
+        """
+        Returns:
+            dict: The cache's size, maxsize, hits, misses, invalidations and live tag stamps
+        """
+        return {"size": len(self._entries), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses,
+                "invalidations": self.invalidations, "stamps": len(self._stamps[1])}
+
+
+class IdentityMap:
+    """
+    A per-session registry guaranteeing one instance per (model, id).
+    """
+
+    def __init__(self):
+        self._objects = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._objects)
+
+    def get(self, key, count=True):
+        obj = self._objects.get(key)
+        if count:
+            if obj is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return obj
+
+    def add(self, key, obj):
+        self._objects[key] = obj
+
+    def discard(self, key):
+        self._objects.pop(key, None)
+
+
+_local = threading.local()
+_object_cache = LRUCache(0)
+_relation_cache = RelationCache(0)
+
+
+def current_session():
+    """
+    Returns the innermost active IdentityMap for this thread, or None outside a session.
+    """
+    stack = getattr(_local, "sessions", None)
+    return stack[-1] if stack else None
+
+
+@contextmanager
+def session():
+    """
+    Opens an identity-map session for the current thread.
+
+    Inside the block, loading the same row twice (via find_by_id, find_by_ids
+    or relationship methods) returns the same instance, and rows already
+    loaded are served without querying the database.
+
+    Yields:
+        IdentityMap: The session's identity map
+    """
+    stack = getattr(_local, "sessions", None)
+    if stack is None:
+        stack = _local.sessions = []
+    identity_map = IdentityMap()
+    stack.append(identity_map)
+    try:
+        yield identity_map
+    finally:
+        stack.pop()
+
+
+def configure_object_cache(maxsize):
+    """
+    Resizes the process-wide LRU object cache, clearing its contents and counters.
+    A maxsize of 0 disables it.
+    """
+    global _object_cache
+    _object_cache = LRUCache(maxsize)
+    return _object_cache
+
+
+def clear_object_cache():
+    """Empties the process-wide LRU object cache and resets its counters."""
+    _object_cache.clear()
+
+
+def configure_relation_cache(maxsize):
+    """
+    Resizes the relationship result cache, clearing its contents and counters.
+    A maxsize of 0 disables it.
+    """
+    global _relation_cache
+    _relation_cache = RelationCache(maxsize)
+    return _relation_cache
+
+
+def clear_relation_cache():
+    """Empties the relationship result cache and resets its counters."""
+    _relation_cache.clear()
+
+
+def relation_cache_enabled():
+    """Returns True if relationship results are being cached."""
+    return _relation_cache.maxsize > 0
+
+
+def cache_stats():
+    """
+    Returns hit/miss counters for the process-wide caches and the active session.
+
+    Returns:
+        dict: {"object_cache": {...}, "relation_cache": {...}, "session": {...} or None}
+    """
+    identity_map = current_session()
+    return {
+        "object_cache": _object_cache.stats(),
+        "relation_cache": _relation_cache.stats(),
+        "session": None if identity_map is None else
+        {"size": len(identity_map), "hits": identity_map.hits, "misses": identity_map.misses},
+    }
+
+
+def _scoped(key):
+    scope = current_database().cache_scope
+    return key if scope is None else (scope, *key)
+
+
+def lookup(cls, id, count=True):
+    """
+    Returns the cached instance of `cls` with the given id, or None.
+
+    The active session is consulted first, then the process-wide cache; an
+    instance found only in the latter is promoted into the session. Lookups
+    by id count towards the hit/miss statistics; identity resolution of rows
+    that were already fetched passes count=False.
+    """
+    key = _scoped((cls, id))
+    identity_map = current_session()
+    if identity_map is not None:
+        obj = identity_map.get(key, count)
+        if obj is not None:
+            return obj
+    if _object_cache.maxsize == 0:
+        return None
+    obj = _object_cache.get(key, count=count)
+    if obj is not None and identity_map is not None:
+        identity_map.add(key, obj)
+    return obj
+
+
+def register(obj):
+    """
+    Records obj as the canonical instance for its (model, id) and returns it.
+    Objects without an id are returned unchanged.
+    """
+    if obj.id is None:
+        return obj
+    key = _scoped((type(obj), obj.id))
+    identity_map = current_session()
+    if identity_map is not None:
+        identity_map.add(key, obj)
+    _object_cache.put(key, obj)
+    return obj
+
+
+def evict(cls, id):
+    """
+    Removes the instance of `cls` with the given id from every cache layer, e.g. when
+    the UPDATE that saved it was rolled back.
+    """
+    key = _scoped((cls, id))
+    identity_map = current_session()
+    if identity_map is not None:
+        identity_map.discard(key)
+    _object_cache.discard(key)
+
+
+def detach(obj):
+    """
+    Forgets an instance whose INSERT was rolled back: evicts it from every cache
+    layer and resets its id to None so a later save() inserts it again.
+    """
+    if obj.id is not None:
+        evict(type(obj), obj.id)
+        obj.id = None
+
+
+def _canonical(value):
+    # Inside a session, cached model instances go through the identity map like freshly loaded rows
+    if isinstance(value, str):
+        return value
+    return lookup(type(value), value.id, count=False) or register(value)
+
+
+def cached_relation(key, compute, tags):
+    """
+    Returns the memoized result of a relationship method, computing it on a miss.
+
+    Inside a transaction() block the cache is bypassed, so results that include
+    uncommitted writes are never shared with other threads.
+
+    Args:
+        key (tuple): Identifies the method and its arguments, e.g. ("Magazine.contributors", 3)
+        compute (callable): Runs the query and returns a list
+        tags (callable): Maps the computed list to the tags it depends on
+
+    Returns:
+        list: A fresh list the caller may modify
+    """
+    cache = _relation_cache
+    if cache.maxsize == 0 or current_transaction() is not None:
+        return compute()
+    key = _scoped(key)
+    result = cache.get(key)
+    if result is not None:
+        if current_session() is None:
+            return list(result)
+        return [_canonical(value) for value in result]
+    generation = cache.generation
+    result = compute()
+    cache.put(key, generation, [_scoped(tag) for tag in tags(result)], tuple(result))
+    return result
+
+
+def invalidate(*tags):
+    """
+    Makes the cached relationship results depending on any of the tags stale.
+
+    Inside a transaction() block the tags are invalidated again once it commits or
+    rolls back, so results computed by other threads in the meantime, from the
+    previously committed data, are not kept either.
+    """
+    cache = _relation_cache
+    if cache.maxsize == 0 or not tags:
+        return
+    if current_database().cache_scope is not None:
+        tags = [_scoped(tag) for tag in tags]
+    cache.invalidate(tags)
+    conn = current_transaction()
+    if conn is not None:
+        conn.on_commit(lambda: cache.invalidate(tags))
+        conn.on_rollback(lambda: cache.invalidate(tags))
@@ -1,46 +1,1356 @@
+import heapq
+import itertools
+import logging
+import operator
+import os
+import pathlib
+import queue
 import sqlite3
+import sys
+import threading
+import time
+import weakref
+import zlib
+from contextlib import contextmanager, nullcontext
 
 DB_FILE = 'magazine.db'
 
+logger = logging.getLogger(__name__)
+
+# Default number of connections kept open by the pool
+POOL_SIZE = 5
+# Seconds a caller waits for a free connection before giving up
+POOL_TIMEOUT = 5.0
+# Connections idle for longer than this are pinged before being handed out
+HEALTH_CHECK_INTERVAL = 30.0
+
+# PRAGMAs applied to every connection in WAL concurrency mode
+WAL_PRAGMAS = {
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "mmap_size": 268435456,
+}
+
+
+# Article content at least this many bytes long is zlib-compressed when compression is on
+CONTENT_MIN_COMPRESS_SIZE = 256
+_content_settings = {"compress": False, "level": 6, "min_size": CONTENT_MIN_COMPRESS_SIZE}
+
+
+def configure_content_compression(compress=True, level=6, min_size=CONTENT_MIN_COMPRESS_SIZE):
+    """
+    Turns zlib compression of article content on or off for subsequent writes.
+    Content already stored keeps its encoding; every row records whether it is compressed.
+
+    Args:
+        compress (bool): Whether to compress new content
+        level (int): zlib compression level, 1 (fastest) to 9 (smallest)
+        min_size (int): Content shorter than this many UTF-8 bytes is stored as is
+    """
+    if not 0 <= level <= 9:
+        raise ValueError("Compression level must be between 0 and 9")
+    _content_settings.update(compress=compress, level=level, min_size=min_size)
+
+
+def encode_content(text):
+    """
+    Encodes article content for the article_contents table.
+
+    Returns:
+        tuple[int, bytes]: (compressed flag, body); content is only kept compressed
+        when compression is on and it actually gets smaller
+    """
+    data = text.encode("utf-8")
+    settings = _content_settings
+    if settings["compress"] and len(data) >= settings["min_size"]:
+        packed = zlib.compress(data, settings["level"])
+        if len(packed) < len(data):
+            return 1, packed
+    return 0, data
+
+
+def decode_content(body, compressed):
+    """
+    Decodes a body stored by encode_content() back to text. Also registered as the
+    article_text() SQL function on every pooled connection.
+    """
+    if body is None:
+        return None
+    if compressed:
+        body = zlib.decompress(body)
+    return bytes(body).decode("utf-8")
+
+
+class PoolError(Exception):
+    """Raised when a connection cannot be checked out of the pool."""
+
+
+class QueryEvent:
+    """
+    One statement issued through an instrumented connection.
+
+    Attributes:
+        sql (str): The statement text
+        params (tuple): Its bound parameters
+        caller (str): Qualified name of the model method that issued it, e.g. "Magazine.articles"
+        elapsed (float): Seconds spent executing and fetching
+        rows (int): Rows fetched, or rows affected for writes
+        plan (list[str] or None): EXPLAIN QUERY PLAN lines, captured for slow queries
+    """
+
+    __slots__ = ("sql", "params", "caller", "elapsed", "rows", "plan")
+
+    def __init__(self, sql, params, caller):
+        self.sql = sql
+        self.params = params
+        self.caller = caller
+        self.elapsed = 0.0
+        self.rows = 0
+        self.plan = None
+
+
+class Instrumentation:
+    """
+    Collects QueryEvents from instrumented connections.
+
+    Keeps per-caller aggregate counters, logs statements slower than
+    `slow_query_threshold` seconds together with their EXPLAIN QUERY PLAN,
+    and forwards every finished event to registered listeners.
+    """
+
+    def __init__(self, slow_query_threshold=None):
+        self.slow_query_threshold = slow_query_threshold
+        self._stats = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, callback):
+        """Register a callable invoked with every finished QueryEvent."""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        """Unregister a listener added with add_listener()."""
+        self._listeners.remove(callback)
+
+    def record(self, event, conn):
+        """
+        Aggregate a finished event, capturing its query plan if it was slow.
+
+        Args:
+            event (QueryEvent): The finished statement
+            conn (sqlite3.Connection): The connection it ran on, used for EXPLAIN
+        """
+        threshold = self.slow_query_threshold
+        slow = threshold is not None and event.elapsed >= threshold
+        if slow:
+            try:
+                plan = conn.execute(f"EXPLAIN QUERY PLAN {event.sql}", event.params).fetchall()
+                event.plan = [row[-1] for row in plan]
+            except sqlite3.Error:
+                event.plan = None
+            logger.warning("Slow query (%.2f ms, %d rows) in %s: %s\n%s", event.elapsed * 1000, event.rows,
+                           event.caller, " ".join(event.sql.split()), "\n".join(event.plan or []))
+        with self._lock:
+            stats = self._stats.get(event.caller)
+            if stats is None:
+                stats = self._stats[event.caller] = {"queries": 0, "rows": 0, "total_time": 0.0, "slow_queries": 0}
+            stats["queries"] += 1
+            stats["rows"] += event.rows
+            stats["total_time"] += event.elapsed
+            stats["slow_queries"] += slow
+        for callback in self._listeners:
+            callback(event)
+
+    def stats(self):
+        """
+        Returns:
+            dict[str, dict]: Per-caller counts of queries, rows, total_time (seconds) and slow_queries
+        """
+        with self._lock:
+            return {caller: dict(stats) for caller, stats in self._stats.items()}
+
+    def reset(self):
+        """Clear the aggregate counters."""
+        with self._lock:
+            self._stats.clear()
+
+
+# Source files whose frames are skipped when attributing a statement to a caller
+_INTERNAL_FILES = {os.path.abspath(__file__), os.path.abspath(sys.modules["contextlib"].__file__)}
+
+
+def register_internal_module(path):
+    """
+    Attributes statements issued from a module to the code that called into it,
+    as is done for this module's own frames, in the query log and query_stats().
+
+    Args:
+        path (str): The module's source file, usually its __file__
+    """
+    _INTERNAL_FILES.add(os.path.abspath(path))
+
+
+def _caller():
+    """
+    Returns the qualified name of the nearest calling function outside this module.
+    Functions nested in a method are reported as the method itself.
+    """
+    frame = sys._getframe(2)
+    while frame is not None and os.path.abspath(frame.f_code.co_filename) in _INTERNAL_FILES:
+        frame = frame.f_back
+    if frame is None:
+        return "<unknown>"
+    return getattr(frame.f_code, "co_qualname", frame.f_code.co_name).split(".<locals>.")[0]
+
+
+class InstrumentedCursor:
+    """
+    A sqlite3.Cursor wrapper that times statements and counts the rows they return.
+
+    A statement's event is finished, and reported to the Instrumentation, when
+    its results are exhausted, when the cursor runs another statement or is
+    garbage-collected, or when the connection it came from is closed or leaves
+    its `with` block. While a statement is unfinished the cursor is a member of
+    `pending`, so the connection holds on to unfinished statements only.
+    """
+
+    def __init__(self, cursor, conn, instrumentation, pending=None):
+        self._cursor = cursor
+        self._conn = conn
+        self._instrumentation = instrumentation
+        self._pending = pending
+        self._event = None
+
+    def __del__(self):
+        self.finish()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def _timed(self, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            if self._event is not None:
+                self._event.elapsed += time.perf_counter() - start
+
+    def execute(self, sql, params=()):
+        self.finish()
+        self._event = QueryEvent(sql, params, _caller())
+        if self._pending is not None:
+            self._pending.add(self)
+        self._timed(self._cursor.execute, sql, params)
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self.finish()
+        self._event = QueryEvent(sql, (), _caller())
+        self._timed(self._cursor.executemany, sql, seq_of_params)
+        self.finish()
+        return self
+
+    def executescript(self, sql_script):
+        self.finish()
+        self._event = QueryEvent(sql_script, (), _caller())
+        self._timed(self._cursor.executescript, sql_script)
+        self.finish()
+        return self
+
+    def fetchone(self):
+        row = self._timed(self._cursor.fetchone)
+        if row is None:
+            self.finish()
+        elif self._event is not None:
+            self._event.rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        size = self._cursor.arraysize if size is None else size
+        rows = self._timed(self._cursor.fetchmany, size)
+        if self._event is not None:
+            self._event.rows += len(rows)
+        if len(rows) < size:
+            self.finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(self._cursor.fetchall)
+        if self._event is not None:
+            self._event.rows += len(rows)
+        self.finish()
+        return rows
+
+    def close(self):
+        self.finish()
+        self._cursor.close()
+
+    def finish(self):
+        """Report the current statement, if any, to the Instrumentation."""
+        event, self._event = self._event, None
+        if event is not None:
+            if self._pending is not None:
+                self._pending.discard(self)
+            if event.rows == 0 and self._cursor.rowcount > 0:
+                event.rows = self._cursor.rowcount
+            self._instrumentation.record(event, self._conn)
+
+
+_instrumentation = None
+
+
+def enable_instrumentation(slow_query_threshold=None):
+    """
+    Starts recording every statement issued through get_connection() and transaction().
+
+    Each statement is attributed to the model method that issued it, timed and its rows
+    counted. Statements slower than `slow_query_threshold` seconds are logged as warnings
+    on this module's logger together with their EXPLAIN QUERY PLAN output, which makes
+    full table scans visible. Replaces any previously enabled Instrumentation.
+
+    Args:
+        slow_query_threshold (float, optional): Seconds above which a query counts as slow
+
+    Returns:
+        Instrumentation: The active instrumentation, for listeners and stats
+    """
+    global _instrumentation
+    _instrumentation = Instrumentation(slow_query_threshold)
+    return _instrumentation
+
+
+def disable_instrumentation():
+    """Stops recording statements. Connections revert to plain sqlite3 cursors."""
+    global _instrumentation
+    _instrumentation = None
+
+
+def query_stats():
+    """
+    Returns per-method aggregate counters of the active instrumentation.
+
+    Returns:
+        dict[str, dict]: e.g. {"Magazine.articles": {"queries": 2, "rows": 40, "total_time": 0.001,
+        "slow_queries": 0}}, or {} when instrumentation is disabled
+    """
+    return _instrumentation.stats() if _instrumentation is not None else {}
+
+
+class PooledConnection:
+    """
+    A pooled SQLite connection handed out by ConnectionPool.
+
+    Behaves like a sqlite3.Connection (attribute access is delegated to the
+    underlying connection), except that close() returns the connection to
+    the pool instead of closing it. Used as a context manager it commits on
+    success, rolls back on error and returns itself to the pool on exit.
+    While instrumentation is enabled, cursor(), execute(), executemany() and
+    executescript() return InstrumentedCursors.
+    """
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+        self._cursors = weakref.WeakSet()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self):
+        cursor = self._conn.cursor()
+        instrumentation = _instrumentation
+        if instrumentation is None:
+            return cursor
+        return InstrumentedCursor(cursor, self._conn, instrumentation, self._cursors)
+
+    def execute(self, sql, params=()):
+        if _instrumentation is None:
+            return self._conn.execute(sql, params)
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        if _instrumentation is None:
+            return self._conn.executemany(sql, seq_of_params)
+        return self.cursor().executemany(sql, seq_of_params)
+
+    def executescript(self, sql_script):
+        if _instrumentation is None:
+            return self._conn.executescript(sql_script)
+        return self.cursor().executescript(sql_script)
+
+    def _finish_statements(self):
+        for cursor in list(self._cursors):
+            cursor.finish()
+
+    def close(self):
+        """Return the connection to the pool. Safe to call more than once."""
+        if self._conn is not None:
+            self._finish_statements()
+            conn, self._conn = self._conn, None
+            self._pool.release(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self._finish_statements()
+            if exc_type is None:
+                self._conn.commit()
+            else:
+                self._conn.rollback()
+        finally:
+            self.close()
+        return False
+
+
+class TransactionConnection(PooledConnection):
+    """
+    The connection shared by every get_connection() call inside a transaction() block.
+
+    commit() and close() are no-ops and leaving a nested `with` block does
+    nothing; the enclosing transaction() commits once at the end or rolls
+    back on error. Callbacks registered with on_commit() or on_rollback() run
+    once it has committed or rolled back.
+    """
+
+    def __init__(self, pool, conn):
+        super().__init__(pool, conn)
+        self._commit_hooks = []
+        self._rollback_hooks = []
+
+    def on_commit(self, callback):
+        """Register a zero-argument callable to run after the transaction commits."""
+        self._commit_hooks.append(callback)
+
+    def on_rollback(self, callback):
+        """Register a zero-argument callable to run if the transaction rolls back."""
+        self._rollback_hooks.append(callback)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        self._finish_statements()
+
+    def __exit__(self, exc_type, exc, tb):
+        self._finish_statements()
+        return False
+
+
+class ConnectionPool:
+    """
+    A thread-safe checkout/return pool of SQLite connections.
+
+    Connections are opened lazily up to `size`, reused in LIFO order and
+    health-checked with a trivial query when they have been idle for longer
+    than `health_check_interval`. Broken connections are discarded and
+    replaced transparently. A `readonly` pool opens the database with
+    SQLite's mode=ro, and `pragmas` are applied to every new connection.
+    A `db_file` starting with "file:" is opened as a URI.
+    """
+
+    def __init__(self, db_file=DB_FILE, size=POOL_SIZE, timeout=POOL_TIMEOUT,
+                 health_check_interval=HEALTH_CHECK_INTERVAL, readonly=False, pragmas=None):
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+        self.db_file = db_file
+        self.size = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.readonly = readonly
+        self.pragmas = dict(pragmas or {})
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._closed = False
+
+    def _connect(self):
+        if self.db_file.startswith("file:"):
+            conn = sqlite3.connect(self.db_file, uri=True, check_same_thread=False)
+        elif self.readonly:
+            uri = f"{pathlib.Path(self.db_file).resolve().as_uri()}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        conn.execute("PRAGMA foreign_keys = ON;")
+        # Used by the search index triggers to read article content
+        conn.create_function("article_text", 2, decode_content, deterministic=True)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value};")
+        return conn
+
+    def _is_healthy(self, conn):
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._opened -= 1
+
+    def acquire(self):
+        """
+        Check a raw sqlite3.Connection out of the pool.
+
+        Returns:
+            sqlite3.Connection: An open connection with foreign keys enabled
+
+        Raises:
+            PoolError: If the pool is closed or no connection frees up within the timeout
+        """
+        deadline = time.monotonic() + self.timeout
+        while True:
+            if self._closed:
+                raise PoolError("Connection pool is closed")
+            try:
+                conn, idle_since = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_open = self._opened < self.size
+                    if can_open:
+                        self._opened += 1
+                if can_open:
+                    try:
+                        return self._connect()
+                    except Exception:
+                        with self._lock:
+                            self._opened -= 1
+                        raise
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolError(f"No connection available within {self.timeout} seconds")
+                try:
+                    conn, idle_since = self._idle.get(timeout=remaining)
+                except queue.Empty:
+                    continue
+            if time.monotonic() - idle_since > self.health_check_interval and not self._is_healthy(conn):
+                self._discard(conn)
+                continue
+            return conn
+
+    def release(self, conn):
+        """
+        Return a connection to the pool, rolling back any uncommitted work.
+
+        Args:
+            conn (sqlite3.Connection): A connection previously returned by acquire()
+        """
+        if self._closed:
+            self._discard(conn)
+            return
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        self._idle.put((conn, time.monotonic()))
+
+    def connection(self):
+        """
+        Check out a connection wrapped as a PooledConnection.
+
+        Returns:
+            PooledConnection: Connection whose close() returns it to this pool
+        """
+        return PooledConnection(self, self.acquire())
+
+    def close(self):
+        """Close every idle connection and refuse further checkouts."""
+        self._closed = True
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+
+_pool = None
+_read_pool = None
+_pool_lock = threading.Lock()
+# Settings used whenever the process-wide pools are (re)created
+_pool_settings = {
+    "size": POOL_SIZE,
+    "timeout": POOL_TIMEOUT,
+    "health_check_interval": HEALTH_CHECK_INTERVAL,
+    "pragmas": {},
+    "readers": 0,
+}
+
+
+def _default_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            settings = _pool_settings
+            if _memory is not None:
+                _pool = _SharedCachePool(_memory["uri"], _memory["connections"], settings["timeout"],
+                                         settings["health_check_interval"], settings["pragmas"])
+            else:
+                _pool = ConnectionPool(DB_FILE, size=1 if settings["readers"] else settings["size"],
+                                       timeout=settings["timeout"],
+                                       health_check_interval=settings["health_check_interval"],
+                                       pragmas=settings["pragmas"])
+        return _pool
+
+
+def _default_read_pool():
+    global _read_pool
+    with _pool_lock:
+        settings = _pool_settings
+        if _read_pool is None and settings["readers"] and _memory is None:
+            _read_pool = ConnectionPool(DB_FILE, size=settings["readers"], timeout=settings["timeout"],
+                                        health_check_interval=settings["health_check_interval"],
+                                        readonly=True, pragmas=settings["pragmas"])
+        return _read_pool
+
+
+def get_pool():
+    """
+    Returns the read-write connection pool of the active database (see current_database()),
+    creating it on first use. For the default database this is the process-wide pool, which
+    in WAL concurrency mode is the single-connection writer pool.
+    """
+    return current_database().get_pool()
+
+
+def get_read_pool():
+    """
+    Returns the pool of read-only connections of the active database in WAL concurrency mode,
+    or None when that mode is off or the database is in memory.
+    """
+    return current_database().get_read_pool()
+
+
+def close_pool():
+    """
+    Shuts down the process-wide pools of the default database, closing all idle connections.
+    Fresh pools with the same settings are created on the next call to get_connection().
+    """
+    global _pool, _read_pool
+    with _pool_lock:
+        for pool in (_pool, _read_pool):
+            if pool is not None:
+                pool.close()
+        _pool = _read_pool = None
+
+
+def configure_pool(size=POOL_SIZE, timeout=POOL_TIMEOUT, health_check_interval=HEALTH_CHECK_INTERVAL):
+    """
+    Replaces the process-wide pools with ones using the given settings.
+    Connections held by the previous pools are closed as they are returned.
+    """
+    close_pool()
+    _pool_settings.update(size=size, timeout=timeout, health_check_interval=health_check_interval)
+    return _default_pool()
+
+
+def configure_concurrency(wal=True, readers=POOL_SIZE, pragmas=None):
+    """
+    Switches between the default rollback-journal mode and a multi-reader / single-writer
+    WAL mode, replacing the process-wide pools.
+
+    In WAL mode the database is converted to journal_mode=WAL (a persistent setting),
+    every connection gets WAL_PRAGMAS (synchronous, busy_timeout, mmap_size) merged with
+    `pragmas`, get_connection() hands out read-only connections from a pool of `readers`,
+    and all writes (every transaction(), save() and bulk save) go through one writer
+    connection, so readers never block on writers and writers never contend with each other.
+    Code that writes through get_connection() directly must use transaction() in this mode.
+
+    Args:
+        wal (bool): True to enable WAL mode, False to restore the default mode
+        readers (int): Number of read-only connections in WAL mode
+        pragmas (dict, optional): Overrides for WAL_PRAGMAS
+    """
+    if wal and readers < 1:
+        raise ValueError("WAL mode needs at least one reader")
+    close_pool()
+    if wal:
+        _pool_settings.update(pragmas={**WAL_PRAGMAS, **(pragmas or {})}, readers=readers)
+        with _default_pool().connection() as conn:
+            conn.execute("PRAGMA journal_mode = WAL;")
+    else:
+        _pool_settings.update(pragmas={}, readers=0)
+        with _default_pool().connection() as conn:
+            conn.execute("PRAGMA journal_mode = DELETE;")
+
+
+def configure_read_only(readers=1, pragmas=None):
+    """
+    Serves every get_connection() from a pool of `readers` read-only (mode=ro) connections,
+    replacing the process-wide pools but leaving the database's journal mode unchanged.
+    Any write attempted through the model layer then fails. Used by processes that only
+    read, such as the parallel analytics workers.
+
+    Args:
+        readers (int): Number of read-only connections
+        pragmas (dict, optional): PRAGMAs applied to every connection, e.g. busy_timeout
+    """
+    if readers < 1:
+        raise ValueError("Read-only mode needs at least one reader")
+    close_pool()
+    _pool_settings.update(pragmas=dict(pragmas or {}), readers=readers)
+
+
+# State of in-memory mode while it is enabled: the shared-cache URI, the connection
+# keeping the database alive, the backing file and the periodic snapshot thread
+_memory = None
+_memory_ids = itertools.count(1)
+
+
+class _SharedCachePool(ConnectionPool):
+    """
+    The pool of the in-memory database. Shared-cache connections fail with "database
+    table is locked" instead of waiting while another connection writes the same table,
+    so threads take turns: one thread at a time holds connections, and a thread waiting
+    for its turn gives up after the pool's timeout. The thread holding the turn can check out several
+    connections, so nested get_connection() calls (such as loading an author while
+    iterating over Article.iter_content()) do not wait for themselves. Connections read
+    uncommitted data, so a statement still open on one of them does not lock the tables
+    it reads against writes through another.
+    """
+
+    def __init__(self, uri, size, timeout, health_check_interval, pragmas):
+        super().__init__(uri, size=size, timeout=timeout, health_check_interval=health_check_interval,
+                         pragmas={**(pragmas or {}), "read_uncommitted": 1})
+        self._turn = threading.Condition()
+        self._owner = None
+        self._held = 0
+
+    def acquire(self):
+        me = threading.get_ident()
+        with self._turn:
+            if not self._turn.wait_for(lambda: self._owner in (None, me), self.timeout):
+                raise PoolError(f"No connection available within {self.timeout} seconds")
+            self._owner = me
+            self._held += 1
+        try:
+            return super().acquire()
+        except BaseException:
+            self._end_turn()
+            raise
+
+    def release(self, conn):
+        try:
+            super().release(conn)
+        finally:
+            self._end_turn()
+
+    def _end_turn(self):
+        with self._turn:
+            self._held -= 1
+            if self._held == 0:
+                self._owner = None
+                self._turn.notify_all()
+
+
+class _Snapshotter(threading.Thread):
+    """Daemon thread writing a snapshot every `interval` seconds while the database has changed."""
+
+    def __init__(self, interval):
+        super().__init__(name="magazine-db-snapshot", daemon=True)
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                snapshot(if_changed=True)
+            except Exception:
+                logger.exception("Periodic snapshot of the in-memory database failed")
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def enable_in_memory(snapshot_interval=None, load=True, connections=POOL_SIZE):
+    """
+    Serves every query from a shared-cache in-memory copy of DB_FILE, replacing the
+    process-wide pools. Model code is unchanged; writes stay in memory until snapshot()
+    copies the database back to DB_FILE, which happens every `snapshot_interval` seconds
+    (when something changed), on demand, and when disable_in_memory() is called.
+
+    The copy is made with SQLite's online backup API (sqlite3.Connection.backup), and a
+    dedicated connection keeps the in-memory database alive while the pools are closed or
+    replaced. Shared-cache connections fail with "database table is locked" instead of
+    waiting when another connection is writing the same table, so threads take turns with
+    the pool, while the thread holding it may check out up to `connections` at once (see
+    _SharedCachePool). Other processes, such as the parallel analytics workers, read
+    DB_FILE and only see the last snapshot.
+
+    Args:
+        snapshot_interval (float, optional): Seconds between automatic snapshots; None disables them
+        load (bool): Copy DB_FILE into memory first if it exists; False starts from an empty database
+        connections (int): Size of the connection pool, i.e. how many connections one thread can
+            hold at once (for example while iterating over one query and running another)
+
+    Raises:
+        ValueError: If in-memory mode is already enabled or connections is below 1
+    """
+    global _memory
+    if _memory is not None:
+        raise ValueError("In-memory mode is already enabled")
+    if connections < 1:
+        raise ValueError("In-memory mode needs at least one connection")
+    close_pool()
+    uri = f"file:magazine-{os.getpid()}-{next(_memory_ids)}?mode=memory&cache=shared"
+    anchor = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    if load and os.path.exists(DB_FILE):
+        source = sqlite3.connect(DB_FILE)
+        try:
+            source.backup(anchor)
+        finally:
+            source.close()
+    _memory = {"uri": uri, "anchor": anchor, "db_file": DB_FILE, "connections": connections,
+               "snapshot_version": anchor.execute("PRAGMA data_version;").fetchone()[0], "snapshotter": None,
+               "lock": threading.Lock()}
+    if snapshot_interval is not None:
+        _memory["snapshotter"] = _Snapshotter(snapshot_interval)
+        _memory["snapshotter"].start()
+
+
+def disable_in_memory(save=True):
+    """
+    Leaves in-memory mode, optionally writing a final snapshot to the backing file, and
+    restores the on-disk pools.
+
+    Args:
+        save (bool): Snapshot before discarding the in-memory database
+    """
+    global _memory
+    if _memory is None:
+        return
+    if _memory["snapshotter"] is not None:
+        _memory["snapshotter"].stop()
+    if save:
+        snapshot()
+    close_pool()
+    _memory["anchor"].close()
+    _memory = None
+
+
+def in_memory():
+    """Returns True while in-memory mode is enabled."""
+    return _memory is not None
+
+
+def snapshot(path=None, if_changed=False):
+    """
+    Copies the database to a file with SQLite's online backup API.
+
+    In in-memory mode the in-memory database is copied to `path`, by default the file it
+    was loaded from. The copy is one consistent state: it waits for a write transaction in
+    progress on another connection to finish, and inside this thread's transaction() block
+    it is deferred until the block commits. Otherwise DB_FILE itself is copied to `path`.
+
+    Args:
+        path (str, optional): Destination file; required when in-memory mode is off
+        if_changed (bool): Skip the copy if nothing was committed since the last snapshot
+
+    Returns:
+        bool: Whether a snapshot was written (or scheduled after the current transaction)
+
+    Raises:
+        ValueError: If no path is given and in-memory mode is off
+    """
+    memory = _memory
+    if memory is None and path is None:
+        raise ValueError("A snapshot path is required when the database is on disk")
+    current = default_database.current_transaction()
+    if current is not None:
+        current.on_commit(lambda: snapshot(path, if_changed))
+        return True
+    if memory is None:
+        source = sqlite3.connect(DB_FILE)
+        try:
+            _backup(source, path)
+        finally:
+            source.close()
+        return True
+    with memory["lock"]:
+        version = memory["anchor"].execute("PRAGMA data_version;").fetchone()[0]
+        if if_changed and version == memory["snapshot_version"]:
+            return False
+        _backup(memory["anchor"], path or memory["db_file"])
+        memory["snapshot_version"] = version
+    return True
+
+
+def _backup(source, path):
+    target = sqlite3.connect(path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+
+
+# Tables whose rows are split across shards; every other table is replicated to all of them
+SHARDED_TABLES = ("articles", "article_contents")
+
+
+class Database:
+    """
+    A handle on one SQLite database file: its connection pools and the transaction()
+    units of work opened on it.
+
+    Models query the active database (see current_database()): the one entered with
+    using() in this thread, else the one installed with bind(), else the default database
+    at the module-level DB_FILE. Databases can be used side by side; each has its own
+    pools and transactions, and cached objects are kept apart by `cache_scope`.
+    As a shard of a ShardedDatabase it allocates article IDs congruent to its
+    `shard_index` modulo `shard_count`.
+    """
+
+    shard_index = 0
+    shard_count = 1
+
+    def __init__(self, db_file, size=POOL_SIZE, timeout=POOL_TIMEOUT, health_check_interval=HEALTH_CHECK_INTERVAL,
+                 wal=False, readers=POOL_SIZE, pragmas=None):
+        """
+        Args:
+            db_file (str): Path of the SQLite database file
+            size (int): Maximum number of read-write connections (1 in WAL mode)
+            timeout (float): Seconds a caller waits for a free connection
+            health_check_interval (float): Idle seconds after which a connection is pinged
+            wal (bool): Use WAL mode with `readers` read-only connections and one writer,
+                as configure_concurrency() does for the default database
+            readers (int): Number of read-only connections in WAL mode
+            pragmas (dict, optional): PRAGMAs applied to every connection (merged with
+                WAL_PRAGMAS in WAL mode)
+        """
+        if wal and readers < 1:
+            raise ValueError("WAL mode needs at least one reader")
+        self.db_file = db_file
+        self.size = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.wal = wal
+        self.readers = readers if wal else 0
+        self.pragmas = {**WAL_PRAGMAS, **(pragmas or {})} if wal else dict(pragmas or {})
+        self.cache_scope = self
+        self._pool = None
+        self._read_pool = None
+        self._lock = threading.RLock()
+        self._local = threading.local()
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.db_file!r})"
+
+    @property
+    def shards(self):
+        """The databases holding this database's rows: just this one."""
+        return [self]
+
+    def shard_for_magazine(self, magazine_id):
+        """Returns the shard storing the articles of a magazine: this database."""
+        return self
+
+    def shard_for_article(self, article_id):
+        """Returns the shard storing an article: this database."""
+        return self
+
+    def get_pool(self):
+        """Returns the read-write connection pool, creating it on first use."""
+        with self._lock:
+            if self._pool is None:
+                self._pool = ConnectionPool(self.db_file, size=1 if self.readers else self.size, timeout=self.timeout,
+                                            health_check_interval=self.health_check_interval, pragmas=self.pragmas)
+                if self.wal:
+                    with self._pool.connection() as conn:
+                        conn.execute("PRAGMA journal_mode = WAL;")
+            return self._pool
+
+    def get_read_pool(self):
+        """Returns the pool of read-only connections in WAL mode, or None."""
+        if not self.readers:
+            return None
+        with self._lock:
+            if self._read_pool is None:
+                # The writer creates the file and switches it to WAL before anyone reads
+                self.get_pool()
+                self._read_pool = ConnectionPool(self.db_file, size=self.readers, timeout=self.timeout,
+                                                 health_check_interval=self.health_check_interval,
+                                                 readonly=True, pragmas=self.pragmas)
+            return self._read_pool
+
+    def connection(self):
+        """
+        Returns a pooled connection; see get_connection().
+        """
+        current = getattr(self._local, "transaction", None)
+        if current is not None:
+            return current
+        return (self.get_read_pool() or self.get_pool()).connection()
+
+    def current_transaction(self):
+        """
+        Returns the TransactionConnection of this thread's open transaction() block, or None.
+        """
+        return getattr(self._local, "transaction", None)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Opens a unit of work on this database; see transaction().
+
+        Yields:
+            TransactionConnection: The shared connection
+        """
+        current = getattr(self._local, "transaction", None)
+        if current is not None:
+            yield current
+            return
+        pool = self.get_pool()
+        conn = pool.acquire()
+        shared = TransactionConnection(pool, conn)
+        self._local.transaction = shared
+        try:
+            # Take the write lock up front so the unit of work cannot deadlock upgrading a read lock
+            conn.execute("BEGIN IMMEDIATE;")
+            yield shared
+            shared._finish_statements()
+            conn.commit()
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            for callback in reversed(shared._rollback_hooks):
+                callback()
+            raise
+        finally:
+            self._local.transaction = None
+            pool.release(conn)
+        for callback in shared._commit_hooks:
+            callback()
+
+    def create_tables(self):
+        """Creates or upgrades the schema; see create_tables()."""
+        # Establish a read-write database connection with foreign key support
+        with self.get_pool().connection() as conn:
+            # Fast path: nothing to do when the schema is already current
+            if conn.execute("PRAGMA user_version;").fetchone()[0] >= SCHEMA_VERSION:
+                return
+            for version, statements in enumerate(MIGRATIONS, start=1):
+                # Take the write lock before re-reading the version so concurrent processes
+                # cannot apply the same migration twice
+                conn.execute("BEGIN IMMEDIATE;")
+                try:
+                    if conn.execute("PRAGMA user_version;").fetchone()[0] < version:
+                        _apply_migration(conn, version, statements)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+
+    def id_sequence(self, cursor, table):
+        """
+        Returns the first ID and the step for new rows of `table`, read from MAX(id); the
+        caller must hold the write lock. On a shard, article IDs step by the shard count.
+
+        Returns:
+            tuple[int, int]: (first id, step)
+        """
+        next_id = cursor.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {table}").fetchone()[0]
+        if self.shard_count == 1 or table not in SHARDED_TABLES:
+            return next_id, 1
+        return next_id + (self.shard_index - next_id) % self.shard_count, self.shard_count
+
+    def new_id(self, cursor, table):
+        """
+        Returns the ID for one new row of `table`, or None to let SQLite assign it.
+        """
+        if self.shard_count == 1 or table not in SHARDED_TABLES:
+            return None
+        return self.id_sequence(cursor, table)[0]
+
+    def close(self):
+        """Closes the pools' idle connections; new pools are created on next use."""
+        with self._lock:
+            for pool in (self._pool, self._read_pool):
+                if pool is not None:
+                    pool.close()
+            self._pool = self._read_pool = None
+
+
+class _DefaultDatabase(Database):
+    """
+    The database at the module-level DB_FILE, served by the process-wide pools that
+    configure_pool(), configure_concurrency(), configure_read_only() and
+    enable_in_memory() set up. Its cached objects are keyed without a scope.
+    """
+
+    def __init__(self):
+        self.cache_scope = None
+        self._local = threading.local()
+
+    @property
+    def db_file(self):
+        return DB_FILE
+
+    def get_pool(self):
+        return _default_pool()
+
+    def get_read_pool(self):
+        return _default_read_pool()
+
+    def close(self):
+        close_pool()
+
+
+default_database = _DefaultDatabase()
+_bound = default_database
+_active = threading.local()
+
+
+def current_database():
+    """
+    Returns the database models use in this thread: the innermost using() block's,
+    else the one installed with bind(), else default_database.
+    """
+    return getattr(_active, "database", None) or _bound
+
+
+def bind(database=None):
+    """
+    Makes `database` the process-wide database for every thread outside a using() block.
+
+    Args:
+        database (Database or ShardedDatabase, optional): The database; None restores
+            default_database
+    """
+    global _bound
+    _bound = database or default_database
+
+
+@contextmanager
+def using(database):
+    """
+    Makes `database` the active database of the current thread inside the block.
+    The async model methods run their queries against the database active when called.
+
+    Yields:
+        The database
+    """
+    previous = getattr(_active, "database", None)
+    _active.database = database
+    try:
+        yield database
+    finally:
+        _active.database = previous
+
+
+def scatter(fn, *args):
+    """
+    Calls fn(*args) once per shard of the active database with that shard active.
+
+    Returns:
+        list: The results in shard order; [fn(*args)] for an unsharded database
+    """
+    shards = current_database().shards
+    if len(shards) == 1:
+        return [fn(*args)]
+    results = []
+    for shard in shards:
+        with using(shard):
+            results.append(fn(*args))
+    return results
+
+
+def routed(magazine_id=None, article_id=None):
+    """
+    Returns a context manager activating the shard that stores an article (by its ID)
+    or a magazine's articles. It does nothing on an unsharded database.
+    """
+    database = current_database()
+    if article_id is not None:
+        shard = database.shard_for_article(article_id)
+    else:
+        shard = database.shard_for_magazine(magazine_id)
+    return nullcontext(database) if shard is database else using(shard)
+
+
+def rank_page(entries, after=None, peers=0):
+    """
+    Ranks (key, count) pairs like SQL's RANK(): tied counts share a rank, and the next
+    count's rank is one more than the number of entries before it.
+
+    Args:
+        entries (iterable[tuple]): (key, count) pairs, most first and ties ordered by key
+        after (tuple, optional): The (key, count, rank) entry directly before the first one,
+            when continuing a leaderboard from a previous page
+        peers (int): With `after`, the number of entries tied with it, up to and including it
+
+    Returns:
+        list[tuple]: (key, count, rank) tuples
+    """
+    last_count, rank, position = (None, 0, 0) if after is None else (after[1], after[2], after[2] - 1 + peers)
+    ranked = []
+    for key, count in entries:
+        if count != last_count:
+            last_count, rank = count, position + 1
+        position += 1
+        ranked.append((key, count, rank))
+    return ranked
+
+
+def rank_totals(partials, n, offset=0, after=None):
+    """
+    Adds up per-shard counts and ranks the totals like SQL's RANK(): most first, ties
+    sharing a rank and ordered by key.
+
+    Args:
+        partials (iterable[iterable[tuple]]): (key, count) pairs from each shard
+        n (int): Maximum number of entries to return
+        offset (int): Number of entries to skip
+        after (tuple, optional): The (key, total, rank) entry the page follows
+
+    Returns:
+        list[tuple]: (key, total, rank) tuples
+    """
+    totals = {}
+    for partial in partials:
+        for key, count in partial:
+            totals[key] = totals.get(key, 0) + count
+    ordered = sorted(totals.items(), key=lambda item: (-item[1], item[0]))
+    peers = 0
+    if after is not None:
+        cursor = (-after[1], after[0])
+        peers = sum(1 for key, total in ordered if total == after[1] and key <= after[0])
+        ordered = [item for item in ordered if (-item[1], item[0]) > cursor]
+    return rank_page(ordered[:offset + n], after, peers)[offset:]
+
+
+def fetch_ranked(conn, table, counts_table, key, n, offset=0, after=None):
+    """
+    Reads a page of a leaderboard: the rows of `table` joined to their counter rows in
+    `counts_table`, most articles first and ties by id, ranked like SQL's RANK().
+
+    Pages follow the counter's (article_count DESC, key) index. With `after`, the page
+    starts right after that entry (keyset paging), so deep pages cost as much as the
+    first one; `offset` skips entries one by one. RANK() OVER numbers the page's own
+    rows, which gives their ranks relative to the entries before the page: those tied
+    with `after` share its rank, and the others follow from the number of entries
+    before the page. Only when `offset` splits a tie are the entries with a higher
+    count counted, from the count index.
+
+    Args:
+        conn: The connection to read from
+        table (str): The table whose rows are ranked, e.g. "authors"
+        counts_table (str): Its counter table, with columns `key` and article_count
+        key (str): The counter table's column holding the ranked row's id
+        n (int): Maximum number of rows to return
+        offset (int): Number of entries to skip after `after`
+        after (tuple, optional): The (id, article count, rank) of the previous page's last entry
+
+    Returns:
+        list[tuple]: Rows of `table`, each followed by its article count and rank
+    """
+    where, params = "", ()
+    if after is not None:
+        where = f"WHERE counts.article_count <= ? AND (counts.article_count < ? OR counts.{key} > ?)"
+        params = (after[1], after[1], after[0])
+    # The window runs over the page only: over the whole join it would be evaluated for every row
+    rows = conn.execute(
+        "SELECT *, RANK() OVER (ORDER BY article_count DESC) FROM ("
+        f"SELECT {table}.*, counts.article_count FROM {counts_table} AS counts "
+        f"JOIN {table} ON {table}.id = counts.{key} {where} "
+        f"ORDER BY counts.article_count DESC, counts.{key} LIMIT ? OFFSET ?) "
+        "ORDER BY article_count DESC, id", (*params, n, offset)).fetchall()
+    if not rows:
+        return rows
+    # Entries before the page, and the rank of those tied with its first row
+    first = rows[0][-2]
+    if after is None:
+        before = offset
+    else:
+        id, count, rank = after
+        peers = conn.execute(f"SELECT COUNT(*) FROM {counts_table} WHERE article_count = ? AND {key} <= ?",
+                             (count, id)).fetchone()[0]
+        before = rank - 1 + peers + offset
+    if after is not None and first == count:
+        first_rank = rank
+    elif offset == 0:
+        first_rank = before + 1
+    elif after is None:
+        first_rank = 1 + conn.execute(f"SELECT COUNT(*) FROM {counts_table} WHERE article_count > ?",
+                                      (first,)).fetchone()[0]
+    else:
+        first_rank = rank + conn.execute(f"SELECT COUNT(*) FROM {counts_table} WHERE article_count > ? "
+                                         "AND article_count <= ?", (first, count)).fetchone()[0]
+    return [(*row[:-1], first_rank if row[-1] == 1 else before + row[-1]) for row in rows]
+
+
 def get_connection():
     """
-    Establishes and returns a connection to the SQLite database with foreign key support enabled.
-    The caller is responsible for closing the returned connection to avoid resource leaks.
+    Returns a pooled connection to the active SQLite database with foreign key support enabled.
+    The caller is responsible for closing the returned connection, which hands it back
+    to the pool for reuse. It can also be used as a context manager that commits on
+    success, rolls back on error and releases the connection on exit.
+    Inside a transaction() block the block's shared connection is returned instead, and in
+    WAL concurrency mode connections outside a transaction are read-only.
     """
-    conn = sqlite3.connect(DB_FILE)
-    conn.execute("PRAGMA foreign_keys = ON;")
-    return conn
+    return current_database().connection()
 
-def create_tables():
+
+def current_transaction():
     """
-    Creates the necessary database tables for the magazine application if they do not already exist.
-    This function sets up the schema with proper foreign key relationships to maintain data integrity.
-    It enables foreign key constraints and defines tables for authors, magazines, and articles.
-    """
-    # Establish a database connection with foreign key support
-    conn = get_connection()
-    # Create a cursor object to execute SQL commands
-    cursor = conn.cursor()
-    # Enable foreign key constraints for this connection (ensures referential integrity)
-    cursor.execute("PRAGMA foreign_keys = ON;")
-    # Create the authors table: stores author information with auto-incrementing ID and required name
-    cursor.execute("""
+    Returns the TransactionConnection of this thread's open transaction() block on the
+    active database, or None.
+    """
+    return current_database().current_transaction()
+
+
+def transaction():
+    """
+    Groups every save(), add_article() and other query issued by this thread inside the
+    block into one unit of work on a single connection of the active database, committed
+    once on exit and rolled back if the block raises. Nested transaction() blocks join the
+    outermost one.
+
+    Yields:
+        TransactionConnection: The shared connection
+    """
+    return current_database().transaction()
+
+# Schema migrations, applied in order. Migration N (1-based) upgrades a database
+# whose PRAGMA user_version is N - 1; the version is bumped in the same transaction.
+MIGRATIONS = [
+    # 1: Base schema. Uses IF NOT EXISTS so databases created before versioning
+    # (user_version 0 but tables present) are adopted in place.
+    [
+        # Create the authors table: stores author information with auto-incrementing ID and required name
+        """
         CREATE TABLE IF NOT EXISTS authors (
             id INTEGER PRIMARY KEY,
             name TEXT NOT NULL
         );
-    """)
-    # Create the magazines table: stores magazine information with auto-incrementing ID, required name and category
-    cursor.execute("""
+        """,
+        # Create the magazines table: stores magazine information with auto-incrementing ID, required name and category
+        """
         CREATE TABLE IF NOT EXISTS magazines (
             id INTEGER PRIMARY KEY,
             name TEXT NOT NULL,
             category TEXT NOT NULL
         );
-    """)
-    # Create the articles table: stores article information with foreign keys linking to authors and magazines
-    # Ensures that articles can only reference existing authors and magazines
-    cursor.execute("""
+        """,
+        # Create the articles table: stores article information with foreign keys linking to authors and magazines
+        # Ensures that articles can only reference existing authors and magazines
+        """
         CREATE TABLE IF NOT EXISTS articles (
             id INTEGER PRIMARY KEY,
             title TEXT NOT NULL,
@@ -50,8 +1360,509 @@ def create_tables():
             FOREIGN KEY (author_id) REFERENCES authors(id),
             FOREIGN KEY (magazine_id) REFERENCES magazines(id)
         );
-    """)
-    # Commit all the table creation changes to the database
-    conn.commit()
-    # Close the database connection to free resources
-    conn.close()
+        """,
+    ],
+    # 2: Covering indexes for the article relationship queries. (magazine_id, author_id)
+    # serves Magazine.articles/contributors/contributing_authors/article_titles and
+    # top_publisher; (author_id, magazine_id) serves Author.articles/magazines.
+    [
+        "CREATE INDEX IF NOT EXISTS idx_articles_magazine_author ON articles (magazine_id, author_id);",
+        "CREATE INDEX IF NOT EXISTS idx_articles_author_magazine ON articles (author_id, magazine_id);",
+    ],
+    # 3: Single-column indexes whose entries are ordered by (fk, id), so keyset pages
+    # (WHERE fk = ? AND id > ? ORDER BY id LIMIT ?) are index range scans without a sort.
+    [
+        "CREATE INDEX IF NOT EXISTS idx_articles_magazine ON articles (magazine_id);",
+        "CREATE INDEX IF NOT EXISTS idx_articles_author ON articles (author_id);",
+    ],
+    # 4: Materialized article counts per magazine and per (magazine, author), kept current by
+    # triggers on articles, so top_publisher and contributing_authors are index lookups.
+    [
+        """
+        CREATE TABLE IF NOT EXISTS magazine_article_counts (
+            magazine_id INTEGER PRIMARY KEY,
+            article_count INTEGER NOT NULL
+        );
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_magazine_article_counts_count ON magazine_article_counts (article_count DESC, magazine_id);",
+        """
+        CREATE TABLE IF NOT EXISTS magazine_author_counts (
+            magazine_id INTEGER NOT NULL,
+            author_id INTEGER NOT NULL,
+            article_count INTEGER NOT NULL,
+            PRIMARY KEY (magazine_id, author_id)
+        ) WITHOUT ROWID;
+        """,
+        # Backfill from the articles already present
+        "DELETE FROM magazine_article_counts;",
+        "DELETE FROM magazine_author_counts;",
+        """
+        INSERT INTO magazine_article_counts (magazine_id, article_count)
+        SELECT magazine_id, COUNT(*) FROM articles WHERE magazine_id IS NOT NULL GROUP BY magazine_id;
+        """,
+        """
+        INSERT INTO magazine_author_counts (magazine_id, author_id, article_count)
+        SELECT magazine_id, author_id, COUNT(*) FROM articles
+        WHERE magazine_id IS NOT NULL AND author_id IS NOT NULL GROUP BY magazine_id, author_id;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS articles_counts_insert AFTER INSERT ON articles BEGIN
+            INSERT INTO magazine_article_counts (magazine_id, article_count)
+            SELECT NEW.magazine_id, 1 WHERE NEW.magazine_id IS NOT NULL
+            ON CONFLICT (magazine_id) DO UPDATE SET article_count = article_count + 1;
+            INSERT INTO magazine_author_counts (magazine_id, author_id, article_count)
+            SELECT NEW.magazine_id, NEW.author_id, 1 WHERE NEW.magazine_id IS NOT NULL AND NEW.author_id IS NOT NULL
+            ON CONFLICT (magazine_id, author_id) DO UPDATE SET article_count = article_count + 1;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS articles_counts_delete AFTER DELETE ON articles BEGIN
+            UPDATE magazine_article_counts SET article_count = article_count - 1 WHERE magazine_id = OLD.magazine_id;
+            DELETE FROM magazine_article_counts WHERE magazine_id = OLD.magazine_id AND article_count <= 0;
+            UPDATE magazine_author_counts SET article_count = article_count - 1
+            WHERE magazine_id = OLD.magazine_id AND author_id = OLD.author_id;
+            DELETE FROM magazine_author_counts
+            WHERE magazine_id = OLD.magazine_id AND author_id = OLD.author_id AND article_count <= 0;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS articles_counts_update AFTER UPDATE OF author_id, magazine_id ON articles
+        WHEN OLD.author_id IS NOT NEW.author_id OR OLD.magazine_id IS NOT NEW.magazine_id BEGIN
+            UPDATE magazine_article_counts SET article_count = article_count - 1 WHERE magazine_id = OLD.magazine_id;
+            DELETE FROM magazine_article_counts WHERE magazine_id = OLD.magazine_id AND article_count <= 0;
+            UPDATE magazine_author_counts SET article_count = article_count - 1
+            WHERE magazine_id = OLD.magazine_id AND author_id = OLD.author_id;
+            DELETE FROM magazine_author_counts
+            WHERE magazine_id = OLD.magazine_id AND author_id = OLD.author_id AND article_count <= 0;
+            INSERT INTO magazine_article_counts (magazine_id, article_count)
+            SELECT NEW.magazine_id, 1 WHERE NEW.magazine_id IS NOT NULL
+            ON CONFLICT (magazine_id) DO UPDATE SET article_count = article_count + 1;
+            INSERT INTO magazine_author_counts (magazine_id, author_id, article_count)
+            SELECT NEW.magazine_id, NEW.author_id, 1 WHERE NEW.magazine_id IS NOT NULL AND NEW.author_id IS NOT NULL
+            ON CONFLICT (magazine_id, author_id) DO UPDATE SET article_count = article_count + 1;
+        END;
+        """,
+    ],
+    # 5: Materialized article counts per author for the author leaderboard
+    [
+        """
+        CREATE TABLE IF NOT EXISTS author_article_counts (
+            author_id INTEGER PRIMARY KEY,
+            article_count INTEGER NOT NULL
+        );
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_author_article_counts_count ON author_article_counts (article_count DESC, author_id);",
+        "DELETE FROM author_article_counts;",
+        """
+        INSERT INTO author_article_counts (author_id, article_count)
+        SELECT author_id, COUNT(*) FROM articles WHERE author_id IS NOT NULL GROUP BY author_id;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS articles_author_counts_insert AFTER INSERT ON articles BEGIN
+            INSERT INTO author_article_counts (author_id, article_count)
+            SELECT NEW.author_id, 1 WHERE NEW.author_id IS NOT NULL
+            ON CONFLICT (author_id) DO UPDATE SET article_count = article_count + 1;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS articles_author_counts_delete AFTER DELETE ON articles BEGIN
+            UPDATE author_article_counts SET article_count = article_count - 1 WHERE author_id = OLD.author_id;
+            DELETE FROM author_article_counts WHERE author_id = OLD.author_id AND article_count <= 0;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS articles_author_counts_update AFTER UPDATE OF author_id ON articles
+        WHEN OLD.author_id IS NOT NEW.author_id BEGIN
+            UPDATE author_article_counts SET article_count = article_count - 1 WHERE author_id = OLD.author_id;
+            DELETE FROM author_article_counts WHERE author_id = OLD.author_id AND article_count <= 0;
+            INSERT INTO author_article_counts (author_id, article_count)
+            SELECT NEW.author_id, 1 WHERE NEW.author_id IS NOT NULL
+            ON CONFLICT (author_id) DO UPDATE SET article_count = article_count + 1;
+        END;
+        """,
+    ],
+    # 6: Full-text index over article titles and content. The FTS5 table stores only the
+    # index (external content), and triggers mirror every change to articles into it.
+    [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+            title, content, content='articles', content_rowid='id'
+        );
+        """,
+        "INSERT INTO articles_fts (articles_fts) VALUES ('rebuild');",
+        """
+        CREATE TRIGGER IF NOT EXISTS articles_fts_insert AFTER INSERT ON articles BEGIN
+            INSERT INTO articles_fts (rowid, title, content) VALUES (NEW.id, NEW.title, NEW.content);
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS articles_fts_delete AFTER DELETE ON articles BEGIN
+            INSERT INTO articles_fts (articles_fts, rowid, title, content) VALUES ('delete', OLD.id, OLD.title, OLD.content);
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS articles_fts_update AFTER UPDATE OF title, content ON articles BEGIN
+            INSERT INTO articles_fts (articles_fts, rowid, title, content) VALUES ('delete', OLD.id, OLD.title, OLD.content);
+            INSERT INTO articles_fts (rowid, title, content) VALUES (NEW.id, NEW.title, NEW.content);
+        END;
+        """,
+    ],
+    # 7: Per-author access to the (magazine, author) counters, for topic areas
+    [
+        "CREATE INDEX IF NOT EXISTS idx_magazine_author_counts_author ON magazine_author_counts (author_id, magazine_id);",
+    ],
+    # 8: Article content moves out of the articles table into article_contents, keyed by
+    # article id (its rowid, for blob I/O) and optionally zlib-compressed; articles without
+    # content have no row. The search index now reads content through a view that decodes
+    # it with the article_text() SQL function, which every pooled connection registers, so
+    # writing to articles or article_contents requires a connection from this module.
+    [
+        """
+        CREATE TABLE IF NOT EXISTS article_contents (
+            article_id INTEGER PRIMARY KEY,
+            compressed INTEGER NOT NULL DEFAULT 0,
+            body BLOB NOT NULL
+        );
+        """,
+        """
+        INSERT INTO article_contents (article_id, compressed, body)
+        SELECT id, 0, CAST(content AS BLOB) FROM articles WHERE content <> '';
+        """,
+        "DROP TRIGGER IF EXISTS articles_fts_insert;",
+        "DROP TRIGGER IF EXISTS articles_fts_delete;",
+        "DROP TRIGGER IF EXISTS articles_fts_update;",
+        "DROP TABLE IF EXISTS articles_fts;",
+        "ALTER TABLE articles DROP COLUMN content;",
+        """
+        CREATE VIEW IF NOT EXISTS article_search_source AS
+        SELECT articles.id AS id, articles.title AS title,
+               COALESCE(article_text(article_contents.body, article_contents.compressed), '') AS content
+        FROM articles LEFT JOIN article_contents ON article_contents.article_id = articles.id;
+        """,
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+            title, content, content='article_search_source', content_rowid='id'
+        );
+        """,
+        "INSERT INTO articles_fts (articles_fts) VALUES ('rebuild');",
+        # A new article is indexed without content until its article_contents row is written
+        """
+        CREATE TRIGGER IF NOT EXISTS articles_fts_insert AFTER INSERT ON articles BEGIN
+            INSERT INTO articles_fts (rowid, title, content) VALUES (NEW.id, NEW.title, '');
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS articles_fts_delete AFTER DELETE ON articles BEGIN
+            INSERT INTO articles_fts (articles_fts, rowid, title, content)
+            SELECT 'delete', OLD.id, OLD.title, COALESCE(
+                (SELECT article_text(body, compressed) FROM article_contents WHERE article_id = OLD.id), '');
+            DELETE FROM article_contents WHERE article_id = OLD.id;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS articles_fts_update AFTER UPDATE OF title ON articles
+        WHEN OLD.title IS NOT NEW.title BEGIN
+            INSERT INTO articles_fts (articles_fts, rowid, title, content)
+            SELECT 'delete', OLD.id, OLD.title, content FROM article_search_source WHERE id = NEW.id;
+            INSERT INTO articles_fts (rowid, title, content)
+            SELECT id, title, content FROM article_search_source WHERE id = NEW.id;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS article_contents_fts_insert AFTER INSERT ON article_contents BEGIN
+            INSERT INTO articles_fts (articles_fts, rowid, title, content)
+            SELECT 'delete', id, title, '' FROM articles WHERE id = NEW.article_id;
+            INSERT INTO articles_fts (rowid, title, content)
+            SELECT id, title, article_text(NEW.body, NEW.compressed) FROM articles WHERE id = NEW.article_id;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS article_contents_fts_update AFTER UPDATE ON article_contents BEGIN
+            INSERT INTO articles_fts (articles_fts, rowid, title, content)
+            SELECT 'delete', id, title, article_text(OLD.body, OLD.compressed) FROM articles WHERE id = OLD.article_id;
+            INSERT INTO articles_fts (rowid, title, content)
+            SELECT id, title, article_text(NEW.body, NEW.compressed) FROM articles WHERE id = NEW.article_id;
+        END;
+        """,
+        # When the article itself is being deleted its row is already gone and nothing matches
+        """
+        CREATE TRIGGER IF NOT EXISTS article_contents_fts_delete AFTER DELETE ON article_contents BEGIN
+            INSERT INTO articles_fts (articles_fts, rowid, title, content)
+            SELECT 'delete', id, title, article_text(OLD.body, OLD.compressed) FROM articles WHERE id = OLD.article_id;
+            INSERT INTO articles_fts (rowid, title, content)
+            SELECT id, title, '' FROM articles WHERE id = OLD.article_id;
+        END;
+        """,
+    ],
+    # 9: Bulk inserts maintain the counters and the search index once per chunk. While a
+    # writer's transaction holds a row of article_bulk_inserts, the insert triggers skip
+    # articles whose ID lies in its range, and the writer updates the derived tables with one
+    # aggregated statement each (see Article.bulk_create()). The three insert triggers on
+    # articles are merged into one, since firing a trigger costs about as much per row as
+    # running its statements, even when its WHEN clause is false.
+    [
+        """
+        CREATE TABLE IF NOT EXISTS article_bulk_inserts (
+            first_id INTEGER NOT NULL,
+            last_id INTEGER NOT NULL
+        );
+        """,
+        "DROP TRIGGER IF EXISTS articles_counts_insert;",
+        "DROP TRIGGER IF EXISTS articles_author_counts_insert;",
+        "DROP TRIGGER IF EXISTS articles_fts_insert;",
+        "DROP TRIGGER IF EXISTS article_contents_fts_insert;",
+        """
+        CREATE TRIGGER IF NOT EXISTS articles_insert AFTER INSERT ON articles
+        WHEN NOT EXISTS (SELECT 1 FROM article_bulk_inserts WHERE NEW.id BETWEEN first_id AND last_id) BEGIN
+            INSERT INTO magazine_article_counts (magazine_id, article_count)
+            SELECT NEW.magazine_id, 1 WHERE NEW.magazine_id IS NOT NULL
+            ON CONFLICT (magazine_id) DO UPDATE SET article_count = article_count + 1;
+            INSERT INTO magazine_author_counts (magazine_id, author_id, article_count)
+            SELECT NEW.magazine_id, NEW.author_id, 1 WHERE NEW.magazine_id IS NOT NULL AND NEW.author_id IS NOT NULL
+            ON CONFLICT (magazine_id, author_id) DO UPDATE SET article_count = article_count + 1;
+            INSERT INTO author_article_counts (author_id, article_count)
+            SELECT NEW.author_id, 1 WHERE NEW.author_id IS NOT NULL
+            ON CONFLICT (author_id) DO UPDATE SET article_count = article_count + 1;
+            INSERT INTO articles_fts (rowid, title, content) VALUES (NEW.id, NEW.title, '');
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS article_contents_fts_insert AFTER INSERT ON article_contents
+        WHEN NOT EXISTS (SELECT 1 FROM article_bulk_inserts WHERE NEW.article_id BETWEEN first_id AND last_id) BEGIN
+            INSERT INTO articles_fts (articles_fts, rowid, title, content)
+            SELECT 'delete', id, title, '' FROM articles WHERE id = NEW.article_id;
+            INSERT INTO articles_fts (rowid, title, content)
+            SELECT id, title, article_text(NEW.body, NEW.compressed) FROM articles WHERE id = NEW.article_id;
+        END;
+        """,
+    ],
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def _apply_migration(conn, version, statements):
+    """
+    Runs one migration's statements and records the new schema version.
+    Must be called inside an open transaction.
+    """
+    for statement in statements:
+        conn.execute(statement)
+    conn.execute(f"PRAGMA user_version = {version};")
+
+
+def create_tables():
+    """
+    Creates the necessary database tables for the magazine application, or upgrades an
+    existing database to the current schema version.
+    This function sets up the schema with proper foreign key relationships to maintain data integrity.
+    The schema version is tracked in PRAGMA user_version; pending migrations are applied in order,
+    each in its own transaction, and an up-to-date database is left untouched without running any DDL.
+    Applies to the active database, or to every shard of a sharded one.
+    """
+    current_database().create_tables()
+
+def rebuild_search_index():
+    """
+    Rebuilds the full-text search index from the articles table.
+
+    The triggers keep the index in sync with every write, so this is only needed for a
+    database whose articles were changed with the triggers missing or disabled, or to
+    recover from a corrupted index. Migrates the schema first if necessary.
+
+    Returns:
+        int: The number of articles indexed
+    """
+    create_tables()
+
+    def rebuild():
+        with transaction() as conn:
+            conn.execute("INSERT INTO articles_fts (articles_fts) VALUES ('rebuild');")
+            return conn.execute("SELECT COUNT(*) FROM articles;").fetchone()[0]
+    return sum(scatter(rebuild))
+
+# Upper bound on bound parameters per statement; SQLite's default limit is 999
+MAX_QUERY_PARAMS = 500
+# Default number of rows sent per executemany() call by the bulk save APIs
+BULK_CHUNK_SIZE = 10000
+# Default number of rows fetched per page by the streaming iterators
+PAGE_SIZE = 500
+
+
+def chunked(items, size=MAX_QUERY_PARAMS):
+    """
+    Splits an iterable into consecutive lists of at most `size` items without
+    materializing it, used to keep `IN (...)` queries under SQLite's bound-parameter
+    limit and to batch bulk writes.
+    """
+    iterator = iter(items)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_pages(query, params, batch_size=PAGE_SIZE, after_id=None, database=None):
+    """
+    Streams the rows of a query one keyset page at a time.
+
+    Each page is fetched with `AND id > ? ORDER BY id LIMIT ?` appended to the
+    query, resuming after the last id of the previous page, so memory stays
+    bounded by batch_size and no OFFSET scan is needed. A pooled connection is
+    held only while a page is being fetched, not while the caller consumes it.
+    On a sharded database every shard is paged through and the rows are merged
+    in id order.
+
+    Args:
+        query (str): A SELECT whose first column is id, ending in a WHERE clause
+        params (tuple): Parameters for the query's placeholders
+        batch_size (int): Maximum rows per page
+        after_id (int, optional): Only yield rows with a greater id, to resume iteration
+        database (optional): The database or shard to query; the active database by default
+
+    Yields:
+        list[tuple]: Pages of rows in ascending id order
+    """
+    database = database or current_database()
+    shards = database.shards
+    if len(shards) > 1:
+        streams = [itertools.chain.from_iterable(iter_pages(query, params, batch_size, after_id, shard))
+                   for shard in shards]
+        yield from chunked(heapq.merge(*streams, key=operator.itemgetter(0)), batch_size)
+        return
+    last_id = after_id
+    while True:
+        with database.connection() as conn:
+            cursor = conn.cursor()
+            if last_id is None:
+                cursor.execute(f"{query} ORDER BY id LIMIT ?", (*params, batch_size))
+            else:
+                cursor.execute(f"{query} AND id > ? ORDER BY id LIMIT ?", (*params, last_id, batch_size))
+            rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield rows
+        if len(rows) < batch_size:
+            return
+        last_id = rows[-1][0]
+
+
+def save_objects(table, columns, items, values, chunk_size=BULK_CHUNK_SIZE, before_write=None, after_write=None,
+                 changes=None, bulk_insert=None):
+    """
+    Inserts or updates many rows in a single transaction.
+
+    Items are model instances or plain tuples. Instances whose id is None and
+    all tuples are inserted; instances with an id are updated. Each group is
+    written with one executemany() call per chunk. New IDs are allocated
+    sequentially from MAX(id) while the write lock is held (see
+    Database.id_sequence()) and assigned back
+    to inserted instances, so no per-row round trip is needed to learn them.
+    If the transaction rolls back, those instances get their id reset to None
+    and updated instances are evicted from the object caches.
+    Updated instances can set only the columns that changed: rows are grouped
+    by changed columns into one UPDATE statement each, and rows with no changed
+    column are not updated at all. Written instances are tracked as clean
+    afterwards (see tracking.mark_clean()).
+
+    Args:
+        table (str): Table to write to
+        columns (tuple[str]): Column names, excluding id
+        items (iterable): Model instances or tuples of column values
+        values (callable): Maps an item to a validated tuple of column values
+        chunk_size (int): Rows per executemany() call
+        before_write (callable, optional): Called with the connection and each chunk of
+            items before the chunk is written, e.g. to read the rows it will replace
+        after_write (callable, optional): Called with the connection, each chunk of items and
+            the list of their row IDs after the chunk is written, e.g. to write dependent rows
+        changes (callable, optional): Maps an instance with an id to the tuple of columns to
+            set, or None for all of them; by default every column is set
+        bulk_insert (callable, optional): Called with the connection and the first and last
+            ID of each chunk's inserted rows, it returns a context manager entered around
+            inserting them and after_write, e.g. to maintain derived tables once per chunk
+            instead of in per-row triggers
+
+    Returns:
+        int: Number of rows written (or saved unchanged)
+    """
+    from .cache import register, detach, evict
+    from .tracking import count_inserts, mark_clean
+    insert_sql = f"INSERT INTO {table} (id, {', '.join(columns)}) VALUES ({', '.join('?' * (len(columns) + 1))})"
+    written = 0
+    with transaction() as conn:
+        cursor = conn.cursor()
+        next_id, step = current_database().id_sequence(cursor, table)
+        for chunk in chunked(items, chunk_size):
+            inserts, updates, inserted, updated, ids = [], {}, [], [], []
+            conn.on_rollback(lambda inserted=inserted: [detach(obj) for obj in inserted])
+            # Updated instances hold values the database no longer has after a rollback
+            conn.on_rollback(lambda updated=updated: [evict(type(obj), obj.id) for obj in updated])
+            if before_write is not None:
+                before_write(conn, chunk)
+            for item in chunk:
+                row = values(item)
+                if isinstance(item, tuple):
+                    inserts.append((next_id, *row))
+                    ids.append(next_id)
+                    next_id += step
+                elif item.id is None:
+                    item.id = next_id
+                    next_id += step
+                    inserts.append((item.id, *row))
+                    inserted.append(item)
+                    ids.append(item.id)
+                else:
+                    changed = None if changes is None else changes(item)
+                    if changed is None:
+                        updates.setdefault(columns, []).append((*row, item.id))
+                    elif changed:
+                        updates.setdefault(changed, []).append((*(row[columns.index(c)] for c in changed), item.id))
+                    updated.append(item)
+                    ids.append(item.id)
+            for changed, rows in updates.items():
+                cursor.executemany(f"UPDATE {table} SET {', '.join(f'{column} = ?' for column in changed)} WHERE id = ?",
+                                   rows)
+            with nullcontext() if bulk_insert is None or not inserts else \
+                    bulk_insert(conn, inserts[0][0], inserts[-1][0]):
+                cursor.executemany(insert_sql, inserts)
+                count_inserts(len(inserts))
+                if after_write is not None:
+                    after_write(conn, chunk, ids)
+            for obj in inserted:
+                mark_clean(obj, conn)
+            for obj in updated:
+                register(mark_clean(obj, conn))
+            written += len(chunk)
+    return written
+
+
+def main(argv=None):
+    """
+    Command-line maintenance for a database file.
+
+    Usage:
+        python -m lib.database_utils [--db PATH] migrate
+        python -m lib.database_utils [--db PATH] rebuild-search-index
+    """
+    import argparse
+    global DB_FILE
+    parser = argparse.ArgumentParser(prog="python -m lib.database_utils", description="Magazine database maintenance")
+    parser.add_argument("--db", default=DB_FILE, help=f"database file (default: {DB_FILE})")
+    parser.add_argument("command", choices=["migrate", "rebuild-search-index"])
+    args = parser.parse_args(argv)
+    DB_FILE = args.db
+    close_pool()
+    try:
+        if args.command == "migrate":
+            create_tables()
+            print(f"{args.db}: schema version {SCHEMA_VERSION}")
+        else:
+            print(f"{args.db}: indexed {rebuild_search_index():,} articles")
+    finally:
+        close_pool()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,9 +4,16 @@ Magazine module for managing magazine entities in the magazine database.
 This module defines the Magazine class, which represents a magazine in the system.
 Magazines have a name and category, both of which are mutable with validation.
 Magazines can contain articles and have relationships to their contributors.
+On a sharded database, queries about one magazine's articles go to the shard
+storing them and rankings across magazines are merged from every shard.
 """
 
-from .database_utils import get_connection
+from .database_utils import (get_connection, transaction, chunked, iter_pages, save_objects, current_database, scatter,
+                             routed, rank_totals, rank_page, fetch_ranked, BULK_CHUNK_SIZE, PAGE_SIZE)
+from .cache import lookup, register, detach, evict, cached_relation, invalidate, relation_cache_enabled
+from .async_utils import run_read, run_write
+from .query import QuerySet
+from .tracking import record, changed, count, count_inserts, mark_clean
 
 class Magazine:
     """
@@ -17,6 +24,8 @@ class Magazine:
     Magazines can publish articles and have relationships to their articles and contributors.
     """
 
+    __slots__ = ("id", "_name", "_category", "_changes")
+
     def __init__(self, id, name, category):
         """
         Initialize a new Magazine instance.
@@ -34,6 +43,7 @@ class Magazine:
         if not isinstance(category, str) or len(category) == 0:
             raise ValueError("Category must be a non-empty string")
         self.id = id
+        self._changes = None
         self._name = name
         self._category = category
 
@@ -60,6 +70,8 @@ class Magazine:
         """
         if not isinstance(value, str) or len(value) == 0:
             raise ValueError("Name must be a non-empty string")
+        if self._changes is not None:
+            record(self, "name", self._name)
         self._name = value
 
     @property
@@ -85,6 +97,8 @@ class Magazine:
         """
         if not isinstance(value, str) or len(value) == 0:
             raise ValueError("Category must be a non-empty string")
+        if self._changes is not None:
+            record(self, "category", self._category)
         self._category = value
 
     @classmethod
@@ -96,9 +110,31 @@ class Magazine:
             row (tuple): Database row containing (id, name, category)
 
         Returns:
-            Magazine: New Magazine instance with data from the row
+            Magazine: Magazine instance with data from the row, or the instance already
+            cached for this ID
         """
-        return cls(*row)
+        cached = lookup(cls, row[0], count=False)
+        if cached is not None:
+            return cached
+        return register(mark_clean(cls(*row)))
+
+    @classmethod
+    def where(cls, **filters):
+        """
+        Start a lazy query over the magazines, e.g. `Magazine.where(category="Science").values("name", flat=True)`.
+
+        Nothing is run until the result is iterated or counted; see lib.query.
+
+        Args:
+            **filters: `field=value` or `field__lookup=value` conditions, combined with AND
+
+        Returns:
+            QuerySet: The query
+
+        Raises:
+            ValueError: If a field or lookup is unknown
+        """
+        return QuerySet(cls, "magazines").where(**filters)
 
     @classmethod
     def find_by_id(cls, id):
@@ -111,114 +147,476 @@ class Magazine:
         Returns:
             Magazine or None: Magazine instance if found, None otherwise
         """
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM magazines WHERE id = ?", (id,))
-        row = cursor.fetchone()
-        conn.close()
+        cached = lookup(cls, id)
+        if cached is not None:
+            return cached
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM magazines WHERE id = ?", (id,))
+            row = cursor.fetchone()
         if row:
             return cls.new_from_db(row)
         return None
 
+    @classmethod
+    def find_by_ids(cls, ids):
+        """
+        Find several magazines by ID using one `IN (...)` query per chunk of IDs.
+
+        Args:
+            ids (iterable[int]): The magazine IDs to look up (duplicates and None are ignored)
+
+        Returns:
+            dict[int, Magazine]: Magazine instances keyed by ID; missing IDs are absent
+        """
+        found = {}
+        wanted = set()
+        for id in ids:
+            if id is None or id in found or id in wanted:
+                continue
+            cached = lookup(cls, id)
+            if cached is not None:
+                found[id] = cached
+            else:
+                wanted.add(id)
+        if not wanted:
+            return found
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            for chunk in chunked(wanted):
+                placeholders = ", ".join("?" * len(chunk))
+                cursor.execute(f"SELECT * FROM magazines WHERE id IN ({placeholders})", chunk)
+                for row in cursor.fetchall():
+                    found[row[0]] = cls.new_from_db(row)
+        return found
+
     def save(self):
         """
         Save the magazine to the database.
 
         If the magazine is new (id is None), performs an INSERT operation.
         If the magazine exists (id is set), performs an UPDATE operation.
+        A magazine loaded from or saved to the database only updates the columns
+        changed since, and is not written at all if none changed.
         Sets the id attribute for new magazines after insertion.
+        The saved instance becomes the cached instance for its ID.
+        Commits immediately, unless called inside a transaction() block, whose
+        single commit it joins.
         """
-        conn = get_connection()
-        cursor = conn.cursor()
-        try:
+        values = {"name": self.name, "category": self.category}
+        columns = None
+        if self.id is not None:
+            columns = changed(self, values)
+            count(columns, len(values))
+            if columns == ():
+                register(self)
+                return
+        with transaction() as conn:
+            cursor = conn.cursor()
             if self.id is None:
                 cursor.execute("INSERT INTO magazines (name, category) VALUES (?, ?)", (self.name, self.category))
                 self.id = cursor.lastrowid
+                conn.on_rollback(lambda: detach(self))
+                count_inserts(1)
             else:
-                cursor.execute("UPDATE magazines SET name = ?, category = ? WHERE id = ?", (self.name, self.category, self.id))
-            conn.commit()
-        finally:
-            conn.close()
+                columns = columns or tuple(values)
+                cursor.execute(f"UPDATE magazines SET {', '.join(f'{column} = ?' for column in columns)} WHERE id = ?",
+                               (*(values[column] for column in columns), self.id))
+                invalidate(("magazine", self.id), ("magazines",))
+                conn.on_rollback(lambda: evict(type(self), self.id))
+            mark_clean(self, conn)
+        register(self)
+
+    @classmethod
+    def save_many(cls, magazines, chunk_size=BULK_CHUNK_SIZE):
+        """
+        Save many magazines in a single transaction using batched executemany() calls.
+
+        Args:
+            magazines (iterable[Magazine or tuple]): Magazine instances, or (name, category) tuples for new rows
+            chunk_size (int): Number of rows sent to SQLite per batch
+
+        Returns:
+            int: Number of magazines written
+
+        Raises:
+            ValueError: If a tuple contains an invalid name or category
+        """
+        def values(magazine):
+            if isinstance(magazine, tuple):
+                magazine = cls(None, *magazine)
+            return (magazine.name, magazine.category)
+
+        def changes(magazine):
+            columns = changed(magazine, {"name": magazine.name, "category": magazine.category})
+            count(columns, 2)
+            return columns
+
+        def invalidate_updated(conn, chunk):
+            updated = [("magazine", m.id) for m in chunk if not isinstance(m, tuple) and m.id is not None]
+            if updated:
+                invalidate(("magazines",), *updated)
+        return save_objects("magazines", ("name", "category"), magazines, values, chunk_size,
+                            invalidate_updated if relation_cache_enabled() else None, changes=changes)
+
+    def iter_articles(self, batch_size=PAGE_SIZE, after_id=None, prefetch=False):
+        """
+        Stream the articles published in this magazine in ascending ID order.
+
+        Rows are fetched one keyset page of batch_size at a time, so memory use
+        does not grow with the size of the magazine.
+
+        Args:
+            batch_size (int): Number of articles fetched per query
+            after_id (int, optional): Resume after the article with this ID
+            prefetch (bool): Whether to batch-load each page's authors up front
+
+        Yields:
+            Article: Article instances published in this magazine
+        """
+        from .article import Article, ARTICLE_COLUMNS
+        shard = current_database().shard_for_magazine(self.id)
+        for rows in iter_pages(f"SELECT {ARTICLE_COLUMNS} FROM articles WHERE magazine_id = ?", (self.id,), batch_size, after_id, shard):
+            yield from Article.new_from_rows(rows, magazine=self, prefetch=prefetch)
 
-    def articles(self):
+    def articles(self, prefetch=False):
         """
         Get all articles published in this magazine.
 
+        Args:
+            prefetch (bool): Whether to batch-load each article's author up front
+                instead of lazily on first access
+
         Returns:
             list[Article]: List of Article instances published in this magazine
         """
-        from .article import Article
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM articles WHERE magazine_id = ?", (self.id,))
-        rows = cursor.fetchall()
-        conn.close()
-        return [Article.new_from_db(row) for row in rows]
+        return list(self.iter_articles(prefetch=prefetch))
 
     def contributors(self):
         """
         Get all authors who have contributed articles to this magazine.
 
         Uses a JOIN query to find distinct authors through the magazine's articles.
+        The result is memoized when the relation cache is enabled, until this magazine's
+        articles or one of the authors change.
 
         Returns:
             list[Author]: List of unique Author instances who have written for this magazine
         """
         from .author import Author
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT DISTINCT authors.* FROM authors JOIN articles ON authors.id = articles.author_id WHERE articles.magazine_id = ?", (self.id,))
-        rows = cursor.fetchall()
-        conn.close()
-        return [Author.new_from_db(row) for row in rows]
+
+        def load():
+            with routed(magazine_id=self.id), get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT DISTINCT authors.* FROM authors JOIN articles ON authors.id = articles.author_id WHERE articles.magazine_id = ?", (self.id,))
+                rows = cursor.fetchall()
+            return [Author.new_from_db(row) for row in rows]
+        return cached_relation(("Magazine.contributors", self.id), load,
+                               lambda authors: [("magazine_articles", self.id)] + [("author", a.id) for a in authors])
+
+    def iter_article_titles(self, batch_size=PAGE_SIZE, after_id=None):
+        """
+        Stream the titles of the articles published in this magazine in ascending article ID order.
+
+        Args:
+            batch_size (int): Number of titles fetched per query
+            after_id (int, optional): Resume after the article with this ID
+
+        Yields:
+            str: Article titles in this magazine
+        """
+        shard = current_database().shard_for_magazine(self.id)
+        for rows in iter_pages("SELECT id, title FROM articles WHERE magazine_id = ?", (self.id,), batch_size, after_id, shard):
+            for row in rows:
+                yield row[1]
 
     def article_titles(self):
         """
         Get the titles of all articles published in this magazine.
+        The result is memoized when the relation cache is enabled, until this magazine's
+        articles change.
 
         Returns:
             list[str]: List of article titles in this magazine
         """
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT title FROM articles WHERE magazine_id = ?", (self.id,))
-        rows = cursor.fetchall()
-        conn.close()
-        return [row[0] for row in rows]
+        return cached_relation(("Magazine.article_titles", self.id), lambda: list(self.iter_article_titles()),
+                               lambda titles: [("magazine_articles", self.id)])
 
     def contributing_authors(self):
         """
         Get authors who have contributed more than 2 articles to this magazine.
 
-        Uses GROUP BY and HAVING to filter authors with more than 2 articles.
+        Reads the trigger-maintained magazine_author_counts table, so the cost depends on
+        the number of authors in this magazine rather than the size of the articles table.
 
         Returns:
             list[Author]: List of Author instances with more than 2 articles in this magazine
         """
         from .author import Author
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT author_id FROM articles WHERE magazine_id = ? GROUP BY author_id HAVING COUNT(id) > 2", (self.id,))
-        rows = cursor.fetchall()
-        conn.close()
-        return [Author.find_by_id(row[0]) for row in rows]
+        with routed(magazine_id=self.id), get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT authors.* FROM magazine_author_counts JOIN authors ON authors.id = magazine_author_counts.author_id WHERE magazine_author_counts.magazine_id = ? AND magazine_author_counts.article_count > 2", (self.id,))
+            rows = cursor.fetchall()
+        return [Author.new_from_db(row) for row in rows]
+
+    @classmethod
+    def contributing_authors_map(cls, ids=None):
+        """
+        Get the contributing authors (more than 2 articles) of many magazines at once.
+
+        Answers for every magazine (or the given ones) with a single query per chunk
+        of IDs over the per-author article counters, instead of one
+        contributing_authors() query per magazine. An author contributing to several
+        magazines is represented by one instance.
+
+        Args:
+            ids (iterable[int], optional): The magazines to include; all magazines by default
+
+        Returns:
+            dict[int, list[Author]]: Authors keyed by magazine ID, in author ID order;
+            magazines without contributing authors map to an empty list, and unknown
+            IDs are absent
+        """
+        from .author import Author
+        sql = ("SELECT magazines.id, authors.* FROM magazines "
+               "LEFT JOIN magazine_author_counts AS counts ON counts.magazine_id = magazines.id AND counts.article_count > 2 "
+               "LEFT JOIN authors ON authors.id = counts.author_id")
+        order = " ORDER BY magazines.id, authors.id"
+        if ids is None:
+            queries = [(sql + order, ())]
+        else:
+            chunks = chunked({id for id in ids if id is not None})
+            queries = ((f"{sql} WHERE magazines.id IN ({', '.join('?' * len(chunk))}){order}", chunk) for chunk in chunks)
+        queries = list(queries)
+        result = {}
+        authors = {}
+
+        def load():
+            with get_connection() as conn:
+                cursor = conn.cursor()
+                for query, params in queries:
+                    cursor.execute(query, params)
+                    for row in cursor:
+                        contributors = result.setdefault(row[0], [])
+                        if row[1] is not None:
+                            author = authors.get(row[1])
+                            if author is None:
+                                author = authors[row[1]] = Author.new_from_db(row[1:])
+                            contributors.append(author)
+        # Each magazine's counters live on one shard, so the shards fill disjoint lists
+        scatter(load)
+        return result
 
     @classmethod
     def top_publisher(cls):
         """
         Find the magazine with the most articles (top publisher).
 
-        Uses GROUP BY, ORDER BY DESC, and LIMIT 1 to find the magazine
-        with the highest article count.
+        Reads the first entry of the index on the trigger-maintained magazine_article_counts
+        table and loads the magazine in the same query. Ties go to the lowest magazine id.
+        On a sharded database the leaders of the shards are compared.
 
         Returns:
             Magazine or None: Magazine instance with most articles, or None if no articles exist
         """
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT magazine_id, COUNT(id) FROM articles GROUP BY magazine_id ORDER BY COUNT(id) DESC LIMIT 1")
-        row = cursor.fetchone()
-        conn.close()
-        if row:
-            return cls.find_by_id(row[0])
+        def load():
+            with get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT magazines.*, magazine_article_counts.article_count FROM magazine_article_counts JOIN magazines ON magazines.id = magazine_article_counts.magazine_id ORDER BY magazine_article_counts.article_count DESC, magazine_article_counts.magazine_id LIMIT 1")
+                return cursor.fetchone()
+        rows = [row for row in scatter(load) if row]
+        if rows:
+            return cls.new_from_db(min(rows, key=lambda row: (-row[-1], row[0]))[:-1])
         return None
+
+    @classmethod
+    def top_publishers(cls, n=10, offset=0, after=None):
+        """
+        Rank magazines by article count, most articles first.
+
+        Walks the count index of magazine_article_counts, loading each magazine in the same
+        query. Tied magazines share a rank (1, 2, 2, 4, ...) and are ordered by id. Deep
+        pages are cheapest with `after`, which resumes right after the previous page's
+        last entry instead of skipping `offset` entries (see fetch_ranked()). On a sharded
+        database each shard's next n + offset entries are merged and ranked.
+
+        Args:
+            n (int): Maximum number of entries to return
+            offset (int): Number of entries to skip, for pagination
+            after (tuple, optional): The last (magazine, article count, rank) entry of the previous page
+
+        Returns:
+            list[tuple[Magazine, int, int]]: (magazine, article count, rank) tuples
+        """
+        cursor = None if after is None else (after[0].id, after[1], after[2])
+        if len(current_database().shards) == 1:
+            with get_connection() as conn:
+                rows = fetch_ranked(conn, "magazines", "magazine_article_counts", "magazine_id", n, offset, cursor)
+            return [(cls.new_from_db(row[:-2]), row[-2], row[-1]) for row in rows]
+
+        # A magazine's articles are all on its shard, so merging the shards' pages ranks them
+        def load():
+            with get_connection() as conn:
+                rows = fetch_ranked(conn, "magazines", "magazine_article_counts", "magazine_id", n + offset, 0, cursor)
+                peers = 0 if cursor is None else conn.execute(
+                    "SELECT COUNT(*) FROM magazine_article_counts WHERE article_count = ? AND magazine_id <= ?",
+                    (cursor[1], cursor[0])).fetchone()[0]
+            return rows, peers
+        rows = {}
+        counts = []
+        peers = 0
+        for shard_rows, shard_peers in scatter(load):
+            peers += shard_peers
+            for row in shard_rows:
+                rows[row[0]] = row[:-2]
+                counts.append((row[0], row[-2]))
+        counts.sort(key=lambda item: (-item[1], item[0]))
+        ranked = rank_page(counts[:offset + n], cursor, peers)[offset:]
+        return [(cls.new_from_db(rows[id]), count, rank) for id, count, rank in ranked]
+
+    @classmethod
+    def top_categories(cls, n=10, offset=0):
+        """
+        Rank magazine categories by the number of articles published in them.
+
+        Sums the per-magazine counters, so the cost depends on the number of magazines
+        rather than articles. Ranks are shared on ties as in top_publishers(). On a
+        sharded database the per-shard sums are added up before ranking.
+
+        Args:
+            n (int): Maximum number of entries to return
+            offset (int): Number of entries to skip, for pagination
+
+        Returns:
+            list[tuple[str, int, int]]: (category, article count, rank) tuples
+        """
+        if len(current_database().shards) == 1:
+            with get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT category, total, RANK() OVER (ORDER BY total DESC) FROM ("
+                    "SELECT magazines.category, SUM(counts.article_count) AS total "
+                    "FROM magazine_article_counts AS counts JOIN magazines ON magazines.id = counts.magazine_id "
+                    "GROUP BY magazines.category) ORDER BY total DESC, category LIMIT ? OFFSET ?",
+                    (n, offset),
+                )
+                return [tuple(row) for row in cursor.fetchall()]
+
+        def load():
+            with get_connection() as conn:
+                return conn.execute(
+                    "SELECT magazines.category, SUM(counts.article_count) FROM magazine_article_counts AS counts "
+                    "JOIN magazines ON magazines.id = counts.magazine_id GROUP BY magazines.category").fetchall()
+        return rank_totals(scatter(load), n, offset)
+
+    @classmethod
+    async def afind_by_id(cls, id):
+        """
+        Async version of find_by_id(), run on the read executor.
+
+        Returns:
+            Magazine or None: Magazine instance if found, None otherwise
+        """
+        return await run_read(cls.find_by_id, id)
+
+    @classmethod
+    async def afind_by_ids(cls, ids):
+        """
+        Async version of find_by_ids(), run on the read executor.
+
+        Returns:
+            dict[int, Magazine]: Magazine instances keyed by ID
+        """
+        return await run_read(cls.find_by_ids, list(ids))
+
+    async def asave(self):
+        """
+        Async version of save(), run on the serialized writer thread.
+        """
+        await run_write(self.save)
+
+    @classmethod
+    async def asave_many(cls, magazines, chunk_size=BULK_CHUNK_SIZE):
+        """
+        Async version of save_many(), run on the serialized writer thread.
+
+        Returns:
+            int: Number of magazines written
+        """
+        return await run_write(cls.save_many, list(magazines), chunk_size)
+
+    async def aarticles(self, prefetch=False):
+        """
+        Async version of articles(), run on the read executor.
+
+        Returns:
+            list[Article]: List of Article instances published in this magazine
+        """
+        return await run_read(self.articles, prefetch)
+
+    async def acontributors(self):
+        """
+        Async version of contributors(), run on the read executor.
+
+        Returns:
+            list[Author]: List of unique Author instances who have written for this magazine
+        """
+        return await run_read(self.contributors)
+
+    async def aarticle_titles(self):
+        """
+        Async version of article_titles(), run on the read executor.
+
+        Returns:
+            list[str]: List of article titles in this magazine
+        """
+        return await run_read(self.article_titles)
+
+    async def acontributing_authors(self):
+        """
+        Async version of contributing_authors(), run on the read executor.
+
+        Returns:
+            list[Author]: List of Author instances with more than 2 articles in this magazine
+        """
+        return await run_read(self.contributing_authors)
+
+    @classmethod
+    async def acontributing_authors_map(cls, ids=None):
+        """
+        Async version of contributing_authors_map(), run on the read executor.
+
+        Returns:
+            dict[int, list[Author]]: Authors keyed by magazine ID
+        """
+        return await run_read(cls.contributing_authors_map, None if ids is None else list(ids))
+
+    @classmethod
+    async def atop_publisher(cls):
+        """
+        Async version of top_publisher(), run on the read executor.
+
+        Returns:
+            Magazine or None: Magazine instance with most articles, or None if no articles exist
+        """
+        return await run_read(cls.top_publisher)
+
+    @classmethod
+    async def atop_publishers(cls, n=10, offset=0, after=None):
+        """
+        Async version of top_publishers(), run on the read executor.
+
+        Returns:
+            list[tuple[Magazine, int, int]]: (magazine, article count, rank) tuples
+        """
+        return await run_read(cls.top_publishers, n, offset, after)
+
+    @classmethod
+    async def atop_categories(cls, n=10, offset=0):
+        """
+        Async version of top_categories(), run on the read executor.
+
+        Returns:
+            list[tuple[str, int, int]]: (category, article count, rank) tuples
+        """
+        return await run_read(cls.top_categories, n, offset)
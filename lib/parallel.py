@@ -0,0 +1,177 @@
+"""
+Parallel analytics across magazine partitions.
+
+Report jobs that call a relationship method for every magazine run on one
+core when done in a loop. ParallelRunner splits the magazines into ranges
+of magazine_id holding roughly equal numbers of articles (using the
+trigger-maintained per-magazine counters) and runs a job over each range
+in a ProcessPoolExecutor. The ranges are read from, and every worker
+process opens, the runner's database file with read-only connections; the
+per-range results are merged into one dict keyed by magazine id. The runner
+reads a plain file: with a database selected by bind() or using() active, it
+must be given that file explicitly, and sharded databases are not supported.
+
+A job is the name of a Magazine relationship method in BUILTIN_JOBS, or
+any picklable (module-level) function taking a Magazine. Workers read a
+committed snapshot per query, so on a WAL database they run alongside
+writers. Starting the workers and pickling results costs time, so a job
+only finishes sooner than the serial loop when there are several idle cores
+and enough work per magazine; measure with benchmarks.parallel.
+
+    with ParallelRunner(workers=4) as runner:
+        titles = runner.run("article_titles")
+"""
+
+import multiprocessing
+import os
+import pathlib
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+
+from . import database_utils
+from .database_utils import get_connection, current_database, default_database
+from .magazine import Magazine
+
+BUILTIN_JOBS = ("articles", "contributors", "contributing_authors", "article_titles")
+
+# Ranges per worker; more, smaller ranges even out skewed partitions
+PARTITIONS_PER_WORKER = 4
+
+# Readers wait this long for a writer instead of failing with "database is locked"
+WORKER_PRAGMAS = {"busy_timeout": 5000}
+
+
+def partition_ranges(partitions, db_file=None):
+    """
+    Splits the magazine ids into at most `partitions` contiguous, inclusive ranges
+    holding roughly equal numbers of articles. Magazines without articles fall
+    into the range covering their id.
+
+    Args:
+        partitions (int): Maximum number of ranges
+        db_file (str, optional): Database file to read through a read-only connection;
+            defaults to the active database
+
+    Returns:
+        list[tuple[int, int]]: (first id, last id) pairs in ascending order
+    """
+    if partitions < 1:
+        raise ValueError("At least one partition is required")
+    with _connect(db_file) as conn:
+        first, last = conn.execute("SELECT MIN(id), MAX(id) FROM magazines").fetchone()
+        if first is None:
+            return []
+        counts = conn.execute("SELECT magazine_id, article_count FROM magazine_article_counts "
+                              "WHERE magazine_id BETWEEN ? AND ? ORDER BY magazine_id", (first, last)).fetchall()
+    total = sum(count for _, count in counts)
+    target = max(1, total / partitions)
+    ranges = []
+    start = first
+    filled = 0
+    for magazine_id, count in counts:
+        filled += count
+        if filled >= target * (len(ranges) + 1) and len(ranges) < partitions - 1 and magazine_id < last:
+            ranges.append((start, magazine_id))
+            start = magazine_id + 1
+    ranges.append((start, last))
+    return ranges
+
+
+def _connect(db_file):
+    if db_file is None:
+        return get_connection()
+    uri = f"{pathlib.Path(db_file).resolve().as_uri()}?mode=ro"
+    return closing(sqlite3.connect(uri, uri=True))
+
+
+def _init_worker(db_file):
+    database_utils.DB_FILE = db_file
+    database_utils.configure_read_only(pragmas=WORKER_PRAGMAS)
+
+
+def _run_partition(job, first, last):
+    with get_connection() as conn:
+        rows = conn.execute("SELECT * FROM magazines WHERE id BETWEEN ? AND ? ORDER BY id", (first, last)).fetchall()
+    function = getattr(Magazine, job) if isinstance(job, str) else job
+    return {magazine.id: function(magazine) for magazine in map(Magazine.new_from_db, rows)}
+
+
+class ParallelRunner:
+    """
+    Runs per-magazine jobs over magazine_id partitions in a pool of worker processes.
+
+    Worker processes are started with the "spawn" method by default, so they never
+    inherit the parent's open SQLite connections, and are reused across run() calls
+    until close().
+    """
+
+    def __init__(self, workers=None, partitions=None, db_file=None, mp_context=None):
+        """
+        Args:
+            workers (int, optional): Worker processes; defaults to the number of CPUs
+            partitions (int, optional): Magazine ranges per job; defaults to
+                PARTITIONS_PER_WORKER per worker
+            db_file (str, optional): Database to read; defaults to the current DB_FILE
+            mp_context (optional): multiprocessing context; defaults to spawn
+
+        Raises:
+            ValueError: If db_file is not given while a database other than the default
+                one is selected with bind() or using()
+        """
+        if db_file is None and current_database() is not default_database:
+            raise ValueError(f"ParallelRunner reads a database file; pass db_file instead of using {current_database()!r}")
+        self.workers = workers or os.cpu_count() or 1
+        self.partitions = partitions or self.workers * PARTITIONS_PER_WORKER
+        self.db_file = os.path.abspath(db_file or database_utils.DB_FILE)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=mp_context or multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.db_file,),
+        )
+
+    def run(self, job):
+        """
+        Runs a job for every magazine and merges the results.
+
+        Args:
+            job (str or callable): A name from BUILTIN_JOBS, or a picklable function
+                taking a Magazine
+
+        Returns:
+            dict[int, object]: The job's result keyed by magazine id, in id order
+
+        Raises:
+            ValueError: If job is a string that is not a built-in job
+        """
+        if isinstance(job, str) and job not in BUILTIN_JOBS:
+            raise ValueError(f"Unknown job {job!r}; expected one of {', '.join(BUILTIN_JOBS)} or a function")
+        ranges = partition_ranges(self.partitions, self.db_file)
+        futures = [self._executor.submit(_run_partition, job, first, last) for first, last in ranges]
+        merged = {}
+        for future in futures:
+            merged.update(future.result())
+        return merged
+
+    def close(self):
+        """Shuts down the worker processes after their queued work completes."""
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def run_parallel(job, workers=None, partitions=None, db_file=None):
+    """
+    Runs one job with a temporary ParallelRunner; see ParallelRunner.run().
+
+    Returns:
+        dict[int, object]: The job's result keyed by magazine id
+    """
+    with ParallelRunner(workers, partitions, db_file) as runner:
+        return runner.run(job)
@@ -0,0 +1,375 @@
+"""
+Composable, lazy queries over the magazine database models.
+
+A QuerySet describes a SELECT: where(), order_by(), limit(), offset(),
+distinct() and values() each return a new QuerySet and run nothing. The
+query is compiled to one parameterized SQL statement and executed only when
+the QuerySet is iterated, or when count(), exists() or first() is called:
+
+    Article.where(magazine=magazine, author_id__in=[1, 2]).order_by("-id").limit(20)
+    Article.where(magazine__category="Science").values("title", flat=True)
+    Magazine.where(category="Travel").count()
+
+Filters are `field=value` or `field__lookup=value`, with the lookups in
+LOOKUPS. contains and startswith are case-sensitive (compiled to GLOB);
+icontains and istartswith use LIKE, which ignores the case of ASCII letters
+only. `__in` takes any number of values. A field is a column of the model's table, or, for articles, a column
+of its author or magazine such as `magazine__category` (joined in SQL).
+`author=` and `magazine=` accept a model instance or an ID. Article content
+is stored separately and cannot be filtered on; use Article.search().
+
+Article queries run on the shards of a sharded database that can hold
+matching rows (one shard when the magazine or article ID is fixed by the
+filters, otherwise all of them), and the per-shard results are merged in
+order before limit and offset are applied.
+"""
+
+import json
+
+from .database_utils import current_database, register_internal_module, SHARDED_TABLES, MAX_QUERY_PARAMS
+
+# Statements run by QuerySet are attributed to the code iterating or counting it
+register_internal_module(__file__)
+
+# Columns each table can be filtered, ordered and projected on; model rows are selected in this order
+COLUMNS = {
+    "authors": ("id", "name"),
+    "magazines": ("id", "name", "category"),
+    "articles": ("id", "title", "author_id", "magazine_id"),
+}
+
+# Foreign keys usable as `relation=` and `relation__column` fields: {table: {relation: (column, target table)}}
+RELATIONS = {
+    "articles": {"author": ("author_id", "authors"), "magazine": ("magazine_id", "magazines")},
+}
+
+# Lookup suffix -> SQL comparison; the lookups mapped to None are compiled separately
+LOOKUPS = {
+    "exact": "=",
+    "ne": "!=",
+    "lt": "<",
+    "lte": "<=",
+    "gt": ">",
+    "gte": ">=",
+    "in": None,
+    "isnull": None,
+    "contains": None,
+    "startswith": None,
+    "icontains": None,
+    "istartswith": None,
+}
+
+# Lookups matching part of a string value
+TEXT_LOOKUPS = ("contains", "startswith", "icontains", "istartswith")
+
+
+def _like_pattern(value, prefix):
+    escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"{escaped}%" if prefix else f"%{escaped}%"
+
+
+def _glob_pattern(value, prefix):
+    # GLOB has no escape character; its wildcards match themselves inside brackets
+    escaped = "".join(f"[{c}]" if c in "*?[" else c for c in value)
+    return f"{escaped}*" if prefix else f"*{escaped}*"
+
+
+class QuerySet:
+    """
+    A lazy SELECT over one model's table.
+
+    QuerySets are immutable: every refining method returns a new QuerySet. Iterating
+    runs the query each time and yields model instances (through the model's
+    new_from_db(), so cached instances are reused) or, after values(), tuples of
+    column values.
+    """
+
+    def __init__(self, model, table):
+        """
+        Args:
+            model (type): The model class; rows are built with model.new_from_db(row)
+            table (str): The model's table, a key of COLUMNS
+        """
+        self._model = model
+        self._table = table
+        self._filters = ()
+        self._ordering = ()
+        self._limit = None
+        self._offset = 0
+        self._distinct = False
+        self._fields = None
+        self._flat = False
+
+    def _clone(self, **changes):
+        clone = object.__new__(QuerySet)
+        clone.__dict__.update(self.__dict__, **{f"_{name}": value for name, value in changes.items()})
+        return clone
+
+    def __repr__(self):
+        sql, params = self._compile()
+        return f"<QuerySet {sql!r} {params!r}>"
+
+    def where(self, **filters):
+        """
+        Returns a QuerySet also requiring every given filter to hold.
+
+        Args:
+            **filters: `field=value` or `field__lookup=value` conditions, combined with AND
+
+        Returns:
+            QuerySet: The narrowed query
+
+        Raises:
+            ValueError: If a field or lookup is unknown, or a lookup's value has the wrong type
+        """
+        added = []
+        for key, value in filters.items():
+            field, _, lookup = key.partition("__")
+            if lookup and lookup not in LOOKUPS:
+                # A related column such as magazine__category, possibly followed by a lookup
+                column, _, lookup = lookup.partition("__")
+                field = f"{field}__{column}"
+            lookup = lookup or "exact"
+            if lookup not in LOOKUPS:
+                raise ValueError(f"Unknown lookup {lookup!r} in {key!r}")
+            if field in RELATIONS.get(self._table, {}):
+                # author=... and magazine=... compare the foreign key column
+                field = RELATIONS[self._table][field][0]
+                value = [getattr(v, "id", v) for v in value] if lookup == "in" else getattr(value, "id", value)
+            if lookup == "in":
+                value = tuple(value)
+            elif lookup in TEXT_LOOKUPS and not isinstance(value, str):
+                raise ValueError(f"{key!r} needs a string")
+            self._resolve(field, set())
+            added.append((field, lookup, value))
+        return self._clone(filters=self._filters + tuple(added))
+
+    def order_by(self, *fields):
+        """
+        Returns a QuerySet sorted by the given fields, replacing any earlier ordering.
+
+        Args:
+            *fields (str): Fields to sort by, most significant first; prefix one with "-"
+                to sort it in descending order
+
+        Returns:
+            QuerySet: The sorted query
+        """
+        ordering = []
+        for field in fields:
+            descending = field.startswith("-")
+            name = field.lstrip("-")
+            self._resolve(name, set())
+            ordering.append((name, descending))
+        return self._clone(ordering=tuple(ordering))
+
+    def limit(self, n):
+        """Returns a QuerySet yielding at most n rows (None for no limit)."""
+        if n is not None and n < 0:
+            raise ValueError("limit must not be negative")
+        return self._clone(limit=n)
+
+    def offset(self, n):
+        """Returns a QuerySet skipping the first n rows."""
+        if n < 0:
+            raise ValueError("offset must not be negative")
+        return self._clone(offset=n)
+
+    def distinct(self):
+        """Returns a QuerySet without duplicate rows, typically of a values() projection."""
+        return self._clone(distinct=True)
+
+    def values(self, *fields, flat=False):
+        """
+        Returns a QuerySet yielding tuples of the given columns instead of model instances.
+
+        Args:
+            *fields (str): Fields to select, such as "title" or "magazine__name"
+            flat (bool): Yield the bare value instead of a 1-tuple; requires exactly one field
+
+        Returns:
+            QuerySet: The projected query
+
+        Raises:
+            ValueError: If no field, or more than one with flat=True, is given
+        """
+        if not fields or (flat and len(fields) != 1):
+            raise ValueError("values() needs at least one field, and exactly one with flat=True")
+        for field in fields:
+            self._resolve(field, set())
+        return self._clone(fields=fields, flat=flat)
+
+    def _resolve(self, field, joins):
+        """Returns the SQL expression of a field, adding the relation it needs to `joins`."""
+        relation, _, column = field.partition("__")
+        if not column:
+            if field not in COLUMNS[self._table]:
+                raise ValueError(f"Unknown field {field!r} for {self._table}")
+            return f"{self._table}.{field}"
+        if relation not in RELATIONS.get(self._table, {}) or column not in COLUMNS[RELATIONS[self._table][relation][1]]:
+            raise ValueError(f"Unknown field {field!r} for {self._table}")
+        joins.add(relation)
+        return f"{relation}.{column}"
+
+    def _conditions(self, joins):
+        clauses, params = [], []
+        for field, lookup, value in self._filters:
+            expression = self._resolve(field, joins)
+            if lookup == "in":
+                if not value:
+                    clauses.append("0")
+                    continue
+                if len(value) <= MAX_QUERY_PARAMS:
+                    clauses.append(f"{expression} IN ({', '.join('?' * len(value))})")
+                    params.extend(value)
+                else:
+                    # Too many values for one placeholder each: pass them as one JSON array
+                    clauses.append(f"{expression} IN (SELECT value FROM json_each(?))")
+                    params.append(json.dumps(value))
+            elif lookup == "isnull":
+                clauses.append(f"{expression} IS {'' if value else 'NOT '}NULL")
+            elif lookup in ("contains", "startswith"):
+                clauses.append(f"{expression} GLOB ?")
+                params.append(_glob_pattern(value, lookup == "startswith"))
+            elif lookup in ("icontains", "istartswith"):
+                clauses.append(f"{expression} LIKE ? ESCAPE '\\'")
+                params.append(_like_pattern(value, lookup == "istartswith"))
+            elif value is None and lookup in ("exact", "ne"):
+                clauses.append(f"{expression} IS {'NOT ' if lookup == 'ne' else ''}NULL")
+            else:
+                clauses.append(f"{expression} {LOOKUPS[lookup]} ?")
+                params.append(value)
+        return clauses, params
+
+    def _compile(self, select=None, extra=(), ordered=True, paged=True, limit=None):
+        """
+        Builds the SELECT statement and its parameters.
+
+        Args:
+            select (list[str], optional): Expressions to select instead of the projection
+            extra (tuple[str]): Fields appended to the selection, e.g. sort keys for merging
+            ordered (bool): Whether to add the ORDER BY clause
+            paged (bool): Whether to add this QuerySet's LIMIT and OFFSET
+            limit (int, optional): A LIMIT to use instead, with no OFFSET
+
+        Returns:
+            tuple[str, list]: The SQL and its parameters
+        """
+        joins = set()
+        if select is None:
+            fields = self._fields or COLUMNS[self._table]
+            if self._fields is None:
+                select = [f"{self._table}.{column}" for column in fields]
+            else:
+                select = [self._resolve(field, joins) for field in fields]
+        select = list(select) + [self._resolve(field, joins) for field in extra]
+        clauses, params = self._conditions(joins)
+        order = [f"{self._resolve(field, joins)}{' DESC' if descending else ''}" for field, descending in self._ordering]
+        sql = f"SELECT {'DISTINCT ' if self._distinct else ''}{', '.join(select)} FROM {self._table}"
+        for relation in sorted(joins):
+            column, target = RELATIONS[self._table][relation]
+            sql += f" LEFT JOIN {target} AS {relation} ON {relation}.id = {self._table}.{column}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        if ordered and order:
+            sql += " ORDER BY " + ", ".join(order)
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        elif paged and (self._limit is not None or self._offset):
+            sql += " LIMIT ? OFFSET ?"
+            params.extend((-1 if self._limit is None else self._limit, self._offset))
+        return sql, params
+
+    def _shards(self):
+        """
+        Returns the databases to query: the active database, or for articles on a sharded
+        database the shards that can hold rows matching the ID and magazine filters.
+        """
+        database = current_database()
+        if self._table not in SHARDED_TABLES or len(database.shards) == 1:
+            return [database]
+        shards = list(database.shards)
+        for field, lookup, value in self._filters:
+            if lookup not in ("exact", "in") or field not in ("id", "magazine_id") or value is None:
+                continue
+            values = value if lookup == "in" else (value,)
+            if field == "id":
+                allowed = {database.shard_for_article(v) for v in values}
+            else:
+                allowed = {database.shard_for_magazine(v) for v in values}
+            shards = [shard for shard in shards if shard in allowed]
+        return shards
+
+    @staticmethod
+    def _execute(sql, params, database):
+        with database.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def _rows(self):
+        """Runs the query and returns its rows, merging the results of several shards."""
+        shards = self._shards()
+        if len(shards) == 1:
+            sql, params = self._compile()
+            return self._execute(sql, params, shards[0])
+        # Each shard returns its first offset + limit rows with the sort keys appended; the
+        # merged rows are sorted, deduplicated and paged here
+        keys = tuple(field for field, _ in self._ordering)
+        window = None if self._limit is None else self._offset + self._limit
+        sql, params = self._compile(extra=keys, paged=False, limit=window)
+        rows = [row for shard in shards for row in self._execute(sql, params, shard)]
+        width = len(rows[0]) - len(keys) if rows else 0
+        for position in reversed(range(len(keys))):
+            index, descending = width + position, self._ordering[position][1]
+            rows.sort(key=lambda row: (row[index] is not None, row[index]), reverse=descending)
+        rows = [row[:width] for row in rows]
+        if self._distinct:
+            rows = list(dict.fromkeys(rows))
+        end = None if self._limit is None else self._offset + self._limit
+        return rows[self._offset:end]
+
+    def __iter__(self):
+        rows = self._rows()
+        if self._fields is not None:
+            return iter([row[0] for row in rows] if self._flat else rows)
+        return iter([self._model.new_from_db(row) for row in rows])
+
+    def all(self):
+        """Runs the query and returns its results as a list."""
+        return list(self)
+
+    def first(self):
+        """Runs the query for one row and returns it, or None if there is none."""
+        return next(iter(self.limit(1)), None)
+
+    def count(self):
+        """
+        Returns the number of rows the query yields, counted by SQLite.
+
+        Returns:
+            int: The row count, after limit and offset
+        """
+        shards = self._shards()
+        if len(shards) > 1 and self._distinct:
+            # Rows repeated on several shards count once
+            return len(self._rows())
+        if self._distinct or (len(shards) == 1 and (self._limit is not None or self._offset)):
+            inner, params = self._compile(ordered=False)
+            sql = f"SELECT COUNT(*) FROM ({inner})"
+        else:
+            sql, params = self._compile(select=["COUNT(*)"], ordered=False, paged=False)
+        total = sum(self._execute(sql, params, shard)[0][0] for shard in shards)
+        if len(shards) > 1:
+            total = max(0, total - self._offset)
+            if self._limit is not None:
+                total = min(total, self._limit)
+        return total
+
+    def exists(self):
+        """
+        Returns True if the query yields at least one row, stopping at the first match.
+        """
+        if self._offset or self._limit == 0:
+            return self.count() > 0
+        sql, params = self._compile(select=["1"], ordered=False, paged=False, limit=1)
+        return any(self._execute(sql, params, shard) for shard in self._shards())
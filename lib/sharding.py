@@ -0,0 +1,237 @@
+"""
+Sharding the magazine database across several SQLite files.
+
+One SQLite file allows one writer at a time. A ShardedDatabase spreads the
+articles over N database files by magazine: the articles of magazine M (and
+their content, search index and counters) live on shard M % N, and their IDs
+are allocated congruent to the shard index modulo N, so an article ID alone
+identifies its shard. Authors and magazines are small and referenced by every
+article, so they are replicated: every write to them is applied to all shards
+in one transaction per shard, keeping their IDs identical everywhere.
+
+Bind it like any other Database and the models route themselves:
+
+    shards = ShardedDatabase([f"magazine-{i}.db" for i in range(4)])
+    shards.create_tables()
+    with using(shards):
+        magazine.articles()       # one shard
+        author.articles()         # scatter-gather over all shards
+        Magazine.top_publisher()  # merged from each shard's counters
+
+Queries about one magazine or article go to its shard; queries spanning
+magazines run on every shard (database_utils.scatter()) and are merged.
+Writes to several shards are not atomic across shards: a failure while
+committing can leave the earlier shards committed. An article cannot move to
+a magazine on another shard, since its ID encodes the shard.
+"""
+
+from contextlib import ExitStack, contextmanager
+import threading
+
+from .database_utils import Database, POOL_SIZE, POOL_TIMEOUT, HEALTH_CHECK_INTERVAL
+
+
+class ShardError(Exception):
+    """Raised when the replicated tables of the shards have diverged."""
+
+
+class ReplicatedCursor:
+    """
+    Runs every write statement on one cursor per shard. SELECTs and fetches only use
+    the first shard, whose replicated tables match the others'.
+    """
+
+    def __init__(self, cursors):
+        self._cursors = cursors
+
+    def execute(self, sql, params=()):
+        if sql.lstrip()[:6].upper() == "SELECT":
+            self._cursors[0].execute(sql, params)
+        else:
+            for cursor in self._cursors:
+                cursor.execute(sql, params)
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        rows = list(seq_of_params)
+        for cursor in self._cursors:
+            cursor.executemany(sql, rows)
+        return self
+
+    @property
+    def lastrowid(self):
+        ids = {cursor.lastrowid for cursor in self._cursors}
+        if len(ids) > 1:
+            raise ShardError(f"Shards assigned different IDs {sorted(ids)} to a replicated row")
+        return ids.pop()
+
+    @property
+    def rowcount(self):
+        return self._cursors[0].rowcount
+
+    def fetchone(self):
+        return self._cursors[0].fetchone()
+
+    def fetchmany(self, size=None):
+        return self._cursors[0].fetchmany() if size is None else self._cursors[0].fetchmany(size)
+
+    def fetchall(self):
+        return self._cursors[0].fetchall()
+
+    def __iter__(self):
+        return iter(self._cursors[0])
+
+    def close(self):
+        for cursor in self._cursors:
+            cursor.close()
+
+
+class ReplicatedConnection:
+    """
+    The connection yielded by ShardedDatabase.transaction(): wraps the transaction
+    connection of every shard and replicates writes to all of them. Commit and
+    rollback callbacks run once, after the last shard has committed or rolled back.
+    """
+
+    def __init__(self, conns):
+        self._conns = conns
+
+    def cursor(self):
+        return ReplicatedCursor([conn.cursor() for conn in self._conns])
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+    def on_commit(self, callback):
+        """Register a zero-argument callable to run after every shard commits."""
+        # The first shard's transaction is entered first, so it finishes last
+        self._conns[0].on_commit(callback)
+
+    def on_rollback(self, callback):
+        """Register a zero-argument callable to run if the transaction rolls back."""
+        self._conns[0].on_rollback(callback)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class ShardedDatabase:
+    """
+    A set of Database shards used together as one database.
+
+    Provides the same interface as Database (connection(), transaction(),
+    create_tables(), close(), ...), so it can be passed to bind() or using().
+    """
+
+    def __init__(self, db_files, size=POOL_SIZE, timeout=POOL_TIMEOUT, health_check_interval=HEALTH_CHECK_INTERVAL,
+                 wal=False, readers=POOL_SIZE, pragmas=None):
+        """
+        Args:
+            db_files (list[str]): One database file per shard; their order fixes the routing
+            size, timeout, health_check_interval, wal, readers, pragmas: Pool settings for
+                every shard; see Database
+
+        Raises:
+            ValueError: If no database file is given
+        """
+        if not db_files:
+            raise ValueError("A sharded database needs at least one shard")
+        self.shards = []
+        for index, db_file in enumerate(db_files):
+            shard = Database(db_file, size, timeout, health_check_interval, wal, readers, pragmas)
+            shard.shard_index = index
+            shard.shard_count = len(db_files)
+            shard.cache_scope = self
+            self.shards.append(shard)
+        self.cache_scope = self
+        self._local = threading.local()
+
+    def __repr__(self):
+        return f"ShardedDatabase({[shard.db_file for shard in self.shards]!r})"
+
+    def shard_for_magazine(self, magazine_id):
+        """
+        Returns the shard storing the articles of a magazine.
+
+        Args:
+            magazine_id (int or None): The magazine's ID; articles without a magazine use the first shard
+        """
+        return self.shards[(magazine_id or 0) % len(self.shards)]
+
+    def shard_for_article(self, article_id):
+        """Returns the shard storing the article with the given ID."""
+        return self.shards[article_id % len(self.shards)]
+
+    def get_pool(self):
+        """Returns the first shard's read-write pool, which answers reads of replicated tables."""
+        return self.shards[0].get_pool()
+
+    def get_read_pool(self):
+        """Returns the first shard's read-only pool in WAL mode, or None."""
+        return self.shards[0].get_read_pool()
+
+    def connection(self):
+        """
+        Returns this thread's ReplicatedConnection inside transaction(), or else a connection
+        to the first shard for reading authors and magazines.
+        """
+        current = getattr(self._local, "transaction", None)
+        if current is not None:
+            return current
+        return self.shards[0].connection()
+
+    def current_transaction(self):
+        """Returns this thread's open ReplicatedConnection, or None."""
+        return getattr(self._local, "transaction", None)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Opens a transaction on every shard, in shard order, and commits them together on exit.
+        Writes through the yielded connection are replicated; routed writes inside the block
+        (such as Article.save()) join the transaction of their shard.
+
+        Yields:
+            ReplicatedConnection: The shared connection
+        """
+        current = getattr(self._local, "transaction", None)
+        if current is not None:
+            yield current
+            return
+        with ExitStack() as stack:
+            shared = ReplicatedConnection([stack.enter_context(shard.transaction()) for shard in self.shards])
+            self._local.transaction = shared
+            try:
+                yield shared
+            finally:
+                self._local.transaction = None
+
+    def create_tables(self):
+        """Creates or upgrades the schema of every shard."""
+        for shard in self.shards:
+            shard.create_tables()
+
+    def id_sequence(self, cursor, table):
+        """Returns (first id, step) for new rows of a replicated table; see Database.id_sequence()."""
+        return self.shards[0].id_sequence(cursor, table)
+
+    def new_id(self, cursor, table):
+        """Returns None: replicated rows get the same SQLite-assigned ID on every shard."""
+        return self.shards[0].new_id(cursor, table)
+
+    def close(self):
+        """Closes the idle connections of every shard."""
+        for shard in self.shards:
+            shard.close()
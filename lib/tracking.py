@@ -0,0 +1,150 @@
+"""
+Change tracking for the magazine database models.
+
+An instance loaded from the database, or saved, is tracked: its _changes slot
+holds a dict mapping each column modified since then to the value it had when
+it was last loaded or saved. Property setters call record() before assigning,
+and save() asks changed() which columns actually differ, so it can write only
+those and skip unchanged instances without opening a connection at all. A value
+set back to its original counts as unchanged.
+
+Instances built by hand (including with an explicit id) are untracked, with
+_changes set to None, and are always written in full, as before.
+
+flush_stats() reports how many saves were written or skipped and how many
+column values were written or left out, to measure the write volume saved.
+"""
+
+import threading
+
+
+class FlushStats:
+    """Thread-safe counters of the rows and column values written by save()."""
+
+    FIELDS = ("inserts", "updates", "skipped", "columns_written", "columns_skipped")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counts = dict.fromkeys(self.FIELDS, 0)
+
+    def add(self, inserts=0, updates=0, skipped=0, columns_written=0, columns_skipped=0):
+        with self._lock:
+            counts = self._counts
+            counts["inserts"] += inserts
+            counts["updates"] += updates
+            counts["skipped"] += skipped
+            counts["columns_written"] += columns_written
+            counts["columns_skipped"] += columns_skipped
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+_stats = FlushStats()
+
+
+def flush_stats():
+    """
+    Returns the write counters accumulated since the last reset_flush_stats().
+
+    Returns:
+        dict: {"inserts", "updates", "skipped", "columns_written", "columns_skipped"}, where
+        updates and skipped count saves of existing rows that were written or skipped as
+        unchanged, and the column counters cover those saves only (an article's content
+        counts as one column)
+    """
+    return _stats.snapshot()
+
+
+def reset_flush_stats():
+    """Resets the counters reported by flush_stats()."""
+    _stats.reset()
+
+
+def record(obj, column, original):
+    """
+    Notes that a column of a tracked instance is about to change.
+
+    Only the first change since the last load or save is kept, so the stored
+    value is the one the database holds. Untracked instances are ignored.
+
+    Args:
+        obj: The model instance
+        column (str): The column being set
+        original: The column's value before the change
+    """
+    changes = obj._changes
+    if changes is not None and column not in changes:
+        changes[column] = original
+
+
+def changed(obj, current):
+    """
+    Returns the columns of an instance that must be written.
+
+    Args:
+        obj: The model instance
+        current (dict): The instance's current value of every column
+
+    Returns:
+        tuple[str] or None: The columns whose value differs from the stored one, in the order
+        of `current`, or None if the instance is untracked and every column must be written
+    """
+    changes = obj._changes
+    if changes is None:
+        return None
+    return tuple(column for column, value in current.items() if column in changes and changes[column] != value)
+
+
+def count(columns, total):
+    """
+    Adds the save of an existing row to the flush statistics.
+
+    Args:
+        columns (tuple[str] or None): The columns written, as returned by changed()
+        total (int): The number of columns a full write covers
+    """
+    written = total if columns is None else len(columns)
+    if written:
+        _stats.add(updates=1, columns_written=written, columns_skipped=total - written)
+    else:
+        _stats.add(skipped=1, columns_skipped=total)
+
+
+def count_inserts(rows):
+    """Adds inserted rows to the flush statistics."""
+    _stats.add(inserts=rows)
+
+
+def mark_clean(obj, conn=None):
+    """
+    Starts tracking an instance as matching the database.
+
+    Inside a transaction, the changes being saved are restored if it rolls back,
+    so the next save() writes them again.
+
+    Args:
+        obj: The model instance that was just loaded or written
+        conn (TransactionConnection, optional): The transaction the write belongs to
+
+    Returns:
+        The same instance
+    """
+    previous = obj._changes
+    obj._changes = {}
+    if conn is not None:
+        conn.on_rollback(lambda: _restore(obj, previous))
+    return obj
+
+
+def _restore(obj, previous):
+    if previous is None or obj._changes is None:
+        obj._changes = previous
+    else:
+        # Columns changed again after the failed save keep their older original
+        obj._changes = {**obj._changes, **previous}
@@ -0,0 +1,303 @@
+"""
+Streaming import and export of authors, magazines and articles.
+
+Records are read from and written to CSV or JSON Lines files one row at a
+time, so memory use stays flat regardless of file size. Imports are written
+in chunks with the bulk save APIs, one transaction per chunk, and articles
+refer to their author and magazine by name (their natural key), resolved
+once per chunk with a batched query. Exports stream each table with
+fetchmany(), writing the same record layout the importer reads:
+
+    authors:   name
+    magazines: name, category
+    articles:  title, content, author, magazine
+
+Usage:
+    python -m lib.transfer [--db PATH] import KIND FILE [--format csv|jsonl] [--chunk-size N]
+    python -m lib.transfer [--db PATH] export KIND FILE [--format csv|jsonl]
+
+KIND is authors, magazines or articles; FILE may be - for stdin/stdout.
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+from contextlib import contextmanager
+
+from . import database_utils
+from .database_utils import create_tables, current_database, transaction, chunked, BULK_CHUNK_SIZE, PAGE_SIZE
+from .cache import LRUCache
+from .author import Author
+from .magazine import Magazine
+from .article import Article
+
+FIELDS = {
+    "authors": ("name",),
+    "magazines": ("name", "category"),
+    "articles": ("title", "content", "author", "magazine"),
+}
+
+EXPORT_QUERIES = {
+    "authors": "SELECT name FROM authors ORDER BY id",
+    "magazines": "SELECT name, category FROM magazines ORDER BY id",
+    "articles": "SELECT articles.title, COALESCE(article_text(article_contents.body, article_contents.compressed), ''), "
+                "authors.name, magazines.name FROM articles "
+                "LEFT JOIN article_contents ON article_contents.article_id = articles.id "
+                "LEFT JOIN authors ON authors.id = articles.author_id "
+                "LEFT JOIN magazines ON magazines.id = articles.magazine_id ORDER BY articles.id",
+}
+
+# Resolved names kept across chunks; popular authors and magazines recur in every chunk
+NAME_CACHE_SIZE = 10000
+
+
+def detect_format(path, fmt=None):
+    """
+    Returns the file format, "csv" or "jsonl", from `fmt` or the file extension.
+
+    Raises:
+        ValueError: If the format is unknown or cannot be inferred
+    """
+    if fmt is None:
+        fmt = "jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv" if path.endswith(".csv") else None
+    if fmt not in ("csv", "jsonl"):
+        raise ValueError(f"Cannot tell the format of {path!r}; specify csv or jsonl")
+    return fmt
+
+
+def read_records(f, fmt, kind):
+    """
+    Lazily parses records from an open text file.
+
+    Yields:
+        dict: One record per CSV row or JSON line, restricted to the kind's fields
+    """
+    fields = FIELDS[kind]
+    if fmt == "csv":
+        rows = csv.DictReader(f)
+    else:
+        rows = (json.loads(line) for line in f if line.strip())
+    for row in rows:
+        yield {field: row.get(field) for field in fields}
+
+
+def _check_kind(kind):
+    if kind not in FIELDS:
+        raise ValueError(f"Unknown kind {kind!r}; expected one of {', '.join(FIELDS)}")
+
+
+class _NameResolver:
+    """
+    Maps names to row IDs for one table, batching lookups per chunk.
+    Duplicate names resolve to the lowest ID.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.cache = LRUCache(NAME_CACHE_SIZE)
+
+    def resolve(self, conn, names):
+        missing = {name for name in names if name and self.cache.get(name, count=False) is None}
+        for batch in chunked(missing):
+            rows = conn.execute(f"SELECT name, MIN(id) FROM {self.table} WHERE name IN ({', '.join('?' * len(batch))}) "
+                                f"GROUP BY name", batch)
+            for name, id in rows:
+                self.cache.put(name, id)
+        resolved = {}
+        for name in names:
+            if name:
+                resolved[name] = self.cache.get(name, count=False)
+        return resolved
+
+
+def _import_chunk(conn, kind, records, skip_existing, resolvers):
+    """Writes one chunk of records and returns (written, skipped)."""
+    if kind == "articles":
+        authors = resolvers["authors"].resolve(conn, {r["author"] for r in records})
+        magazines = resolvers["magazines"].resolve(conn, {r["magazine"] for r in records})
+        rows = []
+        for record in records:
+            author_id, magazine_id = authors.get(record["author"]), magazines.get(record["magazine"])
+            if record["author"] and author_id is None:
+                raise ValueError(f"Unknown author {record['author']!r} for article {record['title']!r}")
+            if record["magazine"] and magazine_id is None:
+                raise ValueError(f"Unknown magazine {record['magazine']!r} for article {record['title']!r}")
+            rows.append((record["title"], record["content"] or "", author_id, magazine_id))
+        return Article.bulk_create(rows), 0
+
+    model = Author if kind == "authors" else Magazine
+    rows = [tuple(record[field] for field in FIELDS[kind]) for record in records]
+    if skip_existing:
+        existing = resolvers[kind].resolve(conn, {row[0] for row in rows})
+        seen = {name for name, id in existing.items() if id is not None}
+        unique = []
+        for row in rows:
+            if row[0] not in seen:
+                seen.add(row[0])
+                unique.append(row)
+        rows = unique
+    return model.save_many(rows), len(records) - len(rows)
+
+
+def import_records(kind, records, chunk_size=BULK_CHUNK_SIZE, skip_existing=True, progress=None):
+    """
+    Imports an iterable of records, one transaction per chunk.
+
+    Article records name their author and magazine, which must already exist.
+    With skip_existing, authors and magazines whose name is already in the
+    database (or earlier in the input) are skipped, so re-importing a file
+    does not duplicate them. A failing chunk is rolled back; earlier chunks
+    stay committed.
+
+    Args:
+        kind (str): "authors", "magazines" or "articles"
+        records (iterable[dict]): Records with the kind's fields
+        chunk_size (int): Records per transaction
+        skip_existing (bool): Skip authors and magazines whose name already exists
+        progress (callable, optional): Called with (records processed, seconds elapsed) after each chunk
+
+    Returns:
+        dict: Counts of written and skipped records and the elapsed seconds
+
+    Raises:
+        ValueError: If a record is invalid or refers to an unknown author or magazine
+    """
+    _check_kind(kind)
+    create_tables()
+    resolvers = {"authors": _NameResolver("authors"), "magazines": _NameResolver("magazines")}
+    written = skipped = 0
+    start = time.perf_counter()
+    for chunk in chunked(records, chunk_size):
+        with transaction() as conn:
+            chunk_written, chunk_skipped = _import_chunk(conn, kind, chunk, skip_existing, resolvers)
+        written += chunk_written
+        skipped += chunk_skipped
+        if progress is not None:
+            progress(written + skipped, time.perf_counter() - start)
+    return {"written": written, "skipped": skipped, "seconds": time.perf_counter() - start}
+
+
+def export_records(kind, batch_size=PAGE_SIZE):
+    """
+    Streams every row of a table as records, fetching batch_size rows at a time.
+
+    Yields:
+        dict: Records with the kind's fields, in ID order; on a sharded database
+        articles are exported shard by shard, each in ID order
+    """
+    _check_kind(kind)
+    fields = FIELDS[kind]
+    database = current_database()
+    for shard in database.shards if kind == "articles" else [database]:
+        with shard.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(EXPORT_QUERIES[kind])
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(zip(fields, row))
+
+
+def import_file(kind, path, fmt=None, chunk_size=BULK_CHUNK_SIZE, skip_existing=True, progress=None):
+    """
+    Imports a CSV or JSON Lines file; see import_records().
+
+    Returns:
+        dict: Counts of written and skipped records and the elapsed seconds
+    """
+    fmt = detect_format(path, fmt)
+    with _open(path, "r") as f:
+        return import_records(kind, read_records(f, fmt, kind), chunk_size, skip_existing, progress)
+
+
+def export_file(kind, path, fmt=None, batch_size=PAGE_SIZE, progress=None):
+    """
+    Writes a table to a CSV or JSON Lines file.
+
+    Args:
+        kind (str): "authors", "magazines" or "articles"
+        path (str): Destination file, or - for stdout
+        fmt (str, optional): "csv" or "jsonl"; inferred from the extension by default
+        batch_size (int): Rows fetched per query round trip
+        progress (callable, optional): Called with (records written, seconds elapsed) every batch_size records
+
+    Returns:
+        dict: The number of records written and the elapsed seconds
+    """
+    fmt = detect_format(path, fmt)
+    count = 0
+    start = time.perf_counter()
+    with _open(path, "w") as f:
+        if fmt == "csv":
+            writer = csv.DictWriter(f, FIELDS[kind])
+            writer.writeheader()
+            write = writer.writerow
+        else:
+            def write(record):
+                f.write(json.dumps(record) + "\n")
+        for record in export_records(kind, batch_size):
+            write(record)
+            count += 1
+            if progress is not None and count % batch_size == 0:
+                progress(count, time.perf_counter() - start)
+    return {"written": count, "seconds": time.perf_counter() - start}
+
+
+@contextmanager
+def _open(path, mode):
+    """Opens path for text I/O with newline handling suitable for csv, treating - as stdin/stdout."""
+    if path == "-":
+        yield sys.stdin if mode == "r" else sys.stdout
+        return
+    with open(path, mode, newline="", encoding="utf-8") as f:
+        yield f
+
+
+def _report(action, kind):
+    def progress(count, seconds):
+        print(f"\r  {action} {count:,} {kind} ({count / max(seconds, 1e-9):,.0f}/s)", end="", file=sys.stderr)
+    return progress
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m lib.transfer", description="Import and export catalogue data")
+    parser.add_argument("--db", default=database_utils.DB_FILE, help=f"database file (default: {database_utils.DB_FILE})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for command in ("import", "export"):
+        sub = commands.add_parser(command)
+        sub.add_argument("kind", choices=list(FIELDS))
+        sub.add_argument("file", help="CSV or JSON Lines file, or - for stdin/stdout")
+        sub.add_argument("--format", choices=["csv", "jsonl"], help="default: inferred from the file extension")
+        if command == "import":
+            sub.add_argument("--chunk-size", type=int, default=BULK_CHUNK_SIZE, help="records per transaction")
+            sub.add_argument("--allow-duplicates", action="store_true",
+                             help="import authors and magazines even if their name already exists")
+    args = parser.parse_args(argv)
+
+    original_db_file = database_utils.DB_FILE
+    database_utils.DB_FILE = args.db
+    database_utils.close_pool()
+    try:
+        if args.command == "import":
+            result = import_file(args.kind, args.file, args.format, args.chunk_size, not args.allow_duplicates,
+                                 _report("imported", args.kind))
+            summary = f"{result['written']:,} written, {result['skipped']:,} skipped"
+        else:
+            result = export_file(args.kind, args.file, args.format, progress=_report("exported", args.kind))
+            summary = f"{result['written']:,} written"
+    except (OSError, ValueError) as e:
+        print(f"\nerror: {e}", file=sys.stderr)
+        return 1
+    finally:
+        database_utils.close_pool()
+        database_utils.DB_FILE = original_db_file
+    print(f"\n{args.command} {args.kind}: {summary} in {result['seconds']:.2f} s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""
+Test module for Article class functionality.
+
+This module contains unit tests for the Article class, covering full-text
+search, keeping the search index in sync with saved articles, and the
+separately stored, lazily loaded article content.
+"""
+
+import unittest
+import os
+import sqlite3
+from unittest import mock
+from lib.author import Author
+from lib.magazine import Magazine
+from lib.article import Article
+from lib.database_utils import (create_tables, get_connection, close_pool, rebuild_search_index,
+                                configure_content_compression, transaction, DB_FILE)
+from lib.tracking import flush_stats, reset_flush_stats
+
+class TestArticleSearch(unittest.TestCase):
+    """
+    Test cases for Article.search() and the FTS5 index.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Set up test database tables."""
+        close_pool()
+        if os.path.exists(DB_FILE):
+            os.remove(DB_FILE)
+        create_tables()
+
+    def setUp(self):
+        """Reset database state and create a small catalogue."""
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM articles")
+        cursor.execute("DELETE FROM authors")
+        cursor.execute("DELETE FROM magazines")
+        conn.commit()
+        conn.close()
+        self.author = Author(None, "Lea")
+        self.author.save()
+        self.other = Author(None, "Max")
+        self.other.save()
+        self.science = Magazine(None, "Science Weekly", "Science")
+        self.science.save()
+        self.travel = Magazine(None, "Travel Notes", "Travel")
+        self.travel.save()
+        Article.bulk_create([
+            ("Volcano eruptions explained", "Magma rises through the crust.", self.author, self.science),
+            ("Hiking near a volcano", "A trail with views of the volcano crater and the volcano lake.", self.other, self.travel),
+            ("Ocean currents", "Warm water moves north.", self.author, self.science),
+        ])
+
+    def test_search_ranks_and_filters(self):
+        """Test that matches are ranked by relevance and can be filtered by magazine and author."""
+        titles = [a.title for a in Article.search("volcano")]
+        self.assertEqual(titles, ["Hiking near a volcano", "Volcano eruptions explained"])
+        self.assertEqual([a.title for a in Article.search("volcano", magazine=self.science)],
+                         ["Volcano eruptions explained"])
+        self.assertEqual([a.title for a in Article.search("volcano", author=self.other.id)], ["Hiking near a volcano"])
+        self.assertEqual([a.title for a in Article.search("volcano", limit=1, offset=1)],
+                         ["Volcano eruptions explained"])
+        self.assertEqual({a.title for a in Article.search("title: ocean OR magma*")},
+                         {"Ocean currents", "Volcano eruptions explained"})
+
+    def test_index_follows_updates_and_deletes(self):
+        """Test that saving or deleting an article updates the index."""
+        article = Article.search("ocean")[0]
+        article.content = "Glaciers are melting."
+        article.save()
+        self.assertEqual(Article.search("ocean warm"), [])
+        self.assertEqual(Article.search("glaciers")[0].id, article.id)
+        with get_connection() as conn:
+            conn.execute("DELETE FROM articles WHERE id = ?", (article.id,))
+        self.assertEqual(Article.search("glaciers"), [])
+
+    def test_rebuild_and_invalid_query(self):
+        """Test rebuilding the index and rejecting malformed queries."""
+        self.assertEqual(rebuild_search_index(), 3)
+        self.assertEqual(len(Article.search("volcano")), 2)
+        with self.assertRaises(ValueError):
+            Article.search('"unterminated')
+        with self.assertRaises(ValueError):
+            Article.search("summary: volcano")
+        # A schema problem in the search statement itself is not a bad query
+        with mock.patch("lib.article.ARTICLE_COLUMNS", "articles.id, articles.summary, articles.author_id, articles.magazine_id"):
+            with self.assertRaises(sqlite3.OperationalError):
+                Article.search("volcano")
+
+class TestArticleContent(unittest.TestCase):
+    """
+    Test cases for lazily loaded, optionally compressed article content.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Set up test database tables."""
+        close_pool()
+        if os.path.exists(DB_FILE):
+            os.remove(DB_FILE)
+        create_tables()
+
+    def setUp(self):
+        """Reset database state and create an author and magazine."""
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM articles")
+        cursor.execute("DELETE FROM authors")
+        cursor.execute("DELETE FROM magazines")
+        conn.commit()
+        conn.close()
+        self.author = Author(None, "Nia")
+        self.author.save()
+        self.magazine = Magazine(None, "Longreads", "Essays")
+        self.magazine.save()
+
+    def tearDown(self):
+        """Turn compression off again."""
+        configure_content_compression(False)
+
+    def _stored(self, article):
+        with get_connection() as conn:
+            return conn.execute("SELECT compressed, length(body) FROM article_contents WHERE article_id = ?",
+                                (article.id,)).fetchone()
+
+    def test_listing_defers_content_until_accessed(self):
+        """Test that listed articles load their content only when it is read, and keep it when saved."""
+        Article(None, "Essay", "A long essay.", self.author, self.magazine).save()
+        article = self.magazine.articles()[0]
+        with mock.patch("lib.article.decode_content", side_effect=AssertionError("content loaded")):
+            article.save()
+        self.assertEqual(article.content, "A long essay.")
+        article.content = ""
+        article.save()
+        self.assertIsNone(self._stored(article))
+        self.assertEqual(Article.prefetch_content(self.magazine.articles())[0].content, "")
+
+    def test_compressed_content_round_trips_and_streams(self):
+        """Test compressed storage, streaming with small blob reads and searching compressed content."""
+        configure_content_compression(True, min_size=16)
+        text = "Ünïcode paragraphs repeat. " * 200
+        Article.bulk_create([("Compressed", text, self.author, self.magazine), ("Short", "tiny", self.author, self.magazine)])
+        compressed, short = self.magazine.articles()
+        self.assertEqual(self._stored(compressed)[0], 1)
+        self.assertLess(self._stored(compressed)[1], len(text) // 10)
+        self.assertEqual(self._stored(short)[0], 0)
+        self.assertEqual("".join(compressed.iter_content(chunk_size=7)), text)
+        self.assertEqual(compressed.content, text)
+        self.assertEqual(Article.search("paragraphs")[0].id, compressed.id)
+        configure_content_compression(False)
+        plain = Article(None, "Plain", text, self.author, self.magazine)
+        plain.save()
+        self.assertEqual("".join(Article.find_by_id(plain.id).iter_content(chunk_size=5)), text)
+
+    def test_save_writes_only_changed_columns_and_content(self):
+        """Test that read but unchanged content is not rewritten and a failed save stays dirty."""
+        Article(None, "Essay", "First draft.", self.author, self.magazine).save()
+        other = Magazine(None, "Shortreads", "Essays")
+        other.save()
+        article = self.magazine.articles()[0]
+        reset_flush_stats()
+        self.assertEqual(article.content, "First draft.")
+        article.magazine = other
+        with mock.patch("lib.article.encode_content", side_effect=AssertionError("content rewritten")):
+            article.save()
+        article.author = self.author.id
+        article.save()
+        with self.assertRaises(RuntimeError):
+            with transaction():
+                article.content = "Second draft."
+                article.save()
+                raise RuntimeError("abort")
+        Article.bulk_create([article])
+        self.assertEqual(flush_stats(), {"inserts": 0, "updates": 3, "skipped": 1,
+                                         "columns_written": 3, "columns_skipped": 9})
+        stored = Article.find_by_id(article.id)
+        self.assertEqual((stored.magazine_id, stored.content), (other.id, "Second draft."))
+
+if __name__ == "__main__":
+    unittest.main()
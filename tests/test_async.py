@@ -0,0 +1,77 @@
+"""
+Test module for the asyncio model API.
+
+This module contains unit tests for the async counterparts of the model
+methods, covering reads, writes and concurrent use from many coroutines.
+"""
+
+import asyncio
+import unittest
+import os
+import threading
+from lib.author import Author
+from lib.magazine import Magazine
+from lib.article import Article
+from lib.async_utils import run_read, run_write, shutdown_executors
+from lib.database_utils import create_tables, get_connection, close_pool, DB_FILE
+
+class TestAsyncModels(unittest.IsolatedAsyncioTestCase):
+    """
+    Test cases for async model methods and the executors behind them.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Set up test database tables."""
+        close_pool()
+        if os.path.exists(DB_FILE):
+            os.remove(DB_FILE)
+        create_tables()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop the executor threads."""
+        shutdown_executors()
+
+    def setUp(self):
+        """Reset database state before each test by clearing all tables."""
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM articles")
+        cursor.execute("DELETE FROM authors")
+        cursor.execute("DELETE FROM magazines")
+        conn.commit()
+        conn.close()
+
+    async def test_async_save_and_relationships(self):
+        """Test saving and querying through the async API."""
+        author = Author(None, "Ian")
+        await author.asave()
+        magazine = Magazine(None, "Async Weekly", "Tech")
+        await magazine.asave()
+        article = await author.aadd_article(magazine, "Awaiting Results")
+        self.assertEqual((await Article.afind_by_id(article.id)).title, "Awaiting Results")
+        self.assertEqual([a.title for a in await magazine.aarticles()], ["Awaiting Results"])
+        self.assertEqual(await author.atopic_areas(), ["Tech"])
+        self.assertEqual((await Magazine.atop_publisher()).id, magazine.id)
+
+    async def test_concurrent_coroutines(self):
+        """Test many coroutines reading and writing concurrently."""
+        magazine = Magazine(None, "Concurrency", "Tech")
+        await magazine.asave()
+        authors = [Author(None, f"Writer {i}") for i in range(20)]
+        await asyncio.gather(*(author.asave() for author in authors))
+        await asyncio.gather(*(author.aadd_article(magazine, f"Post {i}") for i, author in enumerate(authors)))
+        found = await asyncio.gather(*(Author.afind_by_id(author.id) for author in authors))
+        self.assertEqual([a.name for a in found], [a.name for a in authors])
+        self.assertEqual(len(await magazine.acontributors()), 20)
+
+    async def test_writes_are_serialized_on_one_thread(self):
+        """Test that every write runs on the same writer thread, off the event loop thread."""
+        threads = await asyncio.gather(*(run_write(threading.get_ident) for _ in range(10)))
+        self.assertEqual(len(set(threads)), 1)
+        self.assertNotEqual(threads[0], threading.get_ident())
+        self.assertNotEqual(await run_read(threading.get_ident), threading.get_ident())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -11,7 +11,7 @@ import os
 from lib.author import Author
 from lib.magazine import Magazine
 from lib.article import Article
-from lib.database_utils import create_tables, get_connection, DB_FILE
+from lib.database_utils import create_tables, get_connection, close_pool, DB_FILE
 
 class TestAuthor(unittest.TestCase):
     """
@@ -21,6 +21,7 @@ class TestAuthor(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
         """Set up test database tables."""
+        close_pool()
         if os.path.exists(DB_FILE):
             os.remove(DB_FILE)
         create_tables()
@@ -64,5 +65,56 @@ class TestAuthor(unittest.TestCase):
         self.assertEqual(len(magazines), 1)
         self.assertEqual(magazines[0].name, "Health Weekly")
 
+    def test_save_many_assigns_ids(self):
+        """Test bulk-saving authors from instances and tuples."""
+        authors = [Author(None, "Ann"), Author(None, "Ben")]
+        written = Author.save_many(authors + [("Cid",), ("Dee",)], chunk_size=3)
+        self.assertEqual(written, 4)
+        self.assertEqual(authors[1].id, authors[0].id + 1)
+        self.assertEqual(Author.find_by_id(authors[1].id).name, "Ben")
+        self.assertEqual(Author.find_by_id(authors[1].id + 2).name, "Dee")
+
+    def test_save_many_rolls_back_on_error(self):
+        """Test that a failing bulk save writes nothing and resets assigned ids."""
+        author = Author(None, "Eli")
+        with self.assertRaises(ValueError):
+            Author.save_many([author, ("",)])
+        self.assertIsNone(author.id)
+        conn = get_connection()
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM authors").fetchone()[0], 0)
+        conn.close()
+
+    def test_most_prolific_ranks_ties_and_pages(self):
+        """Test the author leaderboard counts, shared ranks on ties and pagination."""
+        authors = [Author(None, name) for name in ("Fox", "Gus", "Hal", "Ivy")]
+        Author.save_many(authors)
+        magazine = Magazine(None, "Board", "News")
+        magazine.save()
+        writers = [authors[0]] * 3 + [authors[1]] * 3 + [authors[2]] * 2
+        Article.bulk_create((f"Piece {i}", "", author, magazine) for i, author in enumerate(writers))
+        board = [(author.name, count, rank) for author, count, rank in Author.most_prolific()]
+        self.assertEqual(board, [("Fox", 3, 1), ("Gus", 3, 1), ("Hal", 2, 3)])
+        page = Author.most_prolific(n=1, offset=2)
+        self.assertEqual([(a.name, rank) for a, _, rank in page], [("Hal", 3)])
+        # Keyset pages continue the ranks, inside and after a tie
+        first = Author.most_prolific(n=1)
+        second = Author.most_prolific(n=1, after=first[-1])
+        third = Author.most_prolific(n=5, after=second[-1])
+        self.assertEqual([(a.name, count, rank) for a, count, rank in first + second + third], board)
+        self.assertEqual(Author.most_prolific(after=third[-1]), [])
+
+    def test_topic_areas_map_answers_for_all_authors(self):
+        """Test computing every author's topic areas at once, including authors without articles."""
+        authors = [Author(None, name) for name in ("Ola", "Pam", "Quin")]
+        Author.save_many(authors)
+        magazines = [Magazine(None, "Gadgets", "Tech"), Magazine(None, "Chips", "Tech"), Magazine(None, "Easel", "Art")]
+        Magazine.save_many(magazines)
+        Article.bulk_create([("A", "", authors[0], magazines[0]), ("B", "", authors[0], magazines[1]),
+                             ("C", "", authors[0], magazines[2]), ("D", "", authors[1], magazines[2])])
+        expected = {authors[0].id: ["Art", "Tech"], authors[1].id: ["Art"], authors[2].id: []}
+        self.assertEqual(Author.topic_areas_map(), expected)
+        self.assertEqual(Author.topic_areas_map([authors[1].id, 999]), {authors[1].id: ["Art"]})
+        self.assertEqual(authors[0].topic_areas(), ["Art", "Tech"])
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,62 @@
+"""
+Test module for the benchmark suite.
+
+This module contains smoke tests running every benchmark operation against
+an empty and a small generated dataset, checking that they complete and
+leave the dataset unchanged.
+"""
+
+import unittest
+import os
+from lib.database_utils import create_tables, get_connection, close_pool, DB_FILE
+from benchmarks.dataset import generate
+from benchmarks.suite import OPERATIONS, Sampler, run_operation
+
+class TestBenchmarkSuite(unittest.TestCase):
+    """
+    Test cases for the timed operations of the benchmark suite.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Set up test database tables."""
+        close_pool()
+        if os.path.exists(DB_FILE):
+            os.remove(DB_FILE)
+        create_tables()
+
+    def setUp(self):
+        """Reset database state before each test by clearing all tables."""
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM articles")
+        cursor.execute("DELETE FROM authors")
+        cursor.execute("DELETE FROM magazines")
+        conn.commit()
+        conn.close()
+
+    def _fingerprint(self):
+        with get_connection() as conn:
+            return [conn.execute(f"SELECT * FROM {table} ORDER BY 1, 2").fetchall()
+                    for table in ("authors", "magazines", "articles", "article_contents", "magazine_author_counts")]
+
+    def _run_all(self, iterations):
+        sampler = Sampler(seed=3)
+        for name, operation in OPERATIONS.items():
+            result = run_operation(operation, sampler, iterations, max_seconds=5.0, min_iterations=1)
+            self.assertEqual(result["iterations"], iterations, name)
+
+    def test_operations_run_on_an_empty_dataset(self):
+        """Test that sampling from empty tables does not fail."""
+        self._run_all(1)
+        self.assertEqual(self._fingerprint(), [[], [], [], [], []])
+
+    def test_operations_leave_the_dataset_unchanged(self):
+        """Test that write operations undo or rewrite exactly what they change."""
+        generate(40, seed=1)
+        before = self._fingerprint()
+        self._run_all(3)
+        self.assertEqual(self._fingerprint(), before)
+
+if __name__ == "__main__":
+    unittest.main()
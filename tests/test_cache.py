@@ -0,0 +1,222 @@
+"""
+Test module for the object cache and identity map.
+
+This module contains unit tests for session-scoped identity maps, the
+process-wide LRU object cache, the relationship result cache and their
+coherence with save().
+"""
+
+import threading
+import unittest
+import os
+from unittest import mock
+from lib.author import Author
+from lib.magazine import Magazine
+from lib.article import Article
+from lib.cache import LRUCache, RelationCache, session, configure_object_cache, configure_relation_cache, cache_stats
+from lib.database_utils import create_tables, get_connection, close_pool, transaction, DB_FILE
+
+class TestObjectCache(unittest.TestCase):
+    """
+    Test cases for identity-map sessions and the LRU object cache.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Set up test database tables."""
+        close_pool()
+        if os.path.exists(DB_FILE):
+            os.remove(DB_FILE)
+        create_tables()
+
+    def setUp(self):
+        """Reset database state before each test by clearing all tables."""
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM articles")
+        cursor.execute("DELETE FROM authors")
+        cursor.execute("DELETE FROM magazines")
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        """Disable the process-wide cache again."""
+        configure_object_cache(0)
+
+    def test_session_returns_same_instance_without_query(self):
+        """Test that a session serves repeated lookups from its identity map."""
+        author = Author(None, "Dana")
+        author.save()
+        with session() as identity_map:
+            first = Author.find_by_id(author.id)
+            with mock.patch("lib.author.get_connection", side_effect=AssertionError("database hit")):
+                second = Author.find_by_id(author.id)
+            self.assertIs(first, second)
+            self.assertEqual(identity_map.hits, 1)
+        self.assertIsNot(Author.find_by_id(author.id), first)
+
+    def test_relationships_share_instances_within_session(self):
+        """Test that relationship methods resolve rows to the session's instances."""
+        author = Author(None, "Eve")
+        author.save()
+        magazine = Magazine(None, "Orbit", "Space")
+        magazine.save()
+        author.add_article(magazine, "Launch Day")
+        with session():
+            loaded = Magazine.find_by_id(magazine.id)
+            self.assertIs(author.magazines()[0], loaded)
+
+    def test_object_cache_is_bounded_and_counts(self):
+        """Test LRU eviction and hit/miss counters of the process-wide cache."""
+        configure_object_cache(2)
+        authors = [Author(None, name) for name in ("A", "B", "C")]
+        for author in authors:
+            author.save()
+        self.assertIs(Author.find_by_id(authors[2].id), authors[2])
+        self.assertIsNot(Author.find_by_id(authors[0].id), authors[0])
+        stats = cache_stats()["object_cache"]
+        self.assertEqual((stats["size"], stats["hits"], stats["misses"]), (2, 1, 1))
+
+    def test_save_keeps_cache_coherent(self):
+        """Test that an updated instance replaces the cached copy."""
+        configure_object_cache(10)
+        magazine = Magazine(None, "Wired", "Tech")
+        magazine.save()
+        replacement = Magazine(magazine.id, "Wired UK", "Tech")
+        replacement.save()
+        self.assertIs(Magazine.find_by_id(magazine.id), replacement)
+
+    def test_rolled_back_update_is_evicted(self):
+        """Test that instances whose UPDATE was rolled back are not served from the cache."""
+        configure_object_cache(10)
+        saved = [Magazine(None, "Orig", "Tech"), Magazine(None, "Other", "Tech")]
+        Magazine.save_many(saved)
+        configure_object_cache(10)
+        magazine, other = Magazine.find_by_id(saved[0].id), Magazine.find_by_id(saved[1].id)
+        with self.assertRaises(RuntimeError):
+            with transaction():
+                magazine.name = "Renamed"
+                magazine.save()
+                other.category = "Art"
+                Magazine.save_many([other])
+                raise RuntimeError("abort")
+        self.assertEqual((Magazine.find_by_id(magazine.id).name, Magazine.find_by_id(other.id).category), ("Orig", "Tech"))
+
+    def test_lru_cache_disabled_when_empty(self):
+        """Test that a zero-size cache stores nothing."""
+        cache = LRUCache(0)
+        cache.put("key", "value")
+        self.assertIsNone(cache.get("key"))
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_relation_cache_stamps_stay_bounded(self):
+        """Test that invalidating many distinct tags prunes stamps without losing fresh entries."""
+        cache = RelationCache(4)
+        cache.put("fresh", cache.generation, [("magazine", 1)], "kept")
+        cache.put("stale", cache.generation, [("magazine", 2)], "dropped")
+        cache.invalidate([("magazine", 2)])
+        started = cache.generation
+        cache.invalidate([("magazine", 3)])
+        for id in range(cache.stamp_limit * 3):
+            cache.invalidate([("article", id)])
+        self.assertLessEqual(cache.stats()["stamps"], cache.stamp_limit)
+        self.assertEqual(cache.get("fresh"), "kept")
+        self.assertIsNone(cache.get("stale"))
+        # A query that started before the prune may have missed the pruned stamps
+        cache.put("in flight", started, [("magazine", 3)], "missed a write")
+        self.assertIsNone(cache.get("in flight"))
+        cache.invalidate([("magazine", 1)])
+        self.assertIsNone(cache.get("fresh"))
+
+    def test_relation_cache_counts_under_its_lock(self):
+        """Test that lookups, and the hit and miss counters they update, wait for the cache's lock."""
+        cache = RelationCache(4)
+        cache.put("key", cache.generation, [("magazine", 1)], "value")
+        with cache._lock:
+            lookup = threading.Thread(target=cache.get, args=("key",))
+            lookup.start()
+            lookup.join(0.1)
+            self.assertTrue(lookup.is_alive())
+            self.assertEqual(cache.hits, 0)
+        lookup.join()
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+class TestRelationCache(unittest.TestCase):
+    """
+    Test cases for memoized relationship methods and their invalidation.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Set up test database tables."""
+        close_pool()
+        if os.path.exists(DB_FILE):
+            os.remove(DB_FILE)
+        create_tables()
+
+    def setUp(self):
+        """Reset database state and enable the relation cache."""
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM articles")
+        cursor.execute("DELETE FROM authors")
+        cursor.execute("DELETE FROM magazines")
+        conn.commit()
+        conn.close()
+        configure_relation_cache(100)
+        self.author = Author(None, "Finn")
+        self.author.save()
+        self.first = Magazine(None, "First", "News")
+        self.first.save()
+        self.second = Magazine(None, "Second", "Sport")
+        self.second.save()
+
+    def tearDown(self):
+        """Disable the relation cache again."""
+        configure_relation_cache(0)
+
+    def _no_queries(self):
+        return mock.patch("lib.database_utils.get_connection", side_effect=AssertionError("database hit"))
+
+    def test_hits_skip_sqlite_and_writes_invalidate_precisely(self):
+        """Test that an article write only invalidates results of its magazine and author."""
+        self.author.add_article(self.first, "Opening")
+        self.assertEqual(self.first.article_titles(), ["Opening"])
+        self.assertEqual(self.second.article_titles(), [])
+        self.assertEqual(self.author.topic_areas(), ["News"])
+        other = Author(None, "Gwen")
+        other.save()
+        other.add_article(self.first, "Follow-up")
+        with self._no_queries(), mock.patch("lib.magazine.get_connection", side_effect=AssertionError("database hit")), \
+                mock.patch("lib.author.get_connection", side_effect=AssertionError("database hit")):
+            self.assertEqual(self.second.article_titles(), [])
+            self.assertEqual(self.author.topic_areas(), ["News"])
+        self.assertEqual(self.first.article_titles(), ["Opening", "Follow-up"])
+        stats = cache_stats()["relation_cache"]
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 4))
+
+    def test_moves_and_renames_invalidate(self):
+        """Test that moving an article and renaming an author invalidate dependent results."""
+        article = self.author.add_article(self.first, "Mover")
+        self.assertEqual([a.name for a in self.first.contributors()], ["Finn"])
+        self.assertEqual(self.second.article_titles(), [])
+        Author.save_many([Author(self.author.id, "Finnegan")])
+        self.assertEqual([a.name for a in self.first.contributors()], ["Finnegan"])
+        article.magazine = self.second
+        Article.bulk_create([article])
+        self.assertEqual(self.first.contributors(), [])
+        self.assertEqual(self.second.article_titles(), ["Mover"])
+        self.assertEqual([m.name for m in self.author.magazines()], ["Second"])
+
+    def test_transactions_bypass_the_cache(self):
+        """Test that results read inside a transaction, including uncommitted rows, are not cached."""
+        with self.assertRaises(RuntimeError):
+            with transaction():
+                self.author.add_article(self.first, "Draft")
+                self.assertEqual(self.first.article_titles(), ["Draft"])
+                raise RuntimeError("abort")
+        self.assertEqual(self.first.article_titles(), [])
+        self.assertEqual(cache_stats()["relation_cache"]["size"], 1)
+
+if __name__ == "__main__":
+    unittest.main()
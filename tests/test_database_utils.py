@@ -0,0 +1,438 @@
+"""
+Test module for the database utilities.
+
+This module contains unit tests for the connection pool that backs
+get_connection(), covering connection reuse, pool exhaustion, health
+checks and shutdown, for the versioned schema migrations applied
+by create_tables(), for transaction() units of work, for the WAL
+concurrency mode, for in-memory mode with snapshots and for query
+instrumentation.
+"""
+
+import asyncio
+import unittest
+import os
+import sqlite3
+import tempfile
+import threading
+from unittest import mock
+from lib.author import Author
+from lib.magazine import Magazine
+from lib.article import Article
+from lib.database_utils import (ConnectionPool, PoolError, create_tables, get_connection, transaction,
+                                close_pool, configure_concurrency, get_read_pool, enable_instrumentation,
+                                disable_instrumentation, query_stats, enable_in_memory, disable_in_memory,
+                                in_memory, snapshot, Database, bind, using, current_database,
+                                default_database, DB_FILE, SCHEMA_VERSION)
+from lib.cache import configure_object_cache
+from lib.async_utils import run_read
+
+class TestConnectionPool(unittest.TestCase):
+    """
+    Test cases for ConnectionPool checkout, return and shutdown.
+    """
+
+    def setUp(self):
+        """Create a pool backed by a throwaway database file."""
+        fd, self.db_file = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        self.pool = ConnectionPool(self.db_file, size=2, timeout=0.1)
+
+    def tearDown(self):
+        """Shut the pool down and remove the database file."""
+        self.pool.close()
+        os.remove(self.db_file)
+
+    def test_connections_are_reused(self):
+        """Test that a returned connection is handed out again."""
+        conn = self.pool.acquire()
+        self.pool.release(conn)
+        self.assertIs(self.pool.acquire(), conn)
+
+    def test_exhausted_pool_times_out(self):
+        """Test that checking out more connections than the pool size raises PoolError."""
+        self.pool.acquire()
+        self.pool.acquire()
+        with self.assertRaises(PoolError):
+            self.pool.acquire()
+
+    def test_unhealthy_connection_is_replaced(self):
+        """Test that a broken idle connection is discarded on checkout."""
+        self.pool.health_check_interval = 0
+        conn = self.pool.acquire()
+        self.pool.release(conn)
+        conn.close()
+        replacement = self.pool.acquire()
+        self.assertIsNot(replacement, conn)
+        self.assertEqual(replacement.execute("SELECT 1").fetchone(), (1,))
+
+    def test_pooled_connection_context_manager(self):
+        """Test that the context manager commits and returns the connection to the pool."""
+        with self.pool.connection() as conn:
+            conn.execute("CREATE TABLE t (x INTEGER)")
+            conn.execute("INSERT INTO t VALUES (1)")
+            raw = conn._conn
+        self.assertIs(self.pool.acquire(), raw)
+        self.assertEqual(raw.execute("SELECT COUNT(*) FROM t").fetchone(), (1,))
+
+    def test_closed_pool_refuses_checkout(self):
+        """Test that a closed pool raises PoolError."""
+        self.pool.close()
+        with self.assertRaises(PoolError):
+            self.pool.acquire()
+
+class TestMigrations(unittest.TestCase):
+    """
+    Test cases for create_tables() schema versioning.
+    """
+
+    def setUp(self):
+        """Start every test from a missing database file."""
+        close_pool()
+        if os.path.exists(DB_FILE):
+            os.remove(DB_FILE)
+
+    def tearDown(self):
+        """Release pooled connections to the test database."""
+        close_pool()
+
+    def _indexes(self):
+        with get_connection() as conn:
+            rows = conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'articles'").fetchall()
+        return {row[0] for row in rows}
+
+    def test_fresh_database_is_fully_migrated(self):
+        """Test that a new database gets every migration and the article indexes."""
+        create_tables()
+        with get_connection() as conn:
+            self.assertEqual(conn.execute("PRAGMA user_version").fetchone()[0], SCHEMA_VERSION)
+        self.assertTrue({"idx_articles_magazine_author", "idx_articles_author_magazine"} <= self._indexes())
+
+    def test_unversioned_database_is_upgraded_in_place(self):
+        """Test that a database created before versioning keeps its rows and gains the indexes."""
+        legacy = sqlite3.connect(DB_FILE)
+        legacy.execute("CREATE TABLE authors (id INTEGER PRIMARY KEY, name TEXT NOT NULL)")
+        legacy.execute("CREATE TABLE magazines (id INTEGER PRIMARY KEY, name TEXT NOT NULL, category TEXT NOT NULL)")
+        legacy.execute("CREATE TABLE articles (id INTEGER PRIMARY KEY, title TEXT NOT NULL, content TEXT NOT NULL, "
+                       "author_id INTEGER, magazine_id INTEGER)")
+        legacy.execute("INSERT INTO authors (name) VALUES ('Legacy')")
+        legacy.execute("INSERT INTO magazines (name, category) VALUES ('Archive', 'History')")
+        legacy.executemany("INSERT INTO articles (title, content, author_id, magazine_id) VALUES (?, ?, 1, 1)",
+                           [("Old 1", "Kept body"), ("Old 2", "")])
+        legacy.commit()
+        legacy.close()
+        create_tables()
+        with get_connection() as conn:
+            self.assertEqual(conn.execute("SELECT name FROM authors").fetchall(), [("Legacy",)])
+            self.assertEqual(conn.execute("SELECT * FROM magazine_article_counts").fetchall(), [(1, 2)])
+            self.assertEqual(conn.execute("SELECT * FROM magazine_author_counts").fetchall(), [(1, 1, 2)])
+            self.assertEqual(conn.execute("SELECT article_id, body FROM article_contents").fetchall(), [(1, b"Kept body")])
+            self.assertEqual(conn.execute("SELECT rowid FROM articles_fts WHERE articles_fts MATCH 'kept'").fetchall(), [(1,)])
+        self.assertIn("idx_articles_author_magazine", self._indexes())
+
+    def test_up_to_date_database_skips_migrations(self):
+        """Test that create_tables() runs no migration on a current schema."""
+        create_tables()
+        with mock.patch("lib.database_utils._apply_migration", side_effect=AssertionError("DDL executed")):
+            create_tables()
+
+class TestTransaction(unittest.TestCase):
+    """
+    Test cases for the transaction() unit of work.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Set up test database tables."""
+        close_pool()
+        if os.path.exists(DB_FILE):
+            os.remove(DB_FILE)
+        create_tables()
+
+    def setUp(self):
+        """Reset database state before each test by clearing all tables."""
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM articles")
+        cursor.execute("DELETE FROM authors")
+        cursor.execute("DELETE FROM magazines")
+        conn.commit()
+        conn.close()
+
+    def _count(self, table):
+        conn = get_connection()
+        count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        conn.close()
+        return count
+
+    def test_saves_share_one_connection_and_commit(self):
+        """Test that saves inside the block share a connection and commit once on exit."""
+        with transaction() as conn:
+            author = Author(None, "Gus")
+            author.save()
+            magazine = Magazine(None, "Garden", "Home")
+            magazine.save()
+            author.add_article(magazine, "Roses")
+            self.assertIs(get_connection(), conn)
+            Author(None, "Hal").save()
+            outside = sqlite3.connect(DB_FILE)
+            self.assertEqual(outside.execute("SELECT COUNT(*) FROM authors").fetchone()[0], 0)
+            outside.close()
+        self.assertEqual(self._count("authors"), 2)
+        self.assertEqual(self._count("articles"), 1)
+
+    def test_rollback_on_exception(self):
+        """Test that an exception rolls back every write and clears assigned ids."""
+        author = Author(None, "Ivy")
+        with self.assertRaises(RuntimeError):
+            with transaction():
+                author.save()
+                Author.save_many([("Jon",)])
+                raise RuntimeError("abort")
+        self.assertIsNone(author.id)
+        self.assertEqual(self._count("authors"), 0)
+
+class TestConcurrencyMode(unittest.TestCase):
+    """
+    Test cases for the multi-reader / single-writer WAL mode.
+    """
+
+    def setUp(self):
+        """Create a fresh database in WAL mode."""
+        close_pool()
+        if os.path.exists(DB_FILE):
+            os.remove(DB_FILE)
+        create_tables()
+        configure_concurrency(wal=True, readers=2)
+
+    def tearDown(self):
+        """Restore the default journal mode."""
+        configure_concurrency(wal=False)
+
+    def test_wal_mode_pragmas(self):
+        """Test that WAL mode enables the journal mode and connection PRAGMAs."""
+        with get_connection() as conn:
+            self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+            self.assertEqual(conn.execute("PRAGMA busy_timeout").fetchone()[0], 5000)
+            self.assertEqual(conn.execute("PRAGMA synchronous").fetchone()[0], 1)
+
+    def test_reads_are_read_only_and_writes_go_through_writer(self):
+        """Test that plain connections are read-only while saves still succeed."""
+        author = Author(None, "Kai")
+        author.save()
+        with get_connection() as conn:
+            with self.assertRaises(sqlite3.OperationalError):
+                conn.execute("DELETE FROM authors")
+        self.assertEqual(Author.find_by_id(author.id).name, "Kai")
+
+    def test_readers_are_not_blocked_by_open_write(self):
+        """Test that a reader sees the last committed state while a write transaction is open."""
+        Author(None, "Lea").save()
+        with transaction():
+            Author(None, "Max").save()
+            with get_read_pool().connection() as conn:
+                self.assertEqual(conn.execute("SELECT COUNT(*) FROM authors").fetchone()[0], 1)
+        with get_connection() as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM authors").fetchone()[0], 2)
+
+class TestInMemoryMode(unittest.TestCase):
+    """
+    Test cases for serving queries from an in-memory copy and snapshotting it to disk.
+    """
+
+    def setUp(self):
+        """Create a database file holding one author."""
+        close_pool()
+        if os.path.exists(DB_FILE):
+            os.remove(DB_FILE)
+        create_tables()
+        Author(None, "Ada").save()
+
+    def tearDown(self):
+        """Return to the on-disk database without saving."""
+        disable_in_memory(save=False)
+
+    def _disk_count(self):
+        disk = sqlite3.connect(DB_FILE)
+        count = disk.execute("SELECT COUNT(*) FROM authors").fetchone()[0]
+        disk.close()
+        return count
+
+    def test_writes_stay_in_memory_until_snapshot(self):
+        """Test that the copy is loaded from disk and written back only by snapshots."""
+        enable_in_memory()
+        self.assertTrue(in_memory())
+        Author.save_many([("Bo",), ("Cy",)])
+        with get_connection() as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM authors").fetchone()[0], 3)
+        self.assertEqual(self._disk_count(), 1)
+        self.assertTrue(snapshot())
+        self.assertFalse(snapshot(if_changed=True))
+        self.assertEqual(self._disk_count(), 3)
+        with transaction():
+            Author(None, "Di").save()
+            self.assertTrue(snapshot())
+            self.assertEqual(self._disk_count(), 3)
+        self.assertEqual(self._disk_count(), 4)
+        disable_in_memory()
+        Author(None, "Eli").save()
+        self.assertFalse(in_memory())
+        self.assertEqual(self._disk_count(), 5)
+
+    def test_disable_without_saving_and_disk_snapshot(self):
+        """Test discarding in-memory changes and copying the on-disk database."""
+        enable_in_memory()
+        Author(None, "Fay").save()
+        disable_in_memory(save=False)
+        self.assertEqual(self._disk_count(), 1)
+        with self.assertRaises(ValueError):
+            snapshot()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "copy.db")
+            snapshot(path)
+            copy = sqlite3.connect(path)
+            self.assertEqual(copy.execute("SELECT name FROM authors").fetchall(), [("Ada",)])
+            copy.close()
+
+    def test_nested_queries_while_streaming_and_threads_take_turns(self):
+        """Test that one thread can nest queries in memory while another waits for its turn."""
+        enable_in_memory()
+        magazine = Magazine(None, "Deep", "Tech")
+        magazine.save()
+        Article(None, "Long", "word " * 500, Author.find_by_id(1), magazine).save()
+        article = Article.where(title="Long").first()
+        results = []
+        other = threading.Thread(target=lambda: results.append(Author.where().count()))
+        for index, piece in enumerate(article.iter_content(chunk_size=200)):
+            if index == 0:
+                other.start()
+            self.assertEqual(article.author.name, "Ada")
+            Author(None, f"Reader {index}").save()
+        other.join()
+        self.assertEqual(results, [Author.where().count()])
+
+class TestDatabase(unittest.TestCase):
+    """
+    Test cases for Database handles used side by side with the default database.
+    """
+
+    def setUp(self):
+        """Create the default database and a second one in a temporary directory."""
+        close_pool()
+        if os.path.exists(DB_FILE):
+            os.remove(DB_FILE)
+        create_tables()
+        self.directory = tempfile.TemporaryDirectory()
+        self.other = Database(os.path.join(self.directory.name, "other.db"))
+        self.other.create_tables()
+
+    def tearDown(self):
+        """Unbind and close the second database."""
+        bind(None)
+        configure_object_cache(0)
+        self.other.close()
+        self.directory.cleanup()
+
+    def test_using_and_bind_select_the_database(self):
+        """Test that models, the object cache and worker threads follow the selected database."""
+        configure_object_cache(16)
+        Author(None, "Ada").save()
+        with using(self.other):
+            self.assertIs(current_database(), self.other)
+            self.assertIsNone(Author.find_by_id(1))
+            Author(None, "Bo").save()
+            self.assertEqual(Author.find_by_id(1).name, "Bo")
+            self.assertEqual(asyncio.run(run_read(lambda: Author.find_by_id(1).name)), "Bo")
+        self.assertIs(current_database(), default_database)
+        self.assertEqual(Author.find_by_id(1).name, "Ada")
+        bind(self.other)
+        self.assertEqual(Author.find_by_ids([1])[1].name, "Bo")
+        with using(default_database), get_connection() as conn:
+            self.assertEqual(conn.execute("SELECT name FROM authors").fetchall(), [("Ada",)])
+
+class TestInstrumentation(unittest.TestCase):
+    """
+    Test cases for statement timing, per-method counters and the slow-query log.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Set up test database tables."""
+        close_pool()
+        if os.path.exists(DB_FILE):
+            os.remove(DB_FILE)
+        create_tables()
+
+    def tearDown(self):
+        """Turn instrumentation off again."""
+        disable_instrumentation()
+
+    def test_statements_are_attributed_to_model_methods(self):
+        """Test that statements are counted per calling method with their row counts."""
+        author = Author(None, "Noa")
+        author.save()
+        magazine = Magazine(None, "Metrics", "Tech")
+        magazine.save()
+        Author.save_many([("Oli",), ("Pia",)])
+        for i in range(3):
+            author.add_article(magazine, f"Measure {i}")
+        instrumentation = enable_instrumentation()
+        events = []
+        instrumentation.add_listener(events.append)
+        magazine.contributors()
+        Author.find_by_id(author.id)
+        stats = query_stats()
+        self.assertEqual(stats["Magazine.contributors"]["queries"], 1)
+        self.assertEqual(stats["Magazine.contributors"]["rows"], 1)
+        self.assertEqual(stats["Author.find_by_id"]["rows"], 1)
+        self.assertEqual([e.caller for e in events], ["Magazine.contributors", "Author.find_by_id"])
+        self.assertTrue(all(e.elapsed > 0 for e in events))
+
+    def test_slow_queries_log_query_plan(self):
+        """Test that a query over the threshold is logged with its EXPLAIN QUERY PLAN."""
+        enable_instrumentation(slow_query_threshold=0)
+        with self.assertLogs("lib.database_utils", level="WARNING") as logs:
+            Magazine.top_publisher()
+        self.assertIn("Magazine.top_publisher", logs.output[0])
+        self.assertIn("idx_magazine_article_counts_count", logs.output[0])
+        self.assertEqual(query_stats()["Magazine.top_publisher"]["slow_queries"], 1)
+
+    def test_connection_executemany_is_recorded(self):
+        """Test that content written with executemany() on the connection is logged."""
+        author = Author(None, "Quin")
+        author.save()
+        magazine = Magazine(None, "Writes", "Tech")
+        magazine.save()
+        article = Article(None, "Logged", "", author, magazine)
+        article.save()
+        instrumentation = enable_instrumentation()
+        events = []
+        instrumentation.add_listener(events.append)
+        article.content = "x"
+        article.save()
+        Article.bulk_create([("Bulk", "y", author, magazine)])
+        writes = [e for e in events if "article_contents" in e.sql and e.sql.startswith("INSERT")]
+        self.assertEqual([e.caller for e in writes], ["Article._write_contents"] * 2)
+        self.assertEqual(query_stats()["Article._write_contents"]["queries"], 2)
+
+    def test_held_connection_keeps_only_unfinished_statements(self):
+        """Test that many statements on one connection do not accumulate cursors."""
+        enable_instrumentation()
+        with transaction() as conn:
+            for i in range(200):
+                conn.execute("SELECT ?", (i,)).fetchone()
+                conn.execute("SELECT 1 UNION ALL SELECT 2").fetchall()
+            pending = conn.execute("SELECT 1 UNION ALL SELECT 2")
+            pending.fetchone()
+            self.assertEqual(list(conn._cursors), [pending])
+        self.assertEqual(query_stats()["TestInstrumentation.test_held_connection_keeps_only_unfinished_statements"]
+                         ["queries"], 401)
+
+    def test_disabled_instrumentation_uses_plain_cursors(self):
+        """Test that no wrapper is involved while instrumentation is off."""
+        with get_connection() as conn:
+            self.assertIsInstance(conn.cursor(), sqlite3.Cursor)
+        self.assertEqual(query_stats(), {})
+
+if __name__ == "__main__":
+    unittest.main()
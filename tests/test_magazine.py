@@ -8,10 +8,12 @@ like contributing_authors and top_publisher.
 
 import unittest
 import os
+from unittest import mock
 from lib.author import Author
 from lib.magazine import Magazine
 from lib.article import Article
-from lib.database_utils import create_tables, get_connection, DB_FILE
+from lib.database_utils import create_tables, get_connection, close_pool, DB_FILE
+from lib.tracking import flush_stats, reset_flush_stats
 
 class TestMagazine(unittest.TestCase):
     """
@@ -21,6 +23,7 @@ class TestMagazine(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
         """Set up test database tables."""
+        close_pool()
         if os.path.exists(DB_FILE):
             os.remove(DB_FILE)
         create_tables()
@@ -69,5 +72,217 @@ class TestMagazine(unittest.TestCase):
         top = Magazine.top_publisher()
         self.assertEqual(top.id, magazine.id)
 
+    def test_articles_load_relations_without_per_row_lookups(self):
+        """Test that listing articles batch-loads authors instead of querying per row."""
+        alice = Author(None, "Alice")
+        alice.save()
+        bob = Author(None, "Bob")
+        bob.save()
+        magazine = Magazine(None, "Daily Planet", "News")
+        magazine.save()
+        alice.add_article(magazine, "First")
+        bob.add_article(magazine, "Second")
+        bob.add_article(magazine, "Third")
+        with mock.patch.object(Author, "find_by_id", side_effect=AssertionError("N+1 lookup")), \
+                mock.patch.object(Magazine, "find_by_id", side_effect=AssertionError("N+1 lookup")):
+            articles = magazine.articles(prefetch=True)
+            contributing = magazine.contributing_authors()
+            self.assertEqual(sorted(a.author.name for a in articles), ["Alice", "Bob", "Bob"])
+            self.assertTrue(all(a.magazine is magazine for a in articles))
+        self.assertIs(articles[1].author, articles[2].author)
+        self.assertEqual(contributing, [])
+
+    def test_article_relations_load_lazily(self):
+        """Test that listing articles defers author lookups until first access."""
+        author = Author(None, "Gil")
+        author.save()
+        magazine = Magazine(None, "Lazy Days", "Leisure")
+        magazine.save()
+        author.add_article(magazine, "Hammocks")
+        with mock.patch.object(Author, "find_by_id", side_effect=AssertionError("eager lookup")):
+            articles = magazine.articles()
+            self.assertEqual([a.title for a in articles], ["Hammocks"])
+            self.assertEqual(articles[0].author_id, author.id)
+        self.assertEqual(articles[0].author.name, "Gil")
+        self.assertIs(articles[0].author, articles[0].author)
+
+    def test_missing_relations_are_looked_up_once(self):
+        """Test that an author or magazine ID without a row is not queried again on every access."""
+        article = Article(None, "Orphan", "", 999999, 999999)
+        with mock.patch.object(Author, "find_by_id", wraps=Author.find_by_id) as find_author, \
+                mock.patch.object(Magazine, "find_by_id", wraps=Magazine.find_by_id) as find_magazine:
+            for _ in range(3):
+                self.assertIsNone(article.author)
+                self.assertIsNone(article.magazine)
+        self.assertEqual((find_author.call_count, find_magazine.call_count), (1, 1))
+        self.assertEqual((article.author_id, article.magazine_id), (999999, 999999))
+        Article.prefetch([article])
+        article.author = Author(None, "Found")
+        self.assertEqual(article.author.name, "Found")
+
+    def test_bulk_create_articles(self):
+        """Test bulk-saving magazines and articles given as tuples and instances."""
+        author = Author(None, "Fay")
+        author.save()
+        magazines = [Magazine(None, "Alpha", "Science"), Magazine(None, "Beta", "Arts")]
+        Magazine.save_many(magazines)
+        article = Article(None, "Instance", "Body", author, magazines[0])
+        written = Article.bulk_create([article] + [(f"Tuple {i}", "", author.id, magazines[1].id) for i in range(5)],
+                                      chunk_size=2)
+        self.assertEqual(written, 6)
+        self.assertIsNotNone(article.id)
+        self.assertEqual(magazines[0].article_titles(), ["Instance"])
+        self.assertEqual(len(magazines[1].articles()), 5)
+        self.assertEqual(Magazine.top_publisher().id, magazines[1].id)
+
+    def test_article_counts_follow_inserts_moves_and_deletes(self):
+        """Test that the trigger-maintained counters track every article write."""
+        authors = [Author(None, "Ida"), Author(None, "Jon")]
+        Author.save_many(authors)
+        first, second = Magazine(None, "First", "News"), Magazine(None, "Second", "News")
+        Magazine.save_many([first, second])
+        articles = [Article(None, f"Count {i}", "", authors[0], first) for i in range(3)]
+        Article.bulk_create(articles)
+        Article.bulk_create([("Other", "", authors[1], second)])
+        self.assertEqual([a.name for a in first.contributing_authors()], ["Ida"])
+        self.assertEqual(Magazine.top_publisher().id, first.id)
+
+        articles[0].magazine = second
+        articles[0].save()
+        articles[1].author = authors[1]
+        articles[1].save()
+        self.assertEqual(first.contributing_authors(), [])
+        # Two articles each now, so the tie goes to the lower id
+        self.assertEqual(Magazine.top_publisher().id, first.id)
+
+        with get_connection() as conn:
+            conn.execute("DELETE FROM articles WHERE magazine_id = ?", (second.id,))
+            magazine_counts = conn.execute("SELECT magazine_id, article_count FROM magazine_article_counts").fetchall()
+            author_counts = conn.execute("SELECT magazine_id, author_id, article_count FROM magazine_author_counts "
+                                         "ORDER BY author_id").fetchall()
+        self.assertEqual(magazine_counts, [(first.id, 2)])
+        self.assertEqual(author_counts, [(first.id, authors[0].id, 1), (first.id, authors[1].id, 1)])
+
+    def test_bulk_create_maintains_counters_and_index_per_chunk(self):
+        """Test that the per-chunk counter and search index updates match a full recount."""
+        authors = [Author(None, "Lev"), Author(None, "Mia")]
+        Author.save_many(authors)
+        first, second = Magazine(None, "First", "News"), Magazine(None, "Second", "News")
+        Magazine.save_many([first, second])
+        moved = Article(None, "Moved", "", authors[0], first)
+        Article.bulk_create([moved, ("Existing", "Quartz", authors[1], first)])
+        moved.magazine = second
+        moved.content = "Basalt"
+        Article.bulk_create([moved, Article(None, "Orphan", "Granite", None, second)] +
+                            [(f"Bulk {i}", "Quartz" if i % 2 else "", authors[i % 2], (first, second)[i % 3 > 0])
+                             for i in range(7)], chunk_size=3)
+        with get_connection() as conn:
+            def rows(sql):
+                return sorted(conn.execute(sql).fetchall())
+            self.assertEqual(rows("SELECT * FROM magazine_article_counts"),
+                             rows("SELECT magazine_id, COUNT(*) FROM articles GROUP BY magazine_id"))
+            self.assertEqual(rows("SELECT * FROM magazine_author_counts"),
+                             rows("SELECT magazine_id, author_id, COUNT(*) FROM articles "
+                                  "WHERE author_id IS NOT NULL GROUP BY magazine_id, author_id"))
+            self.assertEqual(rows("SELECT * FROM author_article_counts"),
+                             rows("SELECT author_id, COUNT(*) FROM articles WHERE author_id IS NOT NULL GROUP BY author_id"))
+            conn.execute("INSERT INTO articles_fts (articles_fts, rank) VALUES ('integrity-check', 1)")
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM article_bulk_inserts").fetchone()[0], 0)
+        self.assertEqual(len(Article.search("quartz")), 4)
+        self.assertEqual([a.title for a in Article.search("basalt OR granite")], ["Moved", "Orphan"])
+        # Rows inserted one at a time are still counted by the trigger
+        Article(None, "Single", "Quartz", authors[0], first).save()
+        self.assertEqual(len(Article.search("quartz")), 5)
+        self.assertEqual([count for _, count, _ in Magazine.top_publishers()], [6, 5])
+
+    def test_top_publishers_and_categories(self):
+        """Test the magazine and category leaderboards with counts and ranks."""
+        author = Author(None, "Kai")
+        author.save()
+        magazines = [Magazine(None, "Wired", "Tech"), Magazine(None, "Byte", "Tech"), Magazine(None, "Vogue", "Fashion")]
+        Magazine.save_many(magazines)
+        placements = [magazines[2]] * 3 + [magazines[0]] * 2 + [magazines[1]] * 2
+        Article.bulk_create((f"Story {i}", "", author, magazine) for i, magazine in enumerate(placements))
+        board = [(m.name, count, rank) for m, count, rank in Magazine.top_publishers()]
+        self.assertEqual(board, [("Vogue", 3, 1), ("Wired", 2, 2), ("Byte", 2, 2)])
+        self.assertEqual([m.name for m, _, _ in Magazine.top_publishers(n=1, offset=1)], ["Wired"])
+        page = Magazine.top_publishers(n=2)
+        rest = Magazine.top_publishers(n=2, after=page[-1])
+        self.assertEqual([(m.name, count, rank) for m, count, rank in page + rest], board)
+        self.assertEqual([m.name for m, _, _ in Magazine.top_publishers(n=1, offset=1, after=page[0])], ["Byte"])
+        self.assertEqual(Magazine.top_categories(), [("Tech", 4, 1), ("Fashion", 3, 2)])
+
+    def test_contributing_authors_map_matches_per_magazine_results(self):
+        """Test that the batch map agrees with contributing_authors() for every magazine."""
+        authors = [Author(None, "Rae"), Author(None, "Sol")]
+        Author.save_many(authors)
+        magazines = [Magazine(None, "One", "News"), Magazine(None, "Two", "News"), Magazine(None, "Three", "News")]
+        Magazine.save_many(magazines)
+        writers = [(authors[0], magazines[0])] * 3 + [(authors[0], magazines[1])] * 3 + [(authors[1], magazines[1])] * 4
+        Article.bulk_create((f"Item {i}", "", author, magazine) for i, (author, magazine) in enumerate(writers))
+        contributing = Magazine.contributing_authors_map()
+        for magazine in magazines:
+            self.assertEqual([a.id for a in contributing[magazine.id]], [a.id for a in magazine.contributing_authors()])
+        self.assertIs(contributing[magazines[0].id][0], contributing[magazines[1].id][0])
+        self.assertEqual(list(Magazine.contributing_authors_map([magazines[2].id])), [magazines[2].id])
+
+    def test_iter_articles_pages_and_resumes(self):
+        """Test streaming a magazine's articles in keyset pages and resuming after an id."""
+        author = Author(None, "Hana")
+        author.save()
+        magazine = Magazine(None, "Stream", "Tech")
+        magazine.save()
+        Article.bulk_create((f"Part {i}", "", author, magazine) for i in range(7))
+        articles = list(magazine.iter_articles(batch_size=3))
+        self.assertEqual([a.title for a in articles], [f"Part {i}" for i in range(7)])
+        resumed = list(magazine.iter_article_titles(batch_size=2, after_id=articles[4].id))
+        self.assertEqual(resumed, ["Part 5", "Part 6"])
+        self.assertEqual(len(list(author.iter_articles(batch_size=7))), 7)
+
+    def test_keyset_page_uses_index_order(self):
+        """Test that a keyset page is served from an index without a sort step."""
+        conn = get_connection()
+        plan = conn.execute("EXPLAIN QUERY PLAN SELECT * FROM articles WHERE magazine_id = ? AND id > ? "
+                            "ORDER BY id LIMIT ?", (1, 0, 10)).fetchall()
+        conn.close()
+        details = " ".join(row[-1] for row in plan)
+        self.assertIn("idx_articles_magazine", details)
+        self.assertNotIn("TEMP B-TREE", details)
+
+    def test_slots_keep_property_validation(self):
+        """Test that slotted magazines still validate their properties and reject unknown attributes."""
+        magazine = Magazine(None, "Slim", "Design")
+        self.assertFalse(hasattr(magazine, "__dict__"))
+        with self.assertRaises(ValueError):
+            magazine.category = ""
+        with self.assertRaises(AttributeError):
+            magazine.editor = "Nobody"
+        magazine.name = "Slimmer"
+        self.assertEqual(magazine.name, "Slimmer")
+
+    def test_save_writes_only_changed_columns(self):
+        """Test that loaded magazines update only their changed columns and skip unchanged saves."""
+        saved = [Magazine(None, "Atlas", "Travel"), Magazine(None, "Orbit", "Science")]
+        Magazine.save_many(saved)
+        loaded = Magazine.find_by_ids([m.id for m in saved])
+        atlas, orbit = loaded[saved[0].id], loaded[saved[1].id]
+        with get_connection() as conn:
+            conn.execute("UPDATE magazines SET category = 'Maps' WHERE id = ?", (atlas.id,))
+        reset_flush_stats()
+        atlas.name = "Atlas Weekly"
+        atlas.save()
+        orbit.name = "Orbital"
+        orbit.name = "Orbit"
+        with mock.patch("lib.magazine.transaction", side_effect=AssertionError("wrote an unchanged magazine")):
+            orbit.save()
+            atlas.save()
+        self.assertEqual(Magazine.find_by_id(atlas.id).category, "Maps")
+        orbit.category = "Space"
+        Magazine.save_many([atlas, orbit])
+        self.assertEqual(flush_stats(), {"inserts": 0, "updates": 2, "skipped": 3,
+                                         "columns_written": 2, "columns_skipped": 8})
+        self.assertEqual((Magazine.find_by_id(atlas.id).name, Magazine.find_by_id(orbit.id).category),
+                         ("Atlas Weekly", "Space"))
+
 if __name__ == "__main__":
     unittest.main()
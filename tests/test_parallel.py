@@ -0,0 +1,97 @@
+"""
+Test module for parallel analytics.
+
+This module contains unit tests for lib.parallel, checking that partitioned
+jobs run in worker processes agree with the per-magazine methods.
+"""
+
+import unittest
+import os
+from lib.author import Author
+from lib.magazine import Magazine
+from lib.article import Article
+from lib.parallel import ParallelRunner, partition_ranges
+from lib.database_utils import create_tables, get_connection, close_pool, using, Database, DB_FILE
+
+OTHER_DB_FILE = "test_parallel_other.db"
+
+
+def title_count(magazine):
+    """A custom job; module-level so worker processes can unpickle it."""
+    return len(magazine.article_titles())
+
+
+class TestParallel(unittest.TestCase):
+    """
+    Test cases for partitioning and the process-pool runner.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Set up test database tables and a small skewed catalogue."""
+        close_pool()
+        if os.path.exists(DB_FILE):
+            os.remove(DB_FILE)
+        create_tables()
+        authors = [Author(None, f"Writer {i}") for i in range(3)]
+        Author.save_many(authors)
+        cls.magazines = [Magazine(None, f"Issue {i}", "News") for i in range(6)]
+        Magazine.save_many(cls.magazines)
+        # Magazine 0 holds half the articles and magazine 5 has none
+        placements = [0] * 10 + [1, 1, 2, 2, 3, 3, 4, 4, 4, 4]
+        Article.bulk_create((f"Report {i}", "", authors[i % 3], cls.magazines[m]) for i, m in enumerate(placements))
+
+    @classmethod
+    def tearDownClass(cls):
+        """Clear the catalogue for the other test modules."""
+        with get_connection() as conn:
+            conn.execute("DELETE FROM articles")
+            conn.execute("DELETE FROM authors")
+            conn.execute("DELETE FROM magazines")
+
+    def test_partitions_cover_every_magazine_and_balance_articles(self):
+        """Test that ranges are contiguous, cover all ids and split by article count."""
+        ranges = partition_ranges(2)
+        ids = [m.id for m in self.magazines]
+        self.assertEqual(ranges, [(ids[0], ids[0]), (ids[1], ids[-1])])
+        self.assertEqual(partition_ranges(100)[-1][1], ids[-1])
+
+    def test_builtin_and_custom_jobs_match_serial_results(self):
+        """Test that every built-in job agrees with calling the method per magazine."""
+        with ParallelRunner(workers=2, partitions=3) as runner:
+            for job in ("articles", "contributors", "contributing_authors"):
+                result = runner.run(job)
+                expected = {m.id: [obj.id for obj in getattr(m, job)()] for m in self.magazines}
+                self.assertEqual({id: [obj.id for obj in value] for id, value in result.items()}, expected)
+            titles = runner.run("article_titles")
+            self.assertEqual(titles, {m.id: m.article_titles() for m in self.magazines})
+            self.assertEqual(runner.run(title_count), {m.id: len(m.article_titles()) for m in self.magazines})
+            with self.assertRaises(ValueError):
+                runner.run("top_publisher")
+
+    def test_runner_reads_its_own_database_file(self):
+        """Test that partitions come from db_file, not the default database, and that a
+        database selected with using() is not silently ignored."""
+        if os.path.exists(OTHER_DB_FILE):
+            os.remove(OTHER_DB_FILE)
+        other = Database(OTHER_DB_FILE)
+        try:
+            with using(other):
+                other.create_tables()
+                author = Author(None, "Elsewhere")
+                author.save()
+                magazines = [Magazine(None, f"Other {i}", "News") for i in range(len(self.magazines) + 4)]
+                Magazine.save_many(magazines)
+                Article.bulk_create((f"Far {i}", "", author, magazines[-1]) for i in range(3))
+                with self.assertRaises(ValueError):
+                    ParallelRunner(workers=1)
+            with ParallelRunner(workers=1, partitions=3, db_file=OTHER_DB_FILE) as runner:
+                counts = runner.run(title_count)
+            self.assertEqual(list(counts), [m.id for m in magazines])
+            self.assertEqual(counts[magazines[-1].id], 3)
+        finally:
+            other.close()
+            os.remove(OTHER_DB_FILE)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+"""
+Test module for lazy QuerySets.
+
+This module contains unit tests for the composable query API, covering
+filters and lookups across related tables, ordering and paging, values()
+projections, counting and deferred execution.
+"""
+
+import unittest
+import os
+from unittest import mock
+from lib.author import Author
+from lib.magazine import Magazine
+from lib.article import Article
+from lib.database_utils import (create_tables, get_connection, close_pool, enable_instrumentation,
+                                disable_instrumentation, query_stats, MAX_QUERY_PARAMS, DB_FILE)
+
+class TestQuerySet(unittest.TestCase):
+    """
+    Test cases for QuerySet compilation and execution.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Set up test database tables."""
+        close_pool()
+        if os.path.exists(DB_FILE):
+            os.remove(DB_FILE)
+        create_tables()
+
+    def setUp(self):
+        """Reset database state and create two authors, two magazines and four articles."""
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM articles")
+        cursor.execute("DELETE FROM authors")
+        cursor.execute("DELETE FROM magazines")
+        conn.commit()
+        conn.close()
+        self.ann, self.bob = Author(None, "Ann"), Author(None, "Bob")
+        Author.save_many([self.ann, self.bob])
+        self.orbit, self.atlas = Magazine(None, "Orbit", "Science"), Magazine(None, "Atlas", "Travel")
+        Magazine.save_many([self.orbit, self.atlas])
+        Article.bulk_create([
+            ("Comets", "", self.ann, self.orbit),
+            ("Moons", "", self.bob, self.orbit),
+            ("Rivers", "", self.ann, self.atlas),
+            ("100%_Dunes", "", self.bob, self.atlas),
+        ])
+
+    def test_filters_order_and_paging_compile_to_one_statement(self):
+        """Test that a chained query runs nothing until iterated, then runs a single SELECT."""
+        query = Article.where(magazine__category="Science").where(author__in=[self.ann, self.bob.id])
+        with mock.patch("lib.query.QuerySet._execute", side_effect=AssertionError("executed early")):
+            query = query.order_by("-id").limit(1).offset(1)
+        with mock.patch.object(type(query), "_execute", wraps=query._execute) as execute:
+            self.assertEqual([a.title for a in query], ["Comets"])
+        self.assertEqual(execute.call_count, 1)
+        self.assertEqual([a.title for a in Article.where(magazine=self.atlas.id, title__contains="%_")], ["100%_Dunes"])
+        self.assertEqual(Article.where(title__startswith="R").first().magazine_id, self.atlas.id)
+        self.assertIsNone(Article.where(id__gt=100).first())
+        self.assertEqual(Article.where(magazine_id__in=[]).all(), [])
+        with self.assertRaises(ValueError):
+            Article.where(content="Ice")
+        with self.assertRaises(ValueError):
+            Article.where(title__between=("A", "B"))
+
+    def test_values_count_and_exists(self):
+        """Test column projections, distinct values and SQL-side counting."""
+        self.assertEqual(Article.where(author=self.ann).order_by("magazine__name").values("title", "magazine__name").all(),
+                         [("Rivers", "Atlas"), ("Comets", "Orbit")])
+        self.assertEqual(Article.where().values("magazine__category", flat=True).distinct().order_by("-magazine__category").all(),
+                         ["Travel", "Science"])
+        self.assertEqual(Magazine.where(category__ne="Science").values("name", flat=True).all(), ["Atlas"])
+        self.assertEqual(Article.where(author_id=self.bob.id).count(), 2)
+        self.assertEqual(Article.where().offset(3).limit(5).count(), 1)
+        self.assertEqual(Article.where().values("author_id").distinct().count(), 2)
+        self.assertTrue(Author.where(name="Bob").exists())
+        self.assertFalse(Article.where(magazine__name__isnull=True).exists())
+        with self.assertRaises(ValueError):
+            Article.where().values("title", "id", flat=True)
+
+    def test_text_lookups_large_in_lists_and_attribution(self):
+        """Test case-sensitive and -insensitive matching, unbounded IN lists and per-caller stats."""
+        self.assertEqual(Article.where(title__contains="omet").values("title", flat=True).all(), ["Comets"])
+        self.assertEqual(Article.where(title__contains="COMET").count(), 0)
+        self.assertEqual(Article.where(title__icontains="COMET").values("title", flat=True).all(), ["Comets"])
+        self.assertEqual(Article.where(title__startswith="100%_").count(), 1)
+        self.assertEqual(Article.where(title__istartswith="rIV").count(), 1)
+        self.assertEqual(Author.where(name__contains="*").count(), 0)
+        ids = list(range(-MAX_QUERY_PARAMS * 3, 0)) + [self.ann.id]
+        self.assertEqual(Author.where(id__in=ids).values("name", flat=True).all(), ["Ann"])
+        enable_instrumentation()
+        try:
+            Article.where(author=self.ann).count()
+            self.assertEqual(query_stats()["TestQuerySet.test_text_lookups_large_in_lists_and_attribution"]["queries"], 1)
+            self.assertNotIn("QuerySet._execute", query_stats())
+        finally:
+            disable_instrumentation()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+"""
+Test module for sharded databases.
+
+This module contains unit tests for ShardedDatabase, checking that authors
+and magazines are replicated to every shard, that articles are routed by
+magazine, and that cross-shard queries gather the same answers a single
+database gives.
+"""
+
+import unittest
+import os
+import sqlite3
+import tempfile
+from lib.author import Author
+from lib.magazine import Magazine
+from lib.article import Article
+from lib.database_utils import bind, transaction
+from lib.sharding import ShardedDatabase
+
+
+class TestShardedDatabase(unittest.TestCase):
+    """
+    Test cases for routing and scatter-gather over three shards.
+    """
+
+    def setUp(self):
+        """Create three empty shards and a small catalogue spread over them."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.files = [os.path.join(self.directory.name, f"shard-{i}.db") for i in range(3)]
+        self.db = ShardedDatabase(self.files)
+        self.db.create_tables()
+        bind(self.db)
+        self.ann, self.bob = Author(None, "Ann"), Author(None, "Bob")
+        Author.save_many([self.ann, self.bob])
+        self.magazines = [Magazine(None, f"Magazine {i}", "Science" if i % 2 else "Travel") for i in range(4)]
+        Magazine.save_many(self.magazines)
+        # Magazines 1 and 4 share shard 1; magazine 2 is on shard 2 and magazine 3 on shard 0
+        Article.bulk_create([
+            ("Comets", "Ice and dust orbiting the sun.", self.ann, self.magazines[0]),
+            ("Rivers", "Water flowing downhill.", self.bob, self.magazines[1]),
+            ("Deserts", "Dry sand and comets overhead.", self.ann, self.magazines[2]),
+            ("Glaciers", "Slow rivers of ice.", self.ann, self.magazines[3]),
+            ("Oceans", "Salt water.", self.ann, self.magazines[0]),
+        ])
+
+    def tearDown(self):
+        """Restore the default database and remove the shard files."""
+        bind(None)
+        self.db.close()
+        self.directory.cleanup()
+
+    def _rows(self, index, sql):
+        conn = sqlite3.connect(self.files[index])
+        rows = conn.execute(sql).fetchall()
+        conn.close()
+        return rows
+
+    def test_replicated_tables_and_article_routing(self):
+        """Test that every shard holds all authors and magazines but only its magazines' articles."""
+        for index in range(3):
+            self.assertEqual(self._rows(index, "SELECT id, name FROM authors ORDER BY id"), [(1, "Ann"), (2, "Bob")])
+            self.assertEqual(len(self._rows(index, "SELECT id FROM magazines")), 4)
+            for id, magazine_id in self._rows(index, "SELECT id, magazine_id FROM articles"):
+                self.assertEqual((id % 3, magazine_id % 3), (index, index))
+        author = Author(None, "Cid")
+        author.save()
+        self.assertEqual(self._rows(2, "SELECT id FROM authors WHERE name = 'Cid'"), [(author.id,)])
+        article = Article(None, "Canyons", "Deep rock.", author, self.magazines[1])
+        article.save()
+        self.assertEqual(article.id % 3, self.magazines[1].id % 3)
+        self.assertEqual(Article.find_by_id(article.id).content, "Deep rock.")
+        article.magazine = self.magazines[2]
+        with self.assertRaises(ValueError):
+            article.save()
+
+    def test_single_magazine_and_cross_shard_queries(self):
+        """Test that per-magazine queries use one shard and author-wide queries merge all of them."""
+        first = self.magazines[0]
+        self.assertEqual(first.article_titles(), ["Comets", "Oceans"])
+        # Shard 1 numbers its articles 1, 4, 7 and shard 0 uses 3, so the merged order interleaves them
+        self.assertEqual([(a.id, a.title) for a in self.ann.articles()],
+                         [(1, "Comets"), (3, "Deserts"), (4, "Glaciers"), (7, "Oceans")])
+        self.assertEqual(sorted(m.id for m in self.ann.magazines()), [1, 3, 4])
+        self.assertEqual(self.ann.topic_areas(), ["Science", "Travel"])
+        self.assertEqual(Author.topic_areas_map(), {1: ["Science", "Travel"], 2: ["Science"]})
+        self.assertEqual(Magazine.top_publisher().id, first.id)
+        self.assertEqual([(m.id, count, rank) for m, count, rank in Magazine.top_publishers()],
+                         [(1, 2, 1), (2, 1, 2), (3, 1, 2), (4, 1, 2)])
+        self.assertEqual([(a.name, count, rank) for a, count, rank in Author.most_prolific()],
+                         [("Ann", 4, 1), ("Bob", 1, 2)])
+        page = Magazine.top_publishers(n=2)
+        self.assertEqual([(m.id, count, rank) for m, count, rank in Magazine.top_publishers(after=page[-1])],
+                         [(3, 1, 2), (4, 1, 2)])
+        self.assertEqual([(a.name, rank) for a, _, rank in Author.most_prolific(after=Author.most_prolific(n=1)[0])],
+                         [("Bob", 2)])
+        self.assertEqual(Magazine.top_categories(), [("Travel", 3, 1), ("Science", 2, 2)])
+        self.assertEqual({a.title for a in Article.search("comets")}, {"Comets", "Deserts"})
+        self.assertEqual([a.title for a in Article.search("ice", magazine=self.magazines[3])], ["Glaciers"])
+
+    def test_queries_route_or_merge_across_shards(self):
+        """Test that QuerySets use one shard when the magazine is fixed and merge pages otherwise."""
+        self.assertEqual(Article.where(magazine=self.magazines[0]).order_by("-id").values("title", flat=True).all(),
+                         ["Oceans", "Comets"])
+        query = Article.where(author=self.ann).order_by("magazine__category", "-id")
+        self.assertEqual([a.title for a in query], ["Glaciers", "Oceans", "Deserts", "Comets"])
+        self.assertEqual([a.title for a in query.offset(1).limit(2)], ["Oceans", "Deserts"])
+        self.assertEqual(query.offset(1).limit(2).count(), 2)
+        self.assertEqual(Article.where().values("magazine__category", flat=True).distinct().count(), 2)
+        self.assertTrue(Article.where(title="Rivers").exists())
+        self.assertEqual(Magazine.where(category="Science").count(), 2)
+
+    def test_transaction_spans_shards(self):
+        """Test that a failed unit of work is rolled back on every shard."""
+        with self.assertRaises(RuntimeError):
+            with transaction():
+                Author(None, "Dee").save()
+                Article(None, "Lakes", "", self.bob, self.magazines[2]).save()
+                raise RuntimeError("abort")
+        for index in range(3):
+            self.assertEqual(self._rows(index, "SELECT COUNT(*) FROM authors"), [(2,)])
+        self.assertEqual(len(self.magazines[2].articles()), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+"""
+Test module for streaming import and export.
+
+This module contains unit tests for lib.transfer, covering CSV and JSON Lines
+round trips, natural-key resolution of article references and chunked writes.
+"""
+
+import unittest
+import os
+import tempfile
+from lib.author import Author
+from lib.magazine import Magazine
+from lib.article import Article
+from lib.transfer import import_file, import_records, export_file, export_records
+from lib.database_utils import create_tables, get_connection, close_pool, DB_FILE
+
+class TestTransfer(unittest.TestCase):
+    """
+    Test cases for importing and exporting catalogue files.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Set up test database tables."""
+        close_pool()
+        if os.path.exists(DB_FILE):
+            os.remove(DB_FILE)
+        create_tables()
+
+    def setUp(self):
+        """Reset database state and create a scratch directory."""
+        self._clear_tables()
+        self.scratch = tempfile.TemporaryDirectory()
+        self.addCleanup(self.scratch.cleanup)
+
+    def _clear_tables(self):
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM articles")
+        cursor.execute("DELETE FROM authors")
+        cursor.execute("DELETE FROM magazines")
+        conn.commit()
+        conn.close()
+
+    def _path(self, name):
+        return os.path.join(self.scratch.name, name)
+
+    def test_round_trip_csv_and_jsonl(self):
+        """Test exporting every table and importing it into an empty database."""
+        author = Author(None, "Ivo")
+        author.save()
+        magazine = Magazine(None, "Quarterly", "Arts")
+        magazine.save()
+        Article.bulk_create([("Prints", "Ink,\n\"paper\"", author, magazine), ("Loose", "", None, None)])
+        for kind, name in (("authors", "authors.csv"), ("magazines", "magazines.jsonl"), ("articles", "articles.csv")):
+            export_file(kind, self._path(name))
+        exported = list(export_records("articles"))
+        self._clear_tables()
+        progress = []
+        for kind, name in (("authors", "authors.csv"), ("magazines", "magazines.jsonl"), ("articles", "articles.csv")):
+            import_file(kind, self._path(name), chunk_size=1, progress=lambda count, seconds: progress.append(count))
+        self.assertEqual(list(export_records("articles")), exported)
+        self.assertEqual(progress, [1, 1, 1, 2])
+        self.assertEqual(Author.find_by_id(Article.search("prints")[0].author_id).name, "Ivo")
+
+    def test_existing_names_are_skipped(self):
+        """Test that re-importing authors does not duplicate them."""
+        Author(None, "Jude").save()
+        result = import_records("authors", [{"name": "Jude"}, {"name": "Kim"}, {"name": "Kim"}])
+        self.assertEqual((result["written"], result["skipped"]), (1, 2))
+
+    def test_unknown_reference_rolls_back_chunk(self):
+        """Test that an article naming a missing author fails its chunk only."""
+        Author(None, "Lou").save()
+        records = [{"title": "Kept", "content": "", "author": "Lou", "magazine": None},
+                   {"title": "Lost", "content": "", "author": "Nobody", "magazine": None}]
+        with self.assertRaises(ValueError):
+            import_records("articles", records, chunk_size=1)
+        with get_connection() as conn:
+            self.assertEqual(conn.execute("SELECT title FROM articles").fetchall(), [("Kept",)])
+
+if __name__ == "__main__":
+    unittest.main()